@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of compiled V-USB bootloaders
+A build is keyed by the hash of its generated usbconfig.h, Makefile,
+firmware sources and the avr-gcc version; identical builds reuse the
+stored .hex instead of compiling again
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+try:
+    import msvcrt
+    HAS_MSVCRT = True
+except ImportError:
+    HAS_MSVCRT = False
+
+
+ENV_BUILD_CACHE = "VUSB_BUILD_CACHE"        # cache directory override
+DEFAULT_MAX_MB = 256
+DEFAULT_MAX_ENTRIES = 1000
+
+# Bump when the key inputs change meaning
+KEY_VERSION = "vusb-build-1"
+
+# Build products left in a build directory; never part of the key
+BUILD_OUTPUTS = {".o", ".elf", ".hex", ".eep", ".map", ".lst"}
+
+
+@functools.lru_cache(maxsize=None)
+def compiler_version(compiler: str = "avr-gcc") -> Optional[str]:
+    """Get the full --version output of the compiler (None if it cannot run)"""
+    try:
+        result = subprocess.run([compiler, "--version"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip()
+
+
+def build_key(build_dir: Path, compiler: Optional[str]) -> str:
+    """Hash every build input in a build directory plus the compiler version"""
+    digest = hashlib.sha256()
+    digest.update(f"{KEY_VERSION}\0{compiler}\0".encode("utf-8"))
+    inputs = sorted(
+        path for path in build_dir.rglob("*")
+        if path.is_file() and path.suffix not in BUILD_OUTPUTS
+    )
+    for path in inputs:
+        data = path.read_bytes()
+        name = path.relative_to(build_dir).as_posix()
+        digest.update(f"{name}\0{len(data)}\0".encode("utf-8"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def default_cache_dir(output_dir: str = "bootloader_builds") -> Path:
+    """Get the cache directory (VUSB_BUILD_CACHE or <output dir>/.build_cache)"""
+    override = os.environ.get(ENV_BUILD_CACHE)
+    return Path(override) if override else Path(output_dir) / ".build_cache"
+
+
+class BuildCache:
+    """Stored .hex files by build key, evicted least recently used first
+
+    Entries live in objects/<key[:2]>/<key>.hex; a hit touches the file,
+    so its mtime is the last use. Writes are atomic and the counters in
+    stats.json are updated under a file lock, so several build processes
+    can share one cache.
+    """
+
+    __slots__ = ("root", "max_bytes", "max_entries", "hits", "misses", "stores", "evictions")
+
+    def __init__(self, root: Path, max_mb: float = DEFAULT_MAX_MB,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.root = Path(root)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def entry_path(self, key: str) -> Path:
+        """Get the path of a cache entry"""
+        return self.root / "objects" / key[:2] / f"{key}.hex"
+
+    @contextmanager
+    def _lock(self):
+        """Hold an advisory lock on the cache directory"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / ".lock", "a+b") as lock_file:
+            if HAS_FCNTL:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            elif HAS_MSVCRT:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if HAS_FCNTL:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                elif HAS_MSVCRT:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _read_totals(self) -> Dict[str, int]:
+        """Read the lifetime counters"""
+        try:
+            totals = json.loads((self.root / "stats.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            totals = {}
+        return {name: int(totals.get(name, 0)) for name in ("hits", "misses", "stores", "evictions")}
+
+    def _record(self, **deltas: int):
+        """Add to the lifetime counters"""
+        with self._lock():
+            totals = self._read_totals()
+            for name, delta in deltas.items():
+                totals[name] += delta
+            self._write_atomic(self.root / "stats.json", json.dumps(totals).encode("utf-8"))
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        """Write to a temp file next to path, then rename over it"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def get(self, key: str) -> Optional[Path]:
+        """Get the stored .hex of a build key (None on a miss)"""
+        path = self.entry_path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            self._record(misses=1)
+            return None
+        self.hits += 1
+        self._record(hits=1)
+        return path
+
+    def put(self, key: str, hex_file: Path) -> Path:
+        """Store the .hex of a build, then evict down to the size limits"""
+        path = self.entry_path(key)
+        self._write_atomic(path, Path(hex_file).read_bytes())
+        self.stores += 1
+        self._record(stores=1)
+        self.evict()
+        return path
+
+    def _entries(self):
+        """List (mtime, size, path) of every stored entry"""
+        entries = []
+        for path in (self.root / "objects").glob("*/*.hex"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self) -> int:
+        """Remove least recently used entries beyond the size limits"""
+        removed = 0
+        with self._lock():
+            entries = sorted(self._entries(), key=lambda entry: entry[0])
+            total = sum(size for _, size, _ in entries)
+            while entries and (total > self.max_bytes or len(entries) > self.max_entries):
+                _, size, path = entries.pop(0)
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+        if removed:
+            self.evictions += removed
+            self._record(evictions=removed)
+        return removed
+
+    def clear(self):
+        """Remove every entry and reset the counters"""
+        with self._lock():
+            shutil.rmtree(self.root / "objects", ignore_errors=True)
+            try:
+                (self.root / "stats.json").unlink()
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        """Get session counters, lifetime counters and the cache size"""
+        entries = self._entries()
+        totals = self._read_totals()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "total_hits": totals["hits"],
+            "total_misses": totals["misses"],
+            "total_evictions": totals["evictions"],
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
+
+    def format_stats(self) -> str:
+        """Get a summary of hit rates and cache usage"""
+        stats = self.stats()
+
+        def rate(hits: int, misses: int) -> str:
+            lookups = hits + misses
+            return f"{hits}/{lookups} hits ({hits / lookups:.0%})" if lookups else "no lookups"
+
+        return (f"Build cache {self.root}: {stats['entries']} entries, "
+                f"{stats['bytes'] / 1024:.1f} KB of {self.max_bytes / (1024 * 1024):g} MB\n"
+                f"  this run: {rate(stats['hits'], stats['misses'])}, "
+                f"{stats['stores']} stored, {stats['evictions']} evicted\n"
+                f"  lifetime: {rate(stats['total_hits'], stats['total_misses'])}, "
+                f"{stats['total_evictions']} evicted")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description="Inspect the V-USB bootloader build cache",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Examples:
+  # Show hit rates and size
+  python build_cache.py --stats
+
+  # Shrink the cache to 16 MB
+  python build_cache.py --max-mb 16 --evict
+
+  # Remove every cached build
+  python build_cache.py --clear
+        """
+    )
+
+    parser.add_argument("--cache-dir", default=None,
+                       help="Cache directory (default: bootloader_builds/.build_cache)")
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_MB,
+                       help=f"Size limit in MB (default: {DEFAULT_MAX_MB})")
+    parser.add_argument("--max-entries", type=int, default=DEFAULT_MAX_ENTRIES,
+                       help=f"Entry limit (default: {DEFAULT_MAX_ENTRIES})")
+    parser.add_argument("--stats", action="store_true", help="Show cache statistics")
+    parser.add_argument("--evict", action="store_true", help="Evict down to the limits")
+    parser.add_argument("--clear", action="store_true", help="Remove every entry")
+
+    args = parser.parse_args()
+    cache = BuildCache(Path(args.cache_dir) if args.cache_dir else default_cache_dir(),
+                       args.max_mb, args.max_entries)
+
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {cache.root}")
+    if args.evict:
+        print(f"Evicted {cache.evict()} entries")
+    if args.stats or not (args.clear or args.evict):
+        print(cache.format_stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,58 +9,52 @@ import sys
 import subprocess
 import shutil
 import argparse
+import contextlib
+import csv
+import io
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List, Optional
-
-# MCU Configurations
-MCU_CONFIGS = {
-    "nano": {
-        "mcu": "atmega328p",
-        "f_cpu": "16000000",
-        "usb_port": "B",
-        "usb_bit_d_plus": "4",
-        "usb_bit_d_minus": "3",
-        "description": "Arduino Nano (ATmega328P)"
-    },
-    "micro": {
-        "mcu": "atmega32u4",
-        "f_cpu": "16000000",
-        "usb_port": "D",
-        "usb_bit_d_plus": "4",
-        "usb_bit_d_minus": "3",
-        "description": "Arduino Micro (ATmega32U4)"
-    },
-    "leonardo": {
-        "mcu": "atmega32u4",
-        "f_cpu": "16000000",
-        "usb_port": "D",
-        "usb_bit_d_plus": "4",
-        "usb_bit_d_minus": "3",
-        "description": "Arduino Leonardo (ATmega32U4)"
-    },
-    "uno": {
-        "mcu": "atmega328p",
-        "f_cpu": "16000000",
-        "usb_port": "B",
-        "usb_bit_d_plus": "4",
-        "usb_bit_d_minus": "3",
-        "description": "Arduino UNO (ATmega328P)"
-    },
-    "attiny85": {
-        "mcu": "attiny85",
-        "f_cpu": "16500000",
-        "usb_port": "B",
-        "usb_bit_d_plus": "4",
-        "usb_bit_d_minus": "3",
-        "description": "ATtiny85"
-    }
-}
+from typing import Dict, List, NamedTuple, Optional
+
+from build_cache import (DEFAULT_MAX_ENTRIES, DEFAULT_MAX_MB, BuildCache, build_key,
+                         compiler_version, default_cache_dir)
+from device_catalog import DEFAULT_BOARDS, DeviceCatalog, get_catalog
+
+# MCU Configurations (defaults; the effective set comes from the device catalog)
+MCU_CONFIGS = DEFAULT_BOARDS
+
+
+class BuildTarget(NamedTuple):
+    """One bootloader of a build matrix"""
+    mcu: str
+    name: str
+    vendor_id: str = "0x16c0"
+    product_id: str = "0x05df"
+
+
+class MatrixResult(NamedTuple):
+    """Outcome of one matrix build"""
+    target: BuildTarget
+    hex_file: Optional[Path]
+    seconds: float
+    flash_bytes: Optional[int] = None
+    cached: bool = False
+    error: Optional[str] = None
 
 class VUSBBootloaderBuilder:
-    def __init__(self, vusb_path: str, output_dir: str = "bootloader_builds"):
+    def __init__(self, vusb_path: str, output_dir: str = "bootloader_builds",
+                 catalog: Optional[DeviceCatalog] = None, cache: Optional[BuildCache] = None,
+                 use_cache: bool = True):
         self.vusb_path = Path(vusb_path)
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.catalog = catalog or get_catalog()
+        if use_cache:
+            self.cache = cache or BuildCache(default_cache_dir(output_dir))
+        else:
+            self.cache = None
         
         if not self.vusb_path.exists():
             raise FileNotFoundError(f"V-USB path not found: {vusb_path}")
@@ -89,10 +83,7 @@ class VUSBBootloaderBuilder:
                         product_id: str = "0x05df") -> str:
         """Create customized usbconfig.h"""
         
-        if mcu not in MCU_CONFIGS:
-            raise ValueError(f"Unknown MCU: {mcu}. Available: {', '.join(MCU_CONFIGS.keys())}")
-        
-        config = MCU_CONFIGS[mcu]
+        config = self.catalog.board(mcu)
         
         # Truncate device name to fit USB descriptor (max 32 bytes)
         device_name = device_name[:32]
@@ -102,7 +93,7 @@ class VUSBBootloaderBuilder:
         device_descriptor = ", ".join([f"'{c}'" for c in device_name])
         
         usbconfig = f"""/* Name: usbconfig.h
- * Project: V-USB Bootloader for {config['description']}
+ * Project: V-USB Bootloader for {config.description}
  * Device Name: {device_name}
  * Auto-generated configuration
  */
@@ -119,9 +110,9 @@ class VUSBBootloaderBuilder:
 #define USB_CFG_DEVICE_NAME_LEN {device_name_len}
 
 /* MCU Configuration */
-#define USB_CFG_IOPORTNAME      {config['usb_port']}
-#define USB_CFG_DMINUS_BIT      {config['usb_bit_d_minus']}
-#define USB_CFG_DPLUS_BIT       {config['usb_bit_d_plus']}
+#define USB_CFG_IOPORTNAME      {config.usb_port}
+#define USB_CFG_DMINUS_BIT      {config.usb_bit_d_minus}
+#define USB_CFG_DPLUS_BIT       {config.usb_bit_d_plus}
 
 /* USB Speed */
 #define USB_CFG_CLOCK_KHZ       (F_CPU/1000)
@@ -156,17 +147,14 @@ class VUSBBootloaderBuilder:
     def create_makefile(self, mcu: str, device_name: str) -> str:
         """Create customized Makefile for compilation"""
         
-        if mcu not in MCU_CONFIGS:
-            raise ValueError(f"Unknown MCU: {mcu}")
-        
-        config = MCU_CONFIGS[mcu]
+        config = self.catalog.board(mcu)
         
         makefile = f"""# Makefile for V-USB Bootloader
-# MCU: {config['description']}
+# MCU: {config.description}
 # Device: {device_name}
 
-MCU = {config['mcu']}
-F_CPU = {config['f_cpu']}
+MCU = {config.mcu}
+F_CPU = {config.f_cpu}
 FORMAT = ihex
 TARGET = bootloader
 
@@ -222,13 +210,13 @@ clean:
         return makefile
     
     def build(self, mcu: str, device_name: str, vendor_id: str = "0x16c0", 
-              product_id: str = "0x05df") -> Optional[Path]:
-        """Build bootloader for specified MCU"""
+              product_id: str = "0x05df", jobs: Optional[int] = None) -> Optional[Path]:
+        """Build bootloader for specified MCU (with make -j<jobs> if given)"""
         
         print(f"\n{'='*60}")
         print(f"Building V-USB Bootloader")
         print(f"{'='*60}")
-        print(f"MCU: {MCU_CONFIGS[mcu]['description']}")
+        print(f"MCU: {self.catalog.board(mcu).description}")
         print(f"Device Name: {device_name}")
         print(f"Vendor ID: {vendor_id}")
         print(f"Product ID: {product_id}")
@@ -283,11 +271,32 @@ clean:
                 "#endif\n"
             )
         
+        output_hex = self.output_dir / f"bootloader_{mcu}_{device_name.replace(' ', '_')}.hex"
+        
+        # Reuse an identical earlier build
+        key = None
+        if self.cache is not None:
+            version = compiler_version()
+            if version is not None:
+                key = build_key(build_dir, version)
+                cached_hex = self.cache.get(key)
+                if cached_hex is not None:
+                    shutil.copy(cached_hex, output_hex)
+                    print(f"♻️  Build cache hit ({key[:12]}), skipped compilation")
+                    print(f"💾 Saved to: {output_hex}")
+                    return output_hex
+        
         # Compile
         print("🔨 Compiling bootloader...")
         try:
+            if jobs:
+                # Parallel make: clean first so it cannot race the build
+                subprocess.run(["make", "clean"], cwd=build_dir, capture_output=True, timeout=60)
+                command = ["make", f"-j{jobs}", "all"]
+            else:
+                command = ["make", "clean", "all"]
             result = subprocess.run(
-                ["make", "clean", "all"],
+                command,
                 cwd=build_dir,
                 capture_output=True,
                 text=True,
@@ -309,10 +318,12 @@ clean:
                 print(f"📦 Output: {hex_file}")
                 
                 # Copy to output directory
-                output_hex = self.output_dir / f"bootloader_{mcu}_{device_name.replace(' ', '_')}.hex"
                 shutil.copy(hex_file, output_hex)
                 print(f"💾 Saved to: {output_hex}")
                 
+                if key is not None:
+                    self.cache.put(key, hex_file)
+                
                 return output_hex
             else:
                 print(f"❌ Hex file not created")
@@ -329,11 +340,141 @@ clean:
         """List available MCU configurations"""
         print("\nAvailable MCU Configurations:")
         print("-" * 60)
-        for key, config in MCU_CONFIGS.items():
-            print(f"  {key:12} - {config['description']}")
+        for board in self.catalog.iter_boards():
+            print(f"  {board.key:12} - {board.description}")
         print("-" * 60)
 
 
+def load_matrix(path: str, boards: List[str]) -> List[BuildTarget]:
+    """Read build targets from a JSON list or a CSV file
+    
+    Each entry has mcu, name, vendor_id and product_id; an entry without
+    an mcu (or with "*") is built for every board.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            entries = list(csv.DictReader(f))
+        else:
+            entries = json.load(f)
+    
+    targets = []
+    for entry in entries:
+        if not entry.get("name"):
+            raise ValueError(f"Invalid matrix entry {entry!r}: missing name")
+        mcus = boards if entry.get("mcu") in (None, "", "*") else [entry["mcu"]]
+        for mcu in mcus:
+            targets.append(BuildTarget(mcu, entry["name"],
+                                       entry.get("vendor_id") or "0x16c0",
+                                       entry.get("product_id") or "0x05df"))
+    return targets
+
+
+def hex_flash_size(hex_file: Path) -> Optional[int]:
+    """Count the data bytes of an Intel HEX file (None if unreadable)"""
+    total = 0
+    try:
+        with open(hex_file, encoding="ascii", errors="replace") as f:
+            for line in f:
+                # :LLAAAATT... -- only type 00 records carry data
+                if line.startswith(":") and line[7:9] == "00":
+                    total += int(line[1:3], 16)
+    except (OSError, ValueError):
+        return None
+    return total
+
+
+def _build_matrix_target(vusb_path: str, output_dir: str, config: Optional[str],
+                         cache_dir: Optional[str], max_mb: float, max_entries: int,
+                         use_cache: bool, target: BuildTarget, jobs: int) -> MatrixResult:
+    """Build one target in a pool process, capturing its output"""
+    start = time.perf_counter()
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            cache = BuildCache(Path(cache_dir), max_mb, max_entries) if cache_dir else None
+            builder = VUSBBootloaderBuilder(vusb_path, output_dir, catalog=get_catalog(config),
+                                            cache=cache, use_cache=use_cache)
+            hits = builder.cache.hits if builder.cache else 0
+            hex_file = builder.build(target.mcu, target.name, target.vendor_id,
+                                     target.product_id, jobs=jobs)
+            cached = bool(builder.cache) and builder.cache.hits > hits
+    except Exception as e:
+        return MatrixResult(target, None, time.perf_counter() - start, error=str(e))
+    
+    seconds = time.perf_counter() - start
+    if hex_file is None:
+        lines = [line for line in log.getvalue().splitlines() if line.strip()]
+        return MatrixResult(target, None, seconds, error=" | ".join(lines[-3:]) or "build failed")
+    return MatrixResult(target, hex_file, seconds, hex_flash_size(hex_file), cached)
+
+
+def build_matrix(vusb_path: str, output_dir: str, targets: List[BuildTarget],
+                 workers: Optional[int] = None, jobs: Optional[int] = None,
+                 config: Optional[str] = None, cache_dir: Optional[str] = None,
+                 use_cache: bool = True, max_mb: float = DEFAULT_MAX_MB,
+                 max_entries: int = DEFAULT_MAX_ENTRIES) -> List[MatrixResult]:
+    """Build many targets concurrently, one process and build directory each
+    
+    Results keep the order of ``targets``. Targets that would share a
+    build directory are reported as failed instead of clobbering each
+    other. Every process opens the shared cache with the same size limits.
+    """
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, len(targets) or 1))
+    jobs = jobs or max(1, cpus // workers)
+    
+    results: List[Optional[MatrixResult]] = [None] * len(targets)
+    seen = set()
+    todo = []
+    for i, target in enumerate(targets):
+        key = (target.mcu, target.name.replace(" ", "_"))
+        if key in seen:
+            results[i] = MatrixResult(target, None, 0.0,
+                                      error=f"duplicate build directory build_{key[0]}_{key[1]}")
+            continue
+        seen.add(key)
+        todo.append(i)
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_build_matrix_target, vusb_path, output_dir, config, cache_dir,
+                        max_mb, max_entries, use_cache, targets[i], jobs): i
+            for i in todo
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            result = future.result()
+            results[i] = result
+            status = "FAILED" if result.error else ("cached" if result.cached else "ok")
+            print(f"  [{done}/{len(todo)}] {result.target.mcu} / {result.target.name}: "
+                  f"{status} ({result.seconds:.1f}s)")
+    return results
+
+
+def print_matrix_report(results: List[MatrixResult], elapsed: float):
+    """Print a table of build durations, sizes and failures"""
+    print(f"\n{'MCU':12} {'Device':28} {'VID:PID':11} {'Time':>8} {'Flash':>8}  Status")
+    print("-" * 80)
+    for result in results:
+        target = result.target
+        ids = f"{target.vendor_id.replace('0x', '')}:{target.product_id.replace('0x', '')}"
+        size = f"{result.flash_bytes}B" if result.flash_bytes is not None else "-"
+        status = "FAILED" if result.error else ("cached" if result.cached else "ok")
+        print(f"{target.mcu[:12]:12} {target.name[:28]:28} {ids:11} "
+              f"{result.seconds:7.1f}s {size:>8}  {status}")
+    
+    failed = [r for r in results if r.error]
+    for result in failed:
+        print(f"❌ {result.target.mcu} / {result.target.name}: {result.error}")
+    
+    serial = sum(r.seconds for r in results)
+    print("-" * 80)
+    print(f"{len(results) - len(failed)}/{len(results)} built "
+          f"({sum(1 for r in results if r.cached)} from cache), {len(failed)} failed")
+    print(f"Wall time {elapsed:.1f}s, summed build time {serial:.1f}s"
+          + (f" ({serial / elapsed:.1f}x)" if elapsed > 0 else ""))
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="V-USB Bootloader Builder for Arduino Boards",
@@ -348,6 +489,19 @@ Examples:
   
   # List available MCUs
   python3 build_vusb_bootloader.py --list-mcus
+  
+  # Build every board for every device of device_config.json in parallel
+  python3 build_vusb_bootloader.py --matrix-all
+  
+  # Build the targets of a file ({"mcu", "name", "vendor_id", "product_id"},
+  # no mcu = every board) with 4 processes running make -j2 each
+  python3 build_vusb_bootloader.py --matrix variants.json --parallel 4 --jobs 2
+  
+  # Always compile, bypassing the build cache
+  python3 build_vusb_bootloader.py --mcu nano --name "Button Box" --no-cache
+  
+  # Show build cache hit rates and size
+  python3 build_vusb_bootloader.py --cache-stats
         """
     )
     
@@ -355,8 +509,8 @@ Examples:
                        help="Path to V-USB source (default: v-usb)")
     parser.add_argument("--output-dir", default="bootloader_builds",
                        help="Output directory for compiled bootloaders (default: bootloader_builds)")
-    parser.add_argument("--mcu", choices=MCU_CONFIGS.keys(),
-                       help="Target MCU (required unless --list-mcus)")
+    parser.add_argument("--mcu",
+                       help="Target MCU, see --list-mcus (required unless --list-mcus)")
     parser.add_argument("--name", default="Arduino Device",
                        help="USB device name (max 32 chars, default: Arduino Device)")
     parser.add_argument("--vendor-id", default="0x16c0",
@@ -367,11 +521,37 @@ Examples:
                        help="List available MCU configurations")
     parser.add_argument("--check-deps", action="store_true",
                        help="Check if required dependencies are installed")
+    parser.add_argument("--config", default=None,
+                       help="Device catalog config file (default: device_config.json)")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Always compile, without reading or filling the build cache")
+    parser.add_argument("--cache-dir", default=None,
+                       help="Build cache directory (default: <output-dir>/.build_cache)")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_MB,
+                       help=f"Build cache size limit in MB (default: {DEFAULT_MAX_MB})")
+    parser.add_argument("--cache-stats", action="store_true",
+                       help="Show build cache hit rates and size")
+    parser.add_argument("--matrix", metavar="FILE",
+                       help="Build the targets of a JSON/CSV file concurrently")
+    parser.add_argument("--matrix-all", action="store_true",
+                       help="Build every board for every device of the catalog concurrently")
+    parser.add_argument("--parallel", type=int, default=None,
+                       help="Concurrent builds in matrix mode (default: CPU count)")
+    parser.add_argument("--jobs", type=int, default=None,
+                       help="make -j jobs per matrix build (default: CPUs / parallel builds)")
     
     args = parser.parse_args()
     
+    cache = BuildCache(Path(args.cache_dir) if args.cache_dir else default_cache_dir(args.output_dir),
+                       args.cache_max_mb)
+    if args.cache_stats:
+        print(cache.format_stats())
+        return 0
+    
     try:
-        builder = VUSBBootloaderBuilder(args.vusb_path, args.output_dir)
+        builder = VUSBBootloaderBuilder(args.vusb_path, args.output_dir,
+                                        catalog=get_catalog(args.config),
+                                        cache=cache, use_cache=not args.no_cache)
         
         if args.list_mcus:
             builder.list_mcus()
@@ -383,6 +563,26 @@ Examples:
             else:
                 return 1
         
+        if args.matrix or args.matrix_all:
+            if not builder.check_dependencies():
+                return 1
+            boards = [board.key for board in builder.catalog.iter_boards()]
+            if args.matrix:
+                targets = load_matrix(args.matrix, boards)
+            else:
+                targets = [BuildTarget(mcu, device.name, device.vendor_id_hex, device.product_id_hex)
+                           for device in builder.catalog.devices for mcu in boards]
+            print(f"\nBuilding {len(targets)} bootloaders...")
+            start = time.perf_counter()
+            results = build_matrix(
+                args.vusb_path, args.output_dir, targets, args.parallel, args.jobs,
+                args.config, str(builder.cache.root) if builder.cache else None,
+                use_cache=not args.no_cache, max_mb=args.cache_max_mb,
+                max_entries=cache.max_entries
+            )
+            print_matrix_report(results, time.perf_counter() - start)
+            return 0 if all(r.error is None for r in results) else 1
+        
         if not args.mcu:
             parser.print_help()
             print("\n❌ Error: --mcu is required (unless using --list-mcus)")
@@ -393,6 +593,9 @@ Examples:
         
         hex_file = builder.build(args.mcu, args.name, args.vendor_id, args.product_id)
         
+        if builder.cache is not None:
+            print(f"\n{builder.cache.format_stats()}")
+        
         if hex_file:
             print(f"\n✅ Build successful!")
             print(f"Next steps:")
@@ -4,9 +4,225 @@ Configuration loader for V-USB Driver Installer
 Loads device configurations from JSON file
 """
 
+import copy
+import hashlib
 import json
+import marshal
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Optional, Any
+from types import MappingProxyType
+from typing import (Any, Callable, Dict, Iterable, Iterator, List, Mapping, NamedTuple,
+                    Optional, Tuple, Union)
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+try:
+    import msvcrt
+    HAS_MSVCRT = True
+except ImportError:
+    HAS_MSVCRT = False
+
+
+def parse_usb_id(value: Union[str, int]) -> int:
+    """Parse a USB Vendor/Product ID ("0x16c0", "16c0" or int) to an integer"""
+    if isinstance(value, int):
+        number = value
+    else:
+        number = int(value.strip().lower().replace("0x", ""), 16)
+
+    if not 0 <= number <= 0xFFFF:
+        raise ValueError(f"USB ID out of range: {value}")
+    return number
+
+
+class DeviceRecord(NamedTuple):
+    """Validated device entry with integer VID/PID"""
+    name: str
+    vendor_id: int
+    product_id: int
+    description: str = ""
+    mcu: str = ""
+    notes: str = ""
+
+    @property
+    def vid_pid(self) -> Tuple[int, int]:
+        """(vendor_id, product_id) lookup key"""
+        return (self.vendor_id, self.product_id)
+
+    @property
+    def vendor_id_hex(self) -> str:
+        """Vendor ID in config format (e.g. 0x16c0)"""
+        return f"0x{self.vendor_id:04x}"
+
+    @property
+    def product_id_hex(self) -> str:
+        """Product ID in config format (e.g. 0x05df)"""
+        return f"0x{self.product_id:04x}"
+
+    @classmethod
+    def from_config(cls, name: str, config: Dict[str, str]) -> "DeviceRecord":
+        """Build a record from a device_config.json entry"""
+        return cls(
+            name=name,
+            vendor_id=parse_usb_id(config["vendor_id"]),
+            product_id=parse_usb_id(config["product_id"]),
+            description=config.get("description", ""),
+            mcu=config.get("mcu", "").lower(),
+            notes=config.get("notes", ""),
+        )
+
+    def to_config(self) -> Dict[str, str]:
+        """Convert back to a device_config.json entry"""
+        config = {
+            "vendor_id": self.vendor_id_hex,
+            "product_id": self.product_id_hex,
+            "description": self.description,
+        }
+        if self.mcu:
+            config["mcu"] = self.mcu
+        if self.notes:
+            config["notes"] = self.notes
+        return config
+
+
+class DeviceRegistry:
+    """Immutable device index, by name, by (vid, pid) and by MCU
+
+    Several devices may share a VID/PID (e.g. the V-USB shared IDs), so
+    ID and MCU lookups return tuples in configuration order.
+    """
+
+    __slots__ = ("_by_name", "_by_id", "_by_mcu")
+
+    def __init__(self, records: Iterable[DeviceRecord] = ()):
+        by_name: Dict[str, DeviceRecord] = {}
+        by_id: Dict[Tuple[int, int], list] = {}
+        by_mcu: Dict[str, list] = {}
+
+        for record in records:
+            by_name[record.name] = record
+            by_id.setdefault(record.vid_pid, []).append(record)
+            if record.mcu:
+                by_mcu.setdefault(record.mcu, []).append(record)
+
+        self._by_name = MappingProxyType(by_name)
+        self._by_id = MappingProxyType({k: tuple(v) for k, v in by_id.items()})
+        self._by_mcu = MappingProxyType({k: tuple(v) for k, v in by_mcu.items()})
+
+    def to_index(self) -> Tuple[list, list, list]:
+        """Export records and indexes as plain data (for config snapshots)"""
+        position = {id(r): i for i, r in enumerate(self._by_name.values())}
+        return (
+            [tuple(r) for r in self._by_name.values()],
+            [(key, [position[id(r)] for r in group]) for key, group in self._by_id.items()],
+            [(mcu, [position[id(r)] for r in group]) for mcu, group in self._by_mcu.items()],
+        )
+
+    @classmethod
+    def from_index(cls, rows: list, id_index: list, mcu_index: list) -> "DeviceRegistry":
+        """Rebuild a registry from to_index() data without re-indexing"""
+        records = list(map(DeviceRecord._make, rows))
+        registry = cls.__new__(cls)
+        registry._by_name = MappingProxyType({r.name: r for r in records})
+        registry._by_id = MappingProxyType(
+            {tuple(key): tuple(records[i] for i in group) for key, group in id_index})
+        registry._by_mcu = MappingProxyType(
+            {mcu: tuple(records[i] for i in group) for mcu, group in mcu_index})
+        return registry
+
+    @classmethod
+    def from_config(cls, devices: Dict[str, Dict[str, str]]) -> "DeviceRegistry":
+        """Build a registry from the "devices" section, skipping invalid entries"""
+        records = []
+        for name, config in devices.items():
+            try:
+                records.append(DeviceRecord.from_config(name, config))
+            except (KeyError, ValueError, AttributeError) as e:
+                print(f"Warning: Skipping invalid device '{name}': {e}")
+        return cls(records)
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+    def __iter__(self) -> Iterator[DeviceRecord]:
+        return iter(self._by_name.values())
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._by_name
+
+    @property
+    def names(self) -> Mapping[str, DeviceRecord]:
+        """Read-only name -> record mapping"""
+        return self._by_name
+
+    def by_name(self, name: str) -> Optional[DeviceRecord]:
+        """Get a device by display name"""
+        return self._by_name.get(name)
+
+    def by_id(self, vendor_id: Union[str, int], product_id: Union[str, int]) -> Tuple[DeviceRecord, ...]:
+        """Get all devices using a VID/PID"""
+        if not isinstance(vendor_id, int) or not isinstance(product_id, int):
+            vendor_id, product_id = parse_usb_id(vendor_id), parse_usb_id(product_id)
+        return self._by_id.get((vendor_id, product_id), ())
+
+    def by_mcu(self, mcu: str) -> Tuple[DeviceRecord, ...]:
+        """Get all devices built on an MCU (e.g. atmega328p)"""
+        return self._by_mcu.get(mcu.lower(), ())
+
+    def ids(self) -> Tuple[Tuple[int, int], ...]:
+        """Get all distinct (vid, pid) pairs"""
+        return tuple(self._by_id)
+
+
+class ConfigDiff(NamedTuple):
+    """Structured difference between two configurations"""
+    added: Tuple[str, ...] = ()       # device names
+    removed: Tuple[str, ...] = ()     # device names
+    changed: Tuple[str, ...] = ()     # device names
+    settings: Tuple[str, ...] = ()    # "section.key" for non-device settings
+
+    @property
+    def empty(self) -> bool:
+        """True when nothing changed"""
+        return not (self.added or self.removed or self.changed or self.settings)
+
+
+def diff_configs(old: Dict[str, Any], new: Dict[str, Any]) -> ConfigDiff:
+    """Compute the device and settings changes between two configurations"""
+    old_devices = old.get("devices", {})
+    new_devices = new.get("devices", {})
+
+    settings = []
+    for section in sorted((set(old) | set(new)) - {"devices"}):
+        old_section = old.get(section, {})
+        new_section = new.get(section, {})
+        if not isinstance(old_section, dict) or not isinstance(new_section, dict):
+            if old_section != new_section:
+                settings.append(section)
+            continue
+        for key in sorted(set(old_section) | set(new_section)):
+            if old_section.get(key) != new_section.get(key):
+                settings.append(f"{section}.{key}")
+
+    return ConfigDiff(
+        added=tuple(n for n in new_devices if n not in old_devices),
+        removed=tuple(n for n in old_devices if n not in new_devices),
+        changed=tuple(n for n in new_devices
+                      if n in old_devices and old_devices[n] != new_devices[n]),
+        settings=tuple(settings),
+    )
+
+
+SNAPSHOT_MAGIC = b"VUSBCFG2"
 
 
 class ConfigLoader:
@@ -14,9 +230,99 @@ class ConfigLoader:
     
     DEFAULT_CONFIG_FILE = "device_config.json"
     
-    def __init__(self, config_file: Optional[str] = None):
+    def __init__(self, config_file: Optional[str] = None,
+                 use_snapshot: Optional[bool] = None):
         self.config_file = Path(config_file or self.DEFAULT_CONFIG_FILE)
-        self.config = self._load_config()
+        # Snapshots are on by default in the frozen (PyInstaller) installer
+        self.use_snapshot = getattr(sys, "frozen", False) if use_snapshot is None else use_snapshot
+        self._disk_text: Optional[str] = None
+        self._pending: List[Callable[[Dict[str, Any]], Optional[str]]] = []
+        self._transaction_depth = 0
+        # Guards config/registry/_pending/_disk_text against the watcher thread
+        self._lock = threading.RLock()
+        self._subscribers: List[Callable[[ConfigDiff, "ConfigLoader"], None]] = []
+        self._watch_thread: Optional[threading.Thread] = None
+        self._watch_stop = threading.Event()
+        self._watch_stat: Optional[Tuple[int, int]] = None
+        
+        if not (self.use_snapshot and self._load_snapshot()):
+            self.config = self._load_config()
+            self.registry = DeviceRegistry.from_config(self.get_devices())
+            self._write_snapshot()
+    
+    def _snapshot_path(self) -> Path:
+        """Location of the compiled snapshot for this config file"""
+        if getattr(sys, "frozen", False):
+            # The installer's own directory may not be writable
+            source = str(self.config_file.resolve()).encode("utf-8")
+            base = Path(os.environ.get("LOCALAPPDATA") or tempfile.gettempdir())
+            return base / "vusb_driver" / f"config_{hashlib.sha1(source).hexdigest()[:12]}.snapshot"
+        return self.config_file.with_name(f".{self.config_file.name}.snapshot")
+    
+    def _load_snapshot(self) -> bool:
+        """Load config and registry from the snapshot if it matches the source
+        
+        The snapshot is trusted when the source's mtime and size match; if
+        only the mtime changed, the source hash decides. Any mismatch or
+        read error falls back to full parsing.
+        """
+        stat = self._file_stat()
+        if stat is None:
+            return False
+        
+        try:
+            data = self._snapshot_path().read_bytes()
+            if not data.startswith(SNAPSHOT_MAGIC):
+                return False
+            snapshot = marshal.loads(data[len(SNAPSHOT_MAGIC):])
+        except (OSError, EOFError, ValueError, TypeError):
+            return False
+        
+        if (snapshot.get("mtime_ns"), snapshot.get("size")) != stat:
+            if snapshot.get("size") != stat[1]:
+                return False
+            text = self._read_disk_text()
+            if text is None or hashlib.sha256(text.encode("utf-8")).hexdigest() != snapshot.get("sha256"):
+                return False
+            snapshot["mtime_ns"] = stat[0]
+            self._store_snapshot(snapshot)
+        
+        try:
+            self.registry = DeviceRegistry.from_index(*snapshot["registry"])
+            self.config = snapshot["config"]
+            self._disk_text = snapshot["text"]
+        except (KeyError, TypeError, IndexError, ValueError):
+            return False
+        return True
+    
+    def _write_snapshot(self):
+        """Store the validated config and registry for the next startup"""
+        if not self.use_snapshot or self._disk_text is None:
+            return
+        stat = self._file_stat()
+        if stat is None:
+            return
+        
+        self._store_snapshot({
+            "mtime_ns": stat[0],
+            "size": stat[1],
+            "sha256": hashlib.sha256(self._disk_text.encode("utf-8")).hexdigest(),
+            "text": self._disk_text,
+            "config": self.config,
+            "registry": self.registry.to_index(),
+        })
+    
+    def _store_snapshot(self, snapshot: Dict[str, Any]):
+        """Atomically write a snapshot file (errors are ignored)"""
+        path = self._snapshot_path()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=path.name, suffix=".tmp", dir=path.parent)
+            with os.fdopen(fd, "wb") as f:
+                f.write(SNAPSHOT_MAGIC + marshal.dumps(snapshot))
+            os.replace(tmp_path, path)
+        except (OSError, ValueError):
+            pass
     
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration from JSON file"""
@@ -25,8 +331,10 @@ class ConfigLoader:
             return self._get_default_config()
         
         try:
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            text = self._read_disk_text()
+            config = json.loads(text)
+            self._disk_text = text
+            return config
         except json.JSONDecodeError as e:
             print(f"Error parsing config file: {e}")
             return self._get_default_config()
@@ -37,24 +345,8 @@ class ConfigLoader:
     @staticmethod
     def _get_default_config() -> Dict[str, Any]:
         """Get default configuration"""
-        return {
-            "devices": {
-                "Button Box": {
-                    "vendor_id": "0x16c0",
-                    "product_id": "0x05df",
-                    "description": "Arduino Button Box (V-USB)"
-                }
-            },
-            "driver_settings": {
-                "auto_download": True,
-                "timeout_seconds": 30,
-                "require_admin": True
-            },
-            "ui_settings": {
-                "window_width": 600,
-                "window_height": 500
-            }
-        }
+        from device_catalog import DEFAULT_DEVICES, DEFAULT_SETTINGS
+        return copy.deepcopy({"devices": DEFAULT_DEVICES, **DEFAULT_SETTINGS})
     
     def get_devices(self) -> Dict[str, Dict[str, str]]:
         """Get all configured devices"""
@@ -65,6 +357,15 @@ class ConfigLoader:
         devices = self.get_devices()
         return devices.get(device_name)
     
+    def find_devices_by_id(self, vendor_id: Union[str, int],
+                           product_id: Union[str, int]) -> Tuple[DeviceRecord, ...]:
+        """Get devices configured with a VID/PID"""
+        return self.registry.by_id(vendor_id, product_id)
+    
+    def get_devices_by_mcu(self, mcu: str) -> Tuple[DeviceRecord, ...]:
+        """Get devices configured for an MCU"""
+        return self.registry.by_mcu(mcu)
+    
     def get_driver_settings(self) -> Dict[str, Any]:
         """Get driver settings"""
         return self.config.get("driver_settings", {})
@@ -84,10 +385,7 @@ class ConfigLoader:
             print(f"Device '{device_name}' already exists")
             return False
         
-        if "devices" not in self.config:
-            self.config["devices"] = {}
-        
-        self.config["devices"][device_name] = {
+        entry = {
             "vendor_id": vendor_id,
             "product_id": product_id,
             "description": description or f"Custom {device_name}",
@@ -95,7 +393,14 @@ class ConfigLoader:
             "notes": notes or ""
         }
         
-        return self.save_config()
+        def apply(config: Dict[str, Any]) -> Optional[str]:
+            devices = config.setdefault("devices", {})
+            if devices.get(device_name, entry) != entry:
+                return f"Device '{device_name}' was added by another tool"
+            devices[device_name] = dict(entry)
+            return None
+        
+        return self._edit(apply)
     
     def remove_device(self, device_name: str) -> bool:
         """Remove device from configuration"""
@@ -103,18 +408,245 @@ class ConfigLoader:
             print(f"Device '{device_name}' not found")
             return False
         
-        del self.config["devices"][device_name]
+        def apply(config: Dict[str, Any]) -> Optional[str]:
+            config.get("devices", {}).pop(device_name, None)
+            return None
+        
+        return self._edit(apply)
+    
+    def _edit(self, apply: Callable[[Dict[str, Any]], Optional[str]]) -> bool:
+        """Apply an edit locally and save it (deferred inside a transaction)
+        
+        Edits are kept until saved so they can be replayed on top of the
+        file if another tool changed it in the meantime. ``apply`` returns
+        a conflict message instead of overwriting someone else's change.
+        """
+        with self._lock:
+            conflict = apply(self.config)
+            if conflict:
+                print(conflict)
+                return False
+            self._pending.append(apply)
+            self.registry = DeviceRegistry.from_config(self.get_devices())
+        # Saved outside the lock so subscribers are never called holding it
         return self.save_config()
     
-    def save_config(self) -> bool:
-        """Save configuration to file"""
+    @contextmanager
+    def transaction(self):
+        """Batch several edits into a single save
+        
+        Example:
+            with loader.transaction():
+                loader.add_device("Omega Buttons V2", "0x16c0", "0x05e0")
+                loader.remove_device("Arduino Device")
+        
+        On an exception the edits are discarded and the file is reloaded.
+        """
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                with self._lock:
+                    self._pending.clear()
+                    self.config = self._load_config()
+                    self.registry = DeviceRegistry.from_config(self.get_devices())
+            raise
+        
+        self._transaction_depth -= 1
+        if self._transaction_depth == 0 and not self.save_config():
+            raise OSError(f"Failed to save every edit to {self.config_file}")
+    
+    def _read_disk_text(self) -> Optional[str]:
+        """Read the current file contents (None if missing)"""
+        try:
+            with open(self.config_file, 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+    
+    @contextmanager
+    def _file_lock(self):
+        """Hold an advisory lock on <config>.lock while saving"""
+        lock_path = self.config_file.with_name(self.config_file.name + ".lock")
+        with open(lock_path, 'a+b') as lock_file:
+            if HAS_FCNTL:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            elif HAS_MSVCRT:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if HAS_FCNTL:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                elif HAS_MSVCRT:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+    
+    def _write_atomic(self, text: str):
+        """Write to a temp file in the same directory, then rename over the config"""
+        directory = self.config_file.parent
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{self.config_file.name}.",
+                                        suffix=".tmp", dir=directory)
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=2, ensure_ascii=False)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.config_file)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+    
+    def save_config(self) -> bool:
+        """Save configuration to file
+        
+        The write is atomic (temp file + rename) under an advisory lock and
+        skipped when the content is unchanged. If another tool modified the
+        file since it was loaded, pending edits are replayed on top of it
+        and subscribers are told about that change. An edit that conflicts
+        with it (e.g. both added the same device) is dropped and the save
+        returns False. Inside transaction() the save is deferred to the end
+        of the block.
+        """
+        if self._transaction_depth:
             return True
+        
+        conflicts = []
+        diff = None
+        try:
+            with self._lock, self._file_lock():
+                disk_text = self._read_disk_text()
+                try:
+                    disk_config = json.loads(disk_text) if disk_text is not None else None
+                except json.JSONDecodeError:
+                    disk_config = None
+                
+                if self._pending and disk_config is not None and disk_text != self._disk_text:
+                    merged = json.loads(disk_text)
+                    conflicts = [c for c in (apply(merged) for apply in self._pending) if c]
+                    diff = diff_configs(self.config, merged)
+                    self.config = merged
+                    self.registry = DeviceRegistry.from_config(self.get_devices())
+                
+                text = disk_text
+                if disk_config is None or disk_config != self.config:
+                    text = json.dumps(self.config, indent=2, ensure_ascii=False) + "\n"
+                    self._write_atomic(text)
+                
+                self._disk_text = text
+                self._pending.clear()
+                self._write_snapshot()
         except Exception as e:
             print(f"Error saving config: {e}")
             return False
+        
+        if diff is not None and not diff.empty:
+            self._notify(diff)
+        for conflict in conflicts:
+            print(f"{conflict}; keeping its version")
+        return not conflicts
+    
+    def subscribe(self, callback: Callable[[ConfigDiff, "ConfigLoader"], None]) -> Callable[[], None]:
+        """Register a callback for configuration changes made on disk
+        
+        The callback receives the ConfigDiff and this loader (already
+        updated). It runs on the watcher thread, or on the thread whose
+        save merged the change; GUI code should hand the update over to
+        its own event loop.
+        Returns a function that unsubscribes the callback.
+        """
+        self._subscribers.append(callback)
+        
+        def unsubscribe():
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+        
+        return unsubscribe
+    
+    def _file_stat(self) -> Optional[Tuple[int, int]]:
+        """(mtime_ns, size) of the config file (None if missing)"""
+        try:
+            st = self.config_file.stat()
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+    
+    def check_for_changes(self) -> Optional[ConfigDiff]:
+        """Reload the file if it changed on disk and notify subscribers
+        
+        Cheap when nothing changed: only the file's mtime and size are
+        compared. The file is re-parsed only when its content differs from
+        what was last loaded or saved. Returns the diff, or None.
+        """
+        stat = self._file_stat()
+        if stat is None or stat == self._watch_stat:
+            return None
+        
+        # Subscribers are called after the lock is released
+        with self._lock:
+            self._watch_stat = stat
+            
+            # Unsaved edits are merged with the file on the next save, which
+        # also notifies subscribers of this change
+            if self._pending:
+                return None
+            
+            text = self._read_disk_text()
+            if text is None or text == self._disk_text:
+                return None
+            
+            try:
+                config = json.loads(text)
+            except json.JSONDecodeError as e:
+                print(f"Error parsing config file: {e}")
+                return None
+            
+            diff = diff_configs(self.config, config)
+            self.config = config
+            self._disk_text = text
+            self.registry = DeviceRegistry.from_config(self.get_devices())
+            self._write_snapshot()
+        
+        if not diff.empty:
+            self._notify(diff)
+        return diff
+    
+    def _notify(self, diff: ConfigDiff):
+        """Send a change to subscribers"""
+        for callback in list(self._subscribers):
+            try:
+                callback(diff, self)
+            except Exception as e:
+                print(f"Error in config subscriber: {e}")
+    
+    def watch(self, interval: float = 1.0):
+        """Poll the config file for changes on a background thread"""
+        if self._watch_thread is not None:
+            return
+        
+        self._watch_stat = self._file_stat()
+        self._watch_stop.clear()
+        
+        def loop():
+            while not self._watch_stop.wait(interval):
+                self.check_for_changes()
+        
+        self._watch_thread = threading.Thread(target=loop, name="config-watcher", daemon=True)
+        self._watch_thread.start()
+    
+    def stop_watching(self):
+        """Stop the background watcher"""
+        if self._watch_thread is None:
+            return
+        self._watch_stop.set()
+        self._watch_thread.join()
+        self._watch_thread = None
     
     def print_config(self):
         """Print configuration in readable format"""
@@ -150,14 +682,109 @@ class ConfigLoader:
         print("\n" + "="*70 + "\n")
 
 
+def benchmark_registry(count: int = 10000, lookups: int = 100000):
+    """Benchmark config load and registry lookups with a generated fleet"""
+    devices = {
+        f"Device {i}": {
+            "vendor_id": f"0x{0x16c0 + i // 0x10000:04x}",
+            "product_id": f"0x{i % 0x10000:04x}",
+            "description": f"Generated device {i}",
+            "mcu": ("atmega328p", "atmega32u4", "attiny85")[i % 3],
+            "notes": ""
+        }
+        for i in range(count)
+    }
+    
+    fd, path = tempfile.mkstemp(suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"devices": devices}, f)
+        
+        start = time.perf_counter()
+        loader = ConfigLoader(path)
+        load_time = time.perf_counter() - start
+        
+        ConfigLoader(path, use_snapshot=True)
+        start = time.perf_counter()
+        ConfigLoader(path, use_snapshot=True)
+        snapshot_time = time.perf_counter() - start
+    finally:
+        os.unlink(path)
+        snapshot_file = Path(path).with_name(f".{Path(path).name}.snapshot")
+        if snapshot_file.exists():
+            snapshot_file.unlink()
+    
+    names = list(devices)
+    keys = [(0x16c0 + i // 0x10000, i % 0x10000) for i in range(count)]
+    
+    start = time.perf_counter()
+    for i in range(lookups):
+        loader.find_devices_by_id(*keys[i % count])
+    id_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for i in range(lookups):
+        loader.registry.by_name(names[i % count])
+    name_time = time.perf_counter() - start
+    
+    # Previous approach: re-parse every entry's hex strings and scan
+    scan_lookups = min(lookups, 1000)
+    start = time.perf_counter()
+    for i in range(scan_lookups):
+        vid, pid = keys[i % count]
+        [n for n, c in devices.items()
+         if int(c["vendor_id"], 16) == vid and int(c["product_id"], 16) == pid]
+    scan_time = time.perf_counter() - start
+    
+    print(f"\nRegistry benchmark ({count} devices)")
+    print("-" * 60)
+    print(f"  Load + index:        {load_time * 1e3:10.1f} ms")
+    print(f"  Load from snapshot:  {snapshot_time * 1e3:10.1f} ms")
+    print(f"  Lookup by VID/PID:   {id_time / lookups * 1e6:10.2f} us")
+    print(f"  Lookup by name:      {name_time / lookups * 1e6:10.2f} us")
+    print(f"  Linear scan (old):   {scan_time / scan_lookups * 1e6:10.2f} us")
+
+
 def main():
     """Test configuration loader"""
-    import sys
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="V-USB device configuration manager")
+    parser.add_argument("--config", default=None,
+                       help=f"Config file (default: {ConfigLoader.DEFAULT_CONFIG_FILE})")
+    parser.add_argument("--benchmark", type=int, metavar="N",
+                       help="Benchmark load and lookups with N generated devices")
+    parser.add_argument("--watch", action="store_true",
+                       help="Print configuration changes as they happen")
+    args = parser.parse_args()
+    
+    if args.benchmark:
+        benchmark_registry(args.benchmark)
+        return
+    
+    if args.watch:
+        loader = ConfigLoader(args.config)
+        
+        def show(diff: ConfigDiff, _loader: ConfigLoader):
+            for label, names in (("+", diff.added), ("-", diff.removed),
+                                 ("~", diff.changed), ("*", diff.settings)):
+                for name in names:
+                    print(f"  {label} {name}")
+        
+        loader.subscribe(show)
+        loader.watch()
+        print(f"Watching {loader.config_file} (Ctrl+C to stop)...")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            loader.stop_watching()
+        return
     
     print("V-USB Driver Installer - Configuration Loader")
     print("="*70)
     
-    loader = ConfigLoader()
+    loader = ConfigLoader(args.config)
     
     # Print current configuration
     loader.print_config()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Shared device catalog for the V-USB tools
+Single source of device, board and MCU data for the installer, driver
+generator, bootloader builder and flasher
+"""
+
+import copy
+import json
+import os
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, Mapping, NamedTuple, Optional, Tuple
+
+from config_loader import ConfigLoader, DeviceRegistry
+
+
+# Environment layer
+ENV_CONFIG_FILE = "VUSB_CONFIG_FILE"        # path to device_config.json
+ENV_OVERRIDES = "VUSB_CATALOG_JSON"         # JSON object merged over the file
+
+DEFAULT_DEVICES = {
+    "Button Box": {
+        "vendor_id": "0x16c0",
+        "product_id": "0x05df",
+        "description": "Arduino Button Box (V-USB)",
+        "mcu": "atmega328p"
+    },
+    "Arduino Device": {
+        "vendor_id": "0x16c0",
+        "product_id": "0x05df",
+        "description": "Generic Arduino Device (V-USB)",
+        "mcu": "atmega328p"
+    }
+}
+
+DEFAULT_SETTINGS = {
+    "driver_settings": {
+        "auto_download": True,
+        "timeout_seconds": 30,
+        "require_admin": True
+    },
+    "ui_settings": {
+        "window_width": 600,
+        "window_height": 500
+    }
+}
+
+# Board configurations for the V-USB bootloader
+DEFAULT_BOARDS = {
+    "nano": {
+        "mcu": "atmega328p",
+        "f_cpu": "16000000",
+        "usb_port": "B",
+        "usb_bit_d_plus": "4",
+        "usb_bit_d_minus": "3",
+        "description": "Arduino Nano (ATmega328P)"
+    },
+    "micro": {
+        "mcu": "atmega32u4",
+        "f_cpu": "16000000",
+        "usb_port": "D",
+        "usb_bit_d_plus": "4",
+        "usb_bit_d_minus": "3",
+        "description": "Arduino Micro (ATmega32U4)"
+    },
+    "leonardo": {
+        "mcu": "atmega32u4",
+        "f_cpu": "16000000",
+        "usb_port": "D",
+        "usb_bit_d_plus": "4",
+        "usb_bit_d_minus": "3",
+        "description": "Arduino Leonardo (ATmega32U4)"
+    },
+    "uno": {
+        "mcu": "atmega328p",
+        "f_cpu": "16000000",
+        "usb_port": "B",
+        "usb_bit_d_plus": "4",
+        "usb_bit_d_minus": "3",
+        "description": "Arduino UNO (ATmega328P)"
+    },
+    "attiny85": {
+        "mcu": "attiny85",
+        "f_cpu": "16500000",
+        "usb_port": "B",
+        "usb_bit_d_plus": "4",
+        "usb_bit_d_minus": "3",
+        "description": "ATtiny85"
+    }
+}
+
+# MCU fuse configurations for V-USB
+DEFAULT_FUSES = {
+    "atmega328p": {
+        "low": "0xdf",
+        "high": "0xda",
+        "extended": "0x05",
+        "lock": "0x0f",
+        "unlock": "0x3f"
+    },
+    "atmega32u4": {
+        "low": "0xdf",
+        "high": "0xd9",
+        "extended": "0xc3",
+        "lock": "0x0f",
+        "unlock": "0x3f"
+    },
+    "attiny85": {
+        "low": "0xe1",
+        "high": "0xdd",
+        "extended": "0xff",
+        "lock": "0x0f",
+        "unlock": "0x3f"
+    }
+}
+
+
+class BoardRecord(NamedTuple):
+    """Board configuration for building a V-USB bootloader"""
+    key: str
+    mcu: str
+    f_cpu: str
+    usb_port: str
+    usb_bit_d_plus: str
+    usb_bit_d_minus: str
+    description: str
+
+
+class FuseRecord(NamedTuple):
+    """V-USB fuse settings for one MCU"""
+    mcu: str
+    low: str
+    high: str
+    extended: str
+    lock: str
+    unlock: str
+
+
+class DeviceCatalog:
+    """Merged, indexed view of devices, boards, MCU fuses and settings"""
+
+    __slots__ = ("devices", "boards", "fuses", "settings", "config_file", "loader")
+
+    def __init__(self, devices: DeviceRegistry, boards: Mapping[str, BoardRecord],
+                 fuses: Mapping[str, FuseRecord], settings: Mapping[str, Any],
+                 config_file: Optional[str] = None, loader: Optional[ConfigLoader] = None):
+        self.devices = devices
+        self.boards = boards
+        self.fuses = fuses
+        self.settings = settings
+        self.config_file = config_file
+        self.loader = loader
+
+    def board(self, key: str) -> BoardRecord:
+        """Get a board by key (e.g. nano), raises ValueError if unknown"""
+        board = self.boards.get(key)
+        if board is None:
+            raise ValueError(f"Unknown MCU: {key}. Available: {', '.join(self.boards)}")
+        return board
+
+    def fuses_for(self, mcu: str) -> Optional[FuseRecord]:
+        """Get the fuse settings for an MCU (e.g. atmega328p)"""
+        return self.fuses.get(mcu.lower())
+
+    def boards_for_mcu(self, mcu: str) -> Tuple[BoardRecord, ...]:
+        """Get all boards built on an MCU"""
+        return tuple(b for b in self.boards.values() if b.mcu == mcu.lower())
+
+    def iter_boards(self) -> Iterator[BoardRecord]:
+        """Iterate boards in catalog order"""
+        return iter(self.boards.values())
+
+
+def _merge(base: Dict[str, Any], layer: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Recursively merge a layer of dicts over a base (in place)"""
+    for key, value in (layer or {}).items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _merge(base[key], value)
+        else:
+            base[key] = copy.deepcopy(value)
+    return base
+
+
+def _records(section: Dict[str, Dict[str, Any]], record_type, key_field: str) -> Mapping:
+    """Build read-only records from a merged section, skipping incomplete entries"""
+    records = {}
+    for key, fields in section.items():
+        try:
+            records[key] = record_type(**{**fields, key_field: key})
+        except TypeError as e:
+            print(f"Warning: Skipping invalid {record_type.__name__} '{key}': {e}")
+    return MappingProxyType(records)
+
+
+def load_catalog(config_file: Optional[str] = None,
+                 overrides: Optional[Dict[str, Any]] = None,
+                 environ: Optional[Mapping[str, str]] = None,
+                 loader: Optional[ConfigLoader] = None) -> DeviceCatalog:
+    """Build a catalog: defaults, then config file, then environment, then CLI
+
+    Every layer has the shape of device_config.json; besides "devices" and
+    the settings sections it may carry "boards" and "mcu_fuses". Boards,
+    fuses and settings are layered over the built-in defaults, but a config
+    file's device list replaces DEFAULT_DEVICES, which only apply when the
+    file does not exist. Pass ``loader`` to reuse an already loaded
+    config file instead of reading it again.
+    """
+    environ = os.environ if environ is None else environ
+    config_file = config_file or environ.get(ENV_CONFIG_FILE) or ConfigLoader.DEFAULT_CONFIG_FILE
+
+    merged = _merge({"devices": {}, "boards": {}, "mcu_fuses": {}},
+                    {"boards": DEFAULT_BOARDS, "mcu_fuses": DEFAULT_FUSES, **DEFAULT_SETTINGS})
+
+    loader = loader or ConfigLoader(config_file)
+    if not loader.config_file.exists():
+        _merge(merged, {"devices": DEFAULT_DEVICES})
+    _merge(merged, loader.config)
+
+    env_layer = environ.get(ENV_OVERRIDES)
+    if env_layer:
+        try:
+            _merge(merged, json.loads(env_layer))
+        except json.JSONDecodeError as e:
+            print(f"Warning: Ignoring invalid {ENV_OVERRIDES}: {e}")
+
+    _merge(merged, overrides)
+
+    devices = DeviceRegistry.from_config(merged.pop("devices"))
+    boards = _records(merged.pop("boards"), BoardRecord, "key")
+    fuses = _records(merged.pop("mcu_fuses"), FuseRecord, "mcu")
+
+    return DeviceCatalog(devices, boards, fuses, MappingProxyType(merged),
+                         config_file=config_file, loader=loader)
+
+
+_cache: Dict[Tuple[Optional[str], str, str, str], DeviceCatalog] = {}
+_cache_lock = threading.Lock()
+
+
+def get_catalog(config_file: Optional[str] = None,
+                overrides: Optional[Dict[str, Any]] = None) -> DeviceCatalog:
+    """Get the process-wide catalog, loading it on first use
+
+    Catalogs are memoized per config file, CLI overrides and environment
+    layer, so every tool in the process shares the same indexed objects.
+    """
+    key = (
+        config_file,
+        json.dumps(overrides, sort_keys=True) if overrides else "",
+        os.environ.get(ENV_CONFIG_FILE, ""),
+        os.environ.get(ENV_OVERRIDES, ""),
+    )
+    with _cache_lock:
+        catalog = _cache.get(key)
+        if catalog is None:
+            catalog = _cache[key] = load_catalog(config_file, overrides)
+        return catalog
+
+
+def refresh_catalog(catalog: DeviceCatalog) -> DeviceCatalog:
+    """Rebuild a catalog from its loader's current config
+
+    Keeps the same ConfigLoader (and its watcher and subscribers), so it
+    suits a subscriber reacting to a config change. The process-wide
+    cache then returns the new catalog.
+    """
+    with _cache_lock:
+        key = next((k for k, cached in _cache.items() if cached is catalog), None)
+        overrides = json.loads(key[1]) if key and key[1] else None
+        fresh = load_catalog(catalog.config_file, overrides, loader=catalog.loader)
+        if key is not None:
+            _cache[key] = fresh
+    return fresh
+
+
+def clear_cache():
+    """Forget memoized catalogs (e.g. after the config file changed)"""
+    with _cache_lock:
+        _cache.clear()
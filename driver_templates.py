@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Template layer for the V-USB driver package generator
+Loads the INF, README and install script templates from disk, compiles
+them once and re-reads a template only when its file changes
+"""
+
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Tuple
+
+
+# Built-in templates live next to this script
+TEMPLATE_DIR = Path(__file__).parent
+INF_TEMPLATE = "vusb_driver_template.inf.tmpl"  # vusb_driver_template.inf stays a usable INF
+README_TEMPLATE = "vusb_readme_template.txt"
+INSTALL_TEMPLATE = "vusb_install_template.bat"
+FAMILY_INF_TEMPLATE = "vusb_family_template.inf"
+FAMILY_README_TEMPLATE = "vusb_family_readme_template.txt"
+
+# Per-manufacturer overrides: <override dir>/<Manufacturer_Name>/<template file>
+ENV_TEMPLATE_DIR = "VUSB_TEMPLATE_DIR"
+DEFAULT_OVERRIDE_DIR = TEMPLATE_DIR / "templates"
+
+# {{ name }} placeholders; INF %STRINGS% and batch %variables% pass through
+PLACEHOLDER = re.compile(r"\{\{\s*([A-Za-z_]\w*)\s*\}\}")
+
+
+class TemplateError(ValueError):
+    """A template could not be rendered"""
+
+
+class CompiledTemplate:
+    """Template text compiled to a str.format_map pattern"""
+
+    __slots__ = ("path", "pattern", "fields")
+
+    def __init__(self, path: str, text: str):
+        self.path = path
+        parts = PLACEHOLDER.split(text)
+        # split() alternates literal text and placeholder names
+        literals = [p.replace("{", "{{").replace("}", "}}") for p in parts[0::2]]
+        names = parts[1::2]
+        self.pattern = "".join(
+            literal + (f"{{{names[i]}}}" if i < len(names) else "")
+            for i, literal in enumerate(literals)
+        )
+        self.fields = frozenset(names)
+
+    def render(self, context: Mapping[str, str]) -> str:
+        """Fill in the placeholders"""
+        try:
+            return self.pattern.format_map(context)
+        except KeyError as e:
+            raise TemplateError(f"{os.path.basename(self.path)}: no value for {{{{ {e.args[0]} }}}}")
+
+
+class TemplateCache:
+    """Compiled templates keyed by path, reloaded when mtime or size change"""
+
+    __slots__ = ("_entries", "_lock", "hits", "loads")
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[int, int, CompiledTemplate]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def get(self, path: str) -> Optional[CompiledTemplate]:
+        """Get the compiled template of a file (None if it does not exist)"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            self.hits += 1
+            return entry[2]
+
+        with open(path, encoding="utf-8", newline="") as f:
+            template = CompiledTemplate(path, f.read())
+        with self._lock:
+            self._entries[path] = (stat.st_mtime_ns, stat.st_size, template)
+            self.loads += 1
+        return template
+
+    def clear(self):
+        """Forget every compiled template"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Get cache counters"""
+        return {"templates": len(self._entries), "hits": self.hits, "loads": self.loads}
+
+    def format_stats(self) -> str:
+        """Get a one-line summary of the cache counters"""
+        stats = self.stats()
+        return (f"Template cache: {stats['templates']} templates, "
+                f"{stats['hits']} hits, {stats['loads']} loads")
+
+
+_cache = TemplateCache()
+
+
+def get_template_cache() -> TemplateCache:
+    """Get the process-wide template cache"""
+    return _cache
+
+
+def manufacturer_dir_name(manufacturer: str) -> str:
+    """Get the override directory name of a manufacturer (e.g. SO_Devs)"""
+    return manufacturer.replace(" ", "_").replace("/", "_")
+
+
+class DriverTemplates:
+    """Resolve package templates, preferring a manufacturer's overrides"""
+
+    __slots__ = ("base_dir", "override_dir", "cache", "_paths")
+
+    def __init__(self, override_dir: Optional[str] = None, base_dir: Optional[str] = None,
+                 cache: Optional[TemplateCache] = None):
+        override_dir = override_dir or os.environ.get(ENV_TEMPLATE_DIR)
+        self.override_dir = Path(override_dir) if override_dir else DEFAULT_OVERRIDE_DIR
+        self.base_dir = Path(base_dir) if base_dir else TEMPLATE_DIR
+        self.cache = cache or get_template_cache()
+        self._paths: Dict[Tuple[str, Optional[str]], Tuple[str, ...]] = {}
+
+    def candidates(self, name: str, manufacturer: Optional[str] = None) -> Tuple[str, ...]:
+        """Get the paths tried for a template, most specific first"""
+        key = (name, manufacturer)
+        paths = self._paths.get(key)
+        if paths is None:
+            paths = (str(self.base_dir / name),)
+            if manufacturer:
+                paths = (str(self.override_dir / manufacturer_dir_name(manufacturer) / name),) + paths
+            self._paths[key] = paths
+        return paths
+
+    def get(self, name: str, manufacturer: Optional[str] = None) -> CompiledTemplate:
+        """Get a template, from the manufacturer's directory if it has one"""
+        paths = self.candidates(name, manufacturer)
+        for path in paths:
+            template = self.cache.get(path)
+            if template is not None:
+                return template
+        raise TemplateError(f"Template not found: {paths[-1]}")
+
+    def render(self, name: str, context: Mapping[str, str],
+               manufacturer: Optional[str] = None) -> str:
+        """Render a template for one device"""
+        return self.get(name, manufacturer).render(context)
@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+"""
+Columnar event log for Button Box sessions
+Appends button edges to compact on-disk columns and analyzes them with NumPy
+"""
+
+import argparse
+import heapq
+import json
+import sys
+import time
+from array import array
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+LOG_VERSION = 1
+META_FILE = "events.json"
+
+# column name -> (file name, array typecode, numpy dtype); all little-endian
+COLUMNS = {
+    "timestamp": ("timestamp.i8", "q", "<i8"),   # nanoseconds since the epoch
+    "device": ("device.u2", "H", "<u2"),          # index into meta "devices"
+    "button": ("button.u1", "B", "u1"),           # button number (1-32)
+    "edge": ("edge.u1", "B", "u1"),               # 1 = pressed, 0 = released
+}
+
+EDGE_PRESSED = 1
+EDGE_RELEASED = 0
+
+
+def _read_meta(log_dir: Path) -> Dict:
+    """Read log metadata, or a fresh header if the log is new"""
+    meta_file = log_dir / META_FILE
+    if meta_file.exists():
+        with open(meta_file, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != LOG_VERSION:
+            raise ValueError(f"Unsupported event log version: {meta.get('version')}")
+        return meta
+    return {
+        "version": LOG_VERSION,
+        "columns": {name: spec[2] for name, spec in COLUMNS.items()},
+        "devices": [],
+    }
+
+
+def row_count(log_dir: Path) -> int:
+    """Number of complete rows (shortest column wins after a crash)"""
+    counts = []
+    for file_name, typecode, _ in COLUMNS.values():
+        path = log_dir / file_name
+        size = path.stat().st_size if path.exists() else 0
+        counts.append(size // array(typecode).itemsize)
+    return min(counts)
+
+
+class EventLogWriter:
+    """Append button edges to a columnar event log directory
+
+    Each column lives in its own fixed-width file so the log can be
+    memory-mapped without parsing. Rows are buffered and flushed in
+    batches; a torn write after a crash is trimmed on the next open.
+    """
+
+    def __init__(self, log_dir: str, device_name: Optional[str] = None,
+                 flush_every: int = 256):
+        self.log_dir = Path(log_dir)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.flush_every = flush_every
+        self._meta = _read_meta(self.log_dir)
+        self.device = self.add_device(device_name) if device_name else 0
+
+        rows = row_count(self.log_dir)
+        self._files = {}
+        self._buffers = {}
+        for name, (file_name, typecode, _) in COLUMNS.items():
+            f = open(self.log_dir / file_name, "ab")
+            f.truncate(rows * array(typecode).itemsize)
+            self._files[name] = f
+            self._buffers[name] = array(typecode)
+        self.rows = rows
+
+    def add_device(self, device_name: str) -> int:
+        """Register a device name, returns its index in the log"""
+        devices = self._meta["devices"]
+        if device_name not in devices:
+            devices.append(device_name)
+            with open(self.log_dir / META_FILE, "w", encoding="utf-8") as f:
+                json.dump(self._meta, f, indent=2)
+        return devices.index(device_name)
+
+    def append(self, button: int, pressed: bool, timestamp_ns: Optional[int] = None):
+        """Append one button edge"""
+        buffers = self._buffers
+        buffers["timestamp"].append(timestamp_ns if timestamp_ns is not None else time.time_ns())
+        buffers["device"].append(self.device)
+        buffers["button"].append(button)
+        buffers["edge"].append(EDGE_PRESSED if pressed else EDGE_RELEASED)
+        if len(buffers["edge"]) >= self.flush_every:
+            self.flush()
+
+    def append_row(self, timestamp_ns: int, device: int, button: int, edge: int):
+        """Append one raw row (device is an index from add_device)"""
+        buffers = self._buffers
+        buffers["timestamp"].append(timestamp_ns)
+        buffers["device"].append(device)
+        buffers["button"].append(button)
+        buffers["edge"].append(edge)
+        if len(buffers["edge"]) >= self.flush_every:
+            self.flush()
+
+    def append_columns(self, timestamp, device, button, edge):
+        """Append many rows at once from one array per column
+
+        Each array (e.g. a NumPy array of the dtype in COLUMNS) must hold
+        little-endian values of the column's width. Buffered rows are
+        flushed first, so row order is kept.
+        """
+        columns = {"timestamp": timestamp, "device": device, "button": button, "edge": edge}
+        rows = len(edge)
+        data = {}
+        for name, values in columns.items():
+            raw = values.tobytes()
+            if len(values) != rows or len(raw) != rows * array(COLUMNS[name][1]).itemsize:
+                raise ValueError(f"Column '{name}' must hold {rows} values of type {COLUMNS[name][2]}")
+            data[name] = raw
+
+        self.flush()
+        for name, raw in data.items():
+            self._files[name].write(raw)
+            self._files[name].flush()
+        self.rows += rows
+
+    def flush(self):
+        """Write buffered rows to disk"""
+        self.rows += len(self._buffers["edge"])
+        for name, buf in self._buffers.items():
+            if not buf:
+                continue
+            if sys.byteorder == "big":
+                buf.byteswap()
+            self._files[name].write(buf.tobytes())
+            self._files[name].flush()
+            del buf[:]
+
+    def close(self):
+        """Flush and close all column files"""
+        self.flush()
+        for f in self._files.values():
+            f.close()
+
+
+class EventLogOutput:
+    """Record button edges to an event log, then forward them to an output"""
+
+    def __init__(self, output, writer: EventLogWriter):
+        self.output = output
+        self.writer = writer
+
+    def set_button(self, button: int, pressed: bool):
+        """Log a button edge and forward it"""
+        self.writer.append(button, pressed)
+        self.output.set_button(button, pressed)
+
+    def close(self):
+        """Close the log and the wrapped output"""
+        self.writer.close()
+        if hasattr(self.output, "close"):
+            self.output.close()
+
+    def format_stats(self) -> str:
+        """Format wrapped output counters, if any"""
+        if hasattr(self.output, "format_stats"):
+            return self.output.format_stats()
+        return f"Event log: {self.writer.log_dir}"
+
+
+def iter_rows(log_dir: str, device_map: Optional[Sequence[int]] = None,
+              chunk_rows: int = 65536) -> Iterator[Tuple[int, int, int, int]]:
+    """Stream (timestamp, device, button, edge) rows in file order
+
+    Columns are read ``chunk_rows`` at a time, so memory does not grow
+    with the log size. ``device_map`` translates device indices, e.g. into
+    the device table of another log.
+    """
+    path = Path(log_dir)
+    remaining = row_count(path)
+    files = {name: open(path / spec[0], "rb") for name, spec in COLUMNS.items()}
+    try:
+        while remaining:
+            count = min(chunk_rows, remaining)
+            chunk = {}
+            for name, (_, typecode, _) in COLUMNS.items():
+                values = array(typecode)
+                values.fromfile(files[name], count)
+                if sys.byteorder == "big":
+                    values.byteswap()
+                chunk[name] = values
+            devices = chunk["device"]
+            if device_map is not None:
+                devices = [device_map[d] for d in devices]
+            yield from zip(chunk["timestamp"], devices, chunk["button"], chunk["edge"])
+            remaining -= count
+    finally:
+        for f in files.values():
+            f.close()
+
+
+def merge_logs(inputs: List[str], output_dir: str, chunk_rows: int = 65536) -> int:
+    """Merge per-device event logs into one timeline ordered by timestamp
+
+    A streaming k-way heap merge: memory is bounded by one chunk per input,
+    not by log size. Ties on equal timestamps keep the order of ``inputs``
+    (then file order), so the result is deterministic. Each input is
+    expected to be in timestamp order, as written by the readers.
+    Inputs stay distinct devices: a device name already used by an
+    earlier input gets the input's position as a suffix (e.g. two logs of
+    "Button Box" become "Button Box" and "Button Box #2").
+    Returns the number of merged rows.
+    """
+    writer = EventLogWriter(output_dir, flush_every=chunk_rows)
+    if writer.rows:
+        writer.close()
+        raise ValueError(f"Output log already contains events: {output_dir}")
+
+    streams = []
+    owners: Dict[str, int] = {}     # merged device name -> input position
+    for position, log_dir in enumerate(inputs, 1):
+        device_map = []
+        for name in _read_meta(Path(log_dir))["devices"]:
+            while owners.setdefault(name, position) != position:
+                name = f"{name} #{position}"
+            device_map.append(writer.add_device(name))
+        streams.append(iter_rows(log_dir, device_map, chunk_rows))
+
+    rows = 0
+    append = writer.append_row
+    try:
+        for row in heapq.merge(*streams, key=itemgetter(0)):
+            append(*row)
+            rows += 1
+    finally:
+        writer.close()
+    return rows
+
+
+def load_columns(log_dir: str) -> Dict[str, "np.ndarray"]:
+    """Memory-map all columns of an event log"""
+    path = Path(log_dir)
+    rows = row_count(path)
+    columns = {}
+    for name, (file_name, _, dtype) in COLUMNS.items():
+        if rows == 0:
+            columns[name] = np.zeros(0, dtype=dtype)
+        else:
+            columns[name] = np.memmap(path / file_name, dtype=dtype, mode="r", shape=(rows,))
+    return columns
+
+
+def analyze(log_dir: str, chatter_ms: float = 15.0) -> Dict:
+    """Compute per-button usage and wear statistics for an event log"""
+    meta = _read_meta(Path(log_dir))
+    cols = load_columns(log_dir)
+
+    key = (cols["device"].astype(np.int64) << 8) | cols["button"]
+    order = np.lexsort((cols["timestamp"], key))
+    k = key[order]
+    t = cols["timestamp"][order]
+    pressed = cols["edge"][order] == EDGE_PRESSED
+
+    same = k[1:] == k[:-1]
+    dt = np.diff(t)
+
+    # press -> release of the same button
+    hold_mask = same & pressed[:-1] & ~pressed[1:]
+    holds = dt[hold_mask]
+    hold_keys = k[:-1][hold_mask]
+
+    # release -> press of the same button within the bounce window
+    threshold = int(chatter_ms * 1e6)
+    gap_mask = same & ~pressed[:-1] & pressed[1:] & (dt < threshold)
+    chatter_keys = k[:-1][gap_mask]
+
+    # press -> next press of the same button
+    pk = k[pressed]
+    ipi_mask = pk[1:] == pk[:-1]
+    intervals = np.diff(t[pressed])[ipi_mask]
+    interval_keys = pk[:-1][ipi_mask]
+
+    press_keys, press_counts = np.unique(pk, return_counts=True)
+    chatter_ids, chatter_counts = np.unique(chatter_keys, return_counts=True)
+    chatter = dict(zip(chatter_ids.tolist(), chatter_counts.tolist()))
+
+    def grouped_percentiles(values, keys):
+        if not len(values):
+            return {}
+        idx = np.argsort(keys, kind="stable")
+        sorted_keys = keys[idx]
+        sorted_values = values[idx] / 1e6
+        ids, starts = np.unique(sorted_keys, return_index=True)
+        groups = np.split(sorted_values, starts[1:])
+        return {
+            int(i): np.percentile(g, [50, 95]).tolist() for i, g in zip(ids, groups)
+        }
+
+    hold_pct = grouped_percentiles(holds, hold_keys)
+    interval_pct = grouped_percentiles(intervals, interval_keys)
+
+    buttons = []
+    for key_id, presses in zip(press_keys.tolist(), press_counts.tolist()):
+        buttons.append({
+            "device": meta["devices"][key_id >> 8],
+            "button": key_id & 0xFF,
+            "presses": presses,
+            "hold_ms_p50": hold_pct.get(key_id, [None, None])[0],
+            "hold_ms_p95": hold_pct.get(key_id, [None, None])[1],
+            "interval_ms_p50": interval_pct.get(key_id, [None, None])[0],
+            "chatter": chatter.get(key_id, 0),
+            "chatter_rate": chatter.get(key_id, 0) / presses,
+        })
+
+    hold_ms = holds / 1e6
+    hist_edges = [0, 10, 25, 50, 100, 250, 500, 1000, 5000, np.inf]
+    hold_hist, _ = np.histogram(hold_ms, bins=hist_edges)
+
+    used = {(b["device"], b["button"]) for b in buttons}
+    unused = {
+        device: [n for n in range(1, 33) if (device, n) not in used]
+        for device in meta["devices"]
+    }
+
+    return {
+        "events": int(len(k)),
+        "devices": meta["devices"],
+        "buttons": buttons,
+        "unused": unused,
+        "hold_histogram": list(zip(hist_edges[:-1], hold_hist.tolist())),
+        "chatter_ms": chatter_ms,
+    }
+
+
+def print_report(report: Dict, top: int = 10):
+    """Print an analysis report"""
+    print("=" * 70)
+    print(f"Event Log Analysis ({report['events']} events)")
+    print("=" * 70)
+
+    for device in report["devices"]:
+        counts = {b["button"]: b["presses"] for b in report["buttons"] if b["device"] == device}
+        print(f"\n{device} - press heatmap (buttons 1-32):")
+        for row in range(4):
+            cells = [f"{counts.get(row * 8 + col + 1, 0):>8}" for col in range(8)]
+            print("  " + "".join(cells))
+        if report["unused"].get(device):
+            print(f"  Unused: {', '.join(str(n) for n in report['unused'][device])}")
+
+    print(f"\nHold-time distribution:")
+    for low, count in report["hold_histogram"]:
+        print(f"  >= {low:>6} ms: {count}")
+
+    suspects = sorted((b for b in report["buttons"] if b["chatter"]),
+                      key=lambda b: b["chatter_rate"], reverse=True)[:top]
+    print(f"\nChatter candidates (re-press < {report['chatter_ms']} ms after release):")
+    if not suspects:
+        print("  None")
+    for b in suspects:
+        print(f"  {b['device']} button {b['button']}: {b['chatter']} bounces "
+              f"({b['chatter_rate'] * 100:.1f}% of {b['presses']} presses)")
+
+    print(f"\nPer-button timing (ms):")
+    print(f"  {'Device':<20}{'Button':>7}{'Presses':>9}{'Hold p50':>10}{'Hold p95':>10}{'Gap p50':>10}")
+    for b in sorted(report["buttons"], key=lambda b: b["presses"], reverse=True):
+        fmt = lambda v: f"{v:>10.1f}" if v is not None else f"{'-':>10}"
+        print(f"  {b['device']:<20}{b['button']:>7}{b['presses']:>9}"
+              f"{fmt(b['hold_ms_p50'])}{fmt(b['hold_ms_p95'])}{fmt(b['interval_ms_p50'])}")
+    print("=" * 70)
+
+
+def write_synthetic(log_dir: str, events: int, device_name: str = "Synthetic Box",
+                    seed: int = 0, chunk_pairs: int = 1_000_000):
+    """Write a synthetic log of random press/release pairs"""
+    rng = np.random.default_rng(seed)
+    writer = EventLogWriter(log_dir, device_name)
+
+    start_ns = time.time_ns()
+    remaining = events // 2
+    while remaining:
+        pairs = min(chunk_pairs, remaining)
+        buttons = rng.integers(1, 33, pairs, dtype=np.uint8)
+        starts = np.cumsum(rng.exponential(200e6, pairs)).astype(np.int64) + start_ns
+        holds = rng.gamma(2.0, 40e6, pairs).astype(np.int64) + 1_000_000
+        start_ns = int(starts[-1] + holds.max())
+
+        ts = np.empty(pairs * 2, dtype="<i8")
+        ts[0::2] = starts
+        ts[1::2] = starts + holds
+        btn = np.repeat(buttons, 2)
+        edge = np.tile(np.array([EDGE_PRESSED, EDGE_RELEASED], dtype=np.uint8), pairs)
+
+        order = np.argsort(ts, kind="stable")
+        ts, btn, edge = ts[order], btn[order], edge[order]
+        device = np.full(pairs * 2, writer.device, dtype="<u2")
+
+        writer.append_columns(ts, device, btn, edge)
+        remaining -= pairs
+    writer.close()
+
+
+def _peak_memory_mb() -> Optional[float]:
+    """Peak resident memory of this process in MB (None if unavailable)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description="Analyze Button Box event logs",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Examples:
+  # Record events while reading
+  python serial_reader.py --event-log logs/session --device-name "Button Box"
+
+  # Press counts, hold times, intervals and chatter candidates
+  python3 event_log.py analyze logs/session
+
+  # Merge logs recorded at the same time into one timeline
+  python3 event_log.py merge logs/merged logs/shifter logs/buttons
+
+  # Benchmark analysis on 5 million synthetic events
+  python3 event_log.py synth /tmp/bench_log --events 5000000
+  python3 event_log.py analyze /tmp/bench_log
+        """
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_analyze = sub.add_parser("analyze", help="Analyze an event log")
+    p_analyze.add_argument("log_dir")
+    p_analyze.add_argument("--chatter-ms", type=float, default=15.0,
+                           help="Release-to-press gap counted as chatter (default: 15)")
+    p_analyze.add_argument("--top", type=int, default=10,
+                           help="Number of chatter candidates to show (default: 10)")
+    p_analyze.add_argument("--json", action="store_true",
+                           help="Print the report as JSON")
+
+    p_merge = sub.add_parser("merge", help="Merge per-device logs into one timeline")
+    p_merge.add_argument("output_dir")
+    p_merge.add_argument("inputs", nargs="+")
+    p_merge.add_argument("--chunk-rows", type=int, default=65536,
+                         help="Rows buffered per input (default: 65536)")
+
+    p_synth = sub.add_parser("synth", help="Write a synthetic log for benchmarking")
+    p_synth.add_argument("log_dir")
+    p_synth.add_argument("--events", type=int, default=1_000_000,
+                         help="Number of events (default: 1000000)")
+    p_synth.add_argument("--device-name", default="Synthetic Box",
+                         help="Device name (default: Synthetic Box)")
+    p_synth.add_argument("--seed", type=int, default=0,
+                         help="Random seed (default: 0)")
+
+    args = parser.parse_args()
+
+    if not HAS_NUMPY and args.command != "merge":
+        print("Error: numpy is required for analysis")
+        print("Install with: pip install numpy")
+        return 1
+
+    try:
+        if args.command == "merge":
+            start = time.perf_counter()
+            rows = merge_logs(args.inputs, args.output_dir, args.chunk_rows)
+            elapsed = time.perf_counter() - start
+            size_mb = sum(row_count(Path(p)) for p in args.inputs) * 12 / (1024 * 1024)
+            print(f"Merged {rows} events ({size_mb:.1f} MB) from {len(args.inputs)} logs "
+                  f"in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:,.0f} events/s)")
+            peak = _peak_memory_mb()
+            if peak is not None:
+                print(f"Peak memory: {peak:.1f} MB")
+            return 0
+
+        if args.command == "synth":
+            start = time.perf_counter()
+            write_synthetic(args.log_dir, args.events, args.device_name, args.seed)
+            print(f"Wrote {args.events} events in {time.perf_counter() - start:.2f}s")
+            return 0
+
+        start = time.perf_counter()
+        report = analyze(args.log_dir, args.chatter_ms)
+        elapsed = time.perf_counter() - start
+
+        if args.json:
+            print(json.dumps(report, indent=2, default=float))
+        else:
+            print_report(report, args.top)
+            print(f"Analyzed in {elapsed:.2f}s")
+        return 0
+
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,36 +11,18 @@ import argparse
 from pathlib import Path
 from typing import Optional, List
 
-# MCU Fuse Configurations for V-USB
-MCU_FUSES = {
-    "atmega328p": {
-        "low": "0xdf",
-        "high": "0xda",
-        "extended": "0x05",
-        "lock": "0x0f",
-        "unlock": "0x3f"
-    },
-    "atmega32u4": {
-        "low": "0xdf",
-        "high": "0xd9",
-        "extended": "0xc3",
-        "lock": "0x0f",
-        "unlock": "0x3f"
-    },
-    "attiny85": {
-        "low": "0xe1",
-        "high": "0xdd",
-        "extended": "0xff",
-        "lock": "0x0f",
-        "unlock": "0x3f"
-    }
-}
+from device_catalog import DEFAULT_FUSES, DeviceCatalog, get_catalog
+
+# MCU Fuse Configurations for V-USB (defaults; the effective set comes from the device catalog)
+MCU_FUSES = DEFAULT_FUSES
 
 class BootloaderFlasher:
-    def __init__(self, programmer: str = "avrisp", port: str = None, baud: int = 19200):
+    def __init__(self, programmer: str = "avrisp", port: str = None, baud: int = 19200,
+                 catalog: Optional[DeviceCatalog] = None):
         self.programmer = programmer
         self.port = port
         self.baud = baud
+        self.catalog = catalog or get_catalog()
     
     def check_avrdude(self) -> bool:
         """Check if avrdude is installed"""
@@ -138,10 +120,11 @@ class BootloaderFlasher:
     def set_fuses(self, mcu: str, fuses: dict = None) -> bool:
         """Set MCU fuses for V-USB"""
         if fuses is None:
-            if mcu not in MCU_FUSES:
+            record = self.catalog.fuses_for(mcu)
+            if record is None:
                 print(f"❌ Unknown MCU: {mcu}")
                 return False
-            fuses = MCU_FUSES[mcu]
+            fuses = record._asdict()
         
         print(f"\n⚙️  Setting fuses for {mcu}...")
         print(f"   Low:      {fuses['low']}")
@@ -253,8 +236,8 @@ Examples:
         """
     )
     
-    parser.add_argument("--mcu", choices=MCU_FUSES.keys(),
-                       help="Target MCU")
+    parser.add_argument("--mcu",
+                       help="Target MCU (atmega328p, atmega32u4, attiny85, ...)")
     parser.add_argument("--hex", help="Bootloader hex file to flash")
     parser.add_argument("--port", help="Serial port (COM3, /dev/ttyUSB0, etc)")
     parser.add_argument("--programmer", default="avrisp",
@@ -273,11 +256,18 @@ Examples:
                        help="Detect available serial ports")
     parser.add_argument("--check-deps", action="store_true",
                        help="Check if avrdude is installed")
+    parser.add_argument("--config", default=None,
+                       help="Device catalog config file (default: device_config.json)")
     
     args = parser.parse_args()
     
     try:
-        flasher = BootloaderFlasher(args.programmer, args.port, args.baud)
+        catalog = get_catalog(args.config)
+        if args.mcu and catalog.fuses_for(args.mcu) is None:
+            print(f"❌ Error: Unknown MCU: {args.mcu}. Available: {', '.join(catalog.fuses)}")
+            return 1
+        
+        flasher = BootloaderFlasher(args.programmer, args.port, args.baud, catalog=catalog)
         
         if args.check_deps:
             if flasher.check_avrdude():
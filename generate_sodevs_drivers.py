@@ -4,28 +4,11 @@ Generate SODevs V-USB Driver Packages
 Script para gerar drivers customizados para múltiplos Button Box com VID/PID diferentes
 """
 
-import subprocess
 import sys
+import time
 from pathlib import Path
 
-
-def generate_driver(name: str, manufacturer: str, vendor_id: str, product_id: str):
-    """Generate a single driver package"""
-    print(f"\n{'='*70}")
-    print(f"Gerando driver: {name}")
-    print(f"{'='*70}")
-    
-    cmd = [
-        "python3",
-        "generate_vusb_driver.py",
-        "--name", name,
-        "--manufacturer", manufacturer,
-        "--vendor-id", vendor_id,
-        "--product-id", product_id
-    ]
-    
-    result = subprocess.run(cmd)
-    return result.returncode == 0
+from generate_vusb_driver import PackageSpec, VUSBDriverGenerator
 
 
 def main():
@@ -62,26 +45,35 @@ def main():
     
     print(f"\nGerando {len(devices)} drivers...\n")
     
+    # Todos os pacotes são gerados neste processo, sem um subprocesso por device
+    generator = VUSBDriverGenerator()
+    specs = [
+        PackageSpec(d["name"], d["vendor_id"], d["product_id"], d["manufacturer"])
+        for d in devices
+    ]
+    
+    # Só os ZIPs prontos para distribuição, já com o instalador se ele foi compilado
+    installer = Path("dist") / "V-USB Driver Installer.exe"
+    extras = {installer.name: installer} if installer.exists() else None
+    start = time.perf_counter()
+    results = generator.generate_batch(specs, archive=True, extras=extras)
+    elapsed = time.perf_counter() - start
+    
     success_count = 0
     failed_count = 0
     
-    for device in devices:
+    for device, result in zip(devices, results):
         print(f"\n📦 {device['description']}")
         print(f"   Nome: {device['name']}")
         print(f"   Fabricante: {device['manufacturer']}")
         print(f"   VID: {device['vendor_id']} | PID: {device['product_id']}")
         
-        if generate_driver(
-            device["name"],
-            device["manufacturer"],
-            device["vendor_id"],
-            device["product_id"]
-        ):
+        if result.error is None:
             success_count += 1
-            print(f"   ✅ Sucesso!")
+            print(f"   ✅ Sucesso! ({result.seconds * 1e3:.1f} ms) → {result.path}")
         else:
             failed_count += 1
-            print(f"   ❌ Falha!")
+            print(f"   ❌ Falha: {result.error}")
     
     # Summary
     print(f"\n{'='*70}")
@@ -89,14 +81,17 @@ def main():
     print(f"{'='*70}")
     print(f"✅ Sucesso: {success_count}/{len(devices)}")
     print(f"❌ Falha: {failed_count}/{len(devices)}")
+    print(f"⏱  Tempo total: {elapsed:.3f}s")
     
     if failed_count == 0:
         print(f"\n✅ Todos os drivers foram gerados com sucesso!")
-        print(f"\nDrivers disponíveis em: vusb_drivers/")
-        print(f"\nPróximos passos:")
-        print(f"  1. Compilar executável: python build_windows_installer.py")
-        print(f"  2. Copiar para cada pasta de driver")
-        print(f"  3. Zipar cada pasta para distribuição")
+        print(f"\nDrivers disponíveis em: vusb_drivers/*.zip")
+        if extras:
+            print(f"ZIPs já incluem o instalador e estão prontos para distribuição")
+        else:
+            print(f"\nPróximos passos:")
+            print(f"  1. Compilar executável: python build_windows_installer.py")
+            print(f"  2. Rodar este script de novo para incluir o executável nos ZIPs")
         return 0
     else:
         print(f"\n❌ Alguns drivers falharam na geração")
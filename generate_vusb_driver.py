@@ -4,214 +4,672 @@ Generate customized V-USB driver package with INF file
 """
 
 import argparse
+import csv
+import filecmp
+import hashlib
+import itertools
+import json
+import os
 import shutil
+import subprocess
 import sys
+import tempfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    HAS_RESOURCE = False
 
-class VUSBDriverGenerator:
-    """Generate customized V-USB driver packages"""
-    
-    def __init__(self, output_dir: str = "vusb_drivers"):
-        self.output_dir = Path(output_dir)
-        self.output_dir.mkdir(exist_ok=True)
-        self.template_path = Path(__file__).parent / "vusb_driver_template.inf"
-    
-    def generate_inf(self, device_name: str, vendor_id: str, product_id: str,
-                     manufacturer: str = "V-USB Project") -> str:
-        """Generate INF file content"""
-        
-        # Ensure vendor_id and product_id are in correct format (without 0x)
-        vendor_id = vendor_id.replace("0x", "").upper()
-        product_id = product_id.replace("0x", "").upper()
-        
-        # Pad to 4 digits
-        vendor_id = vendor_id.zfill(4)
-        product_id = product_id.zfill(4)
-        
-        inf_content = f"""[Version]
-Signature="$Windows NT$"
-Class=USB
-ClassGuid={{36FC9E60-C465-11CF-8056-444553540000}}
-Provider=%MANUFACTURER%
-DriverVer=01/01/2024,1.0.0.0
-CatalogFile=vusb_driver.cat
+from driver_templates import (FAMILY_INF_TEMPLATE, FAMILY_README_TEMPLATE, INF_TEMPLATE,
+                              INSTALL_TEMPLATE, README_TEMPLATE, DriverTemplates,
+                              TemplateCache, manufacturer_dir_name)
 
-[Manufacturer]
-%MANUFACTURER%=Devices,NT,NTx86
 
-[Devices.NT]
-%DEVICE_NAME%=USB_Install, USB\VID_{vendor_id}&PID_{product_id}
+class PackageSpec(NamedTuple):
+    """One driver package to generate"""
+    name: str
+    vendor_id: str
+    product_id: str
+    manufacturer: str = "V-USB Project"
 
-[Devices.NTx86]
-%DEVICE_NAME%=USB_Install, USB\VID_{vendor_id}&PID_{product_id}
 
-[USB_Install.NT]
-Include=winusb.inf
-Needs=WinUSB.NT
+class PackageResult(NamedTuple):
+    """Outcome of generating one package in a batch"""
+    name: str
+    path: Optional[Path]
+    seconds: float
+    error: Optional[str] = None
+    status: str = "created"             # "created", "updated" or "unchanged"
+    rewritten: Tuple[str, ...] = ()     # files written (or removed) by this run
 
-[USB_Install.NT.Services]
-Include=winusb.inf
-AddService=WinUSB,0x00000002,WinUSB_ServiceInstall
 
-[WinUSB_ServiceInstall]
-DisplayName="WinUSB Driver"
-ServiceType=1
-StartType=3
-ErrorControl=1
-ServiceBinary=%12%\WinUSB.sys
+class FamilyDevice(NamedTuple):
+    """One hardware ID listed in a consolidated INF"""
+    name: str
+    vid: str            # 4 upper-case hex digits, as in USB\VID_xxxx
+    pid: str
+    string_key: str     # [Strings] key of the device name, e.g. DEVICE_0001
 
-[USB_Install.NT.Wmi]
-Include=winusb.inf
-Needs=WinUSB.NT.Wmi
 
-[USB_Install.NT.CoInstallers]
-AddReg=CoInstallers_AddReg
-CopyFiles=CoInstallers_CopyFiles
+# Per-package record of inputs and output hashes, used to skip unchanged files
+PACKAGE_MANIFEST = ".vusb_package.json"
+PACKAGE_MANIFEST_VERSION = 1
 
-[CoInstallers_AddReg]
-HKR,,CoInstallers32,0x00010000,"WinUSBCoInstaller.dll"
+# Fixed entry metadata so the same package always gives the same ZIP bytes
+ARCHIVE_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+ARCHIVE_FILE_MODE = 0o100644
 
-[CoInstallers_CopyFiles]
-WinUSBCoInstaller.dll
 
-[DestinationDirs]
-CoInstallers_CopyFiles=11
+def _archive_entry(name: str) -> zipfile.ZipInfo:
+    """ZIP entry header with fixed timestamp, permissions and host system"""
+    info = zipfile.ZipInfo(name, ARCHIVE_DATE_TIME)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.create_system = 3
+    info.external_attr = ARCHIVE_FILE_MODE << 16
+    return info
 
-[SourceDisksNames]
-1="V-USB Driver Installation Disk"
 
-[SourceDisksFiles]
-WinUSBCoInstaller.dll=1
+def load_manifest(path: str, manufacturer: str = "V-USB Project") -> List[PackageSpec]:
+    """Read devices from a JSON manifest or device_config.json
+    
+    Accepts a list of {"name", "vendor_id", "product_id", "manufacturer"}
+    objects, or an object whose "devices" is such a list or a
+    device_config.json style name -> settings mapping.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    
+    entries = data.get("devices", []) if isinstance(data, dict) else data
+    if isinstance(entries, dict):
+        entries = [{"name": name, **fields} for name, fields in entries.items()]
+    
+    return [spec_from_row(entry, manufacturer) for entry in entries]
 
-[Strings]
-MANUFACTURER="{manufacturer}"
-DEVICE_NAME="{device_name}"
-VENDOR_ID={vendor_id}
-PRODUCT_ID={product_id}
-"""
-        return inf_content
+
+def spec_from_row(row: Dict[str, str], manufacturer: str = "V-USB Project") -> PackageSpec:
+    """Build a package spec from one manifest entry or CSV row"""
+    if isinstance(row, dict) and "_invalid" in row:
+        raise ValueError(f"Invalid manifest {row['_invalid']}")
+    try:
+        spec = PackageSpec(
+            row["name"],
+            row["vendor_id"],
+            row["product_id"],
+            row.get("manufacturer") or manufacturer
+        )
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"Invalid manifest entry {row!r}: missing {e}")
+    try:
+        _usb_id_digits(spec.vendor_id)
+        _usb_id_digits(spec.product_id)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid manifest entry {row!r}: bad VID/PID")
+    if not str(spec.name).strip():
+        raise ValueError(f"Invalid manifest entry {row!r}: empty name")
+    return spec
+
+
+def iter_manifest_rows(path: str) -> Iterator[Dict[str, str]]:
+    """Read a CSV or JSON-lines manifest one row at a time
+    
+    CSV files need a header with name, vendor_id, product_id and
+    optionally manufacturer. Any other file is read as JSON lines, one
+    object per line; blank lines are skipped.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        if Path(path).suffix.lower() == ".csv":
+            yield from csv.DictReader(f)
+            return
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {"_invalid": f"line {line_number}: {e}"}
+
+
+# Streaming runs record how many manifest rows are done, to resume after an interruption
+CHECKPOINT_VERSION = 1
+
+
+def peak_memory_mb() -> Optional[float]:
+    """Get the peak resident memory of this process in MB (None if unknown)"""
+    if not HAS_RESOURCE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024   # bytes on macOS
+
+
+class StreamProgress:
+    """Counters of a streaming run; no per-row results are kept"""
+    
+    __slots__ = ("rows", "resumed", "counts", "failures", "started")
+    
+    MAX_FAILURES = 20   # errors kept for the report
+    
+    def __init__(self, resumed: int = 0, counts: Optional[Dict[str, int]] = None):
+        self.rows = resumed         # rows finished, including earlier runs
+        self.resumed = resumed
+        self.counts = {"created": 0, "updated": 0, "unchanged": 0, "failed": 0, **(counts or {})}
+        self.failures: List[str] = []
+        self.started = time.perf_counter()
+    
+    def record(self, result: PackageResult):
+        """Count one finished row"""
+        self.rows += 1
+        if result.error is None:
+            self.counts[result.status] += 1
+            return
+        self.counts["failed"] += 1
+        if len(self.failures) < self.MAX_FAILURES:
+            self.failures.append(f"{result.name}: {result.error}")
+    
+    def format_stats(self) -> str:
+        """Get a one-line summary of the run so far"""
+        elapsed = time.perf_counter() - self.started
+        rate = (self.rows - self.resumed) / elapsed if elapsed > 0 else 0.0
+        line = (f"{self.rows} rows ({self.counts['created']} created, "
+                f"{self.counts['updated']} updated, {self.counts['unchanged']} unchanged, "
+                f"{self.counts['failed']} failed), {rate:.0f} rows/s")
+        peak = peak_memory_mb()
+        if peak is not None:
+            line += f", peak memory {peak:.1f} MB"
+        return line
+
+
+def _usb_id_digits(value: str) -> str:
+    """Parse a VID/PID (0x16c0 or 16c0) into 4 upper-case hex digits"""
+    number = int(value, 16)
+    if not 0 <= number <= 0xFFFF:
+        raise ValueError(f"{value} is out of range")
+    return f"{number:04X}"
+
+
+def _inf_string(text: str) -> str:
+    """Escape text for a quoted INF [Strings] value"""
+    return text.replace('"', '""').replace("%", "%%")
+
+
+def family_devices(devices: Iterable[PackageSpec]) -> Tuple[List[FamilyDevice], List[str]]:
+    """Validate and deduplicate the devices of a consolidated INF
+    
+    Returns the devices in input order plus warnings about skipped
+    duplicates. Raises ValueError listing every invalid device.
+    """
+    entries: List[FamilyDevice] = []
+    seen: Dict[Tuple[str, str], str] = {}
+    errors = []
+    warnings = []
+    repeated = 0
+    
+    for spec in devices:
+        name = spec.name.strip()
+        try:
+            vid = _usb_id_digits(spec.vendor_id)
+            pid = _usb_id_digits(spec.product_id)
+        except (TypeError, ValueError):
+            errors.append(f"{spec.name!r}: invalid VID/PID {spec.vendor_id}/{spec.product_id}")
+            continue
+        if not name or any(c in name for c in "\r\n"):
+            errors.append(f"{spec.name!r}: invalid device name")
+            continue
+        
+        first = seen.get((vid, pid))
+        if first is not None:
+            if first == name:
+                repeated += 1
+            else:
+                warnings.append(f"VID_{vid}&PID_{pid} of {name!r} already listed as {first!r}, skipped")
+            continue
+        seen[(vid, pid)] = name
+        entries.append(FamilyDevice(name, vid, pid, f"DEVICE_{len(entries) + 1:04d}"))
+    
+    if repeated:
+        warnings.append(f"{repeated} repeated device entries skipped")
+    if errors:
+        raise ValueError("Invalid devices:\n  " + "\n  ".join(errors))
+    if not entries:
+        raise ValueError("No devices to put in the INF")
+    return entries, warnings
+
+
+def _package_inputs(device_name: str, vendor_id: str, product_id: str,
+                    manufacturer: str, include_readme: bool) -> Dict[str, object]:
+    """Input parameters recorded in a package manifest"""
+    return {
+        "name": device_name,
+        "vendor_id": vendor_id,
+        "product_id": product_id,
+        "manufacturer": manufacturer,
+        "include_readme": include_readme,
+    }
+
+
+class VUSBDriverGenerator:
+    """Generate customized V-USB driver packages"""
+    
+    def __init__(self, output_dir: str = "vusb_drivers", template_dir: Optional[str] = None):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(exist_ok=True)
+        self.template_path = Path(__file__).parent / INF_TEMPLATE
+        self.templates = DriverTemplates(template_dir)
+    
+    def template_context(self, device_name: str, vendor_id: str, product_id: str,
+                         manufacturer: str = "V-USB Project") -> Dict[str, str]:
+        """Get the template placeholder values for one device"""
+        # INF hardware IDs: no 0x, upper case, 4 digits
+        vid = vendor_id.replace("0x", "").upper().zfill(4)
+        pid = product_id.replace("0x", "").upper().zfill(4)
+        return {
+            "device_name": device_name,
+            "manufacturer": manufacturer,
+            "vendor_id": vendor_id,
+            "product_id": product_id,
+            "vendor_id_digits": vendor_id.replace("0x", ""),
+            "product_id_digits": product_id.replace("0x", ""),
+            "vid": vid,
+            "pid": pid,
+        }
+    
+    def generate_inf(self, device_name: str, vendor_id: str, product_id: str,
+                     manufacturer: str = "V-USB Project") -> str:
+        """Generate INF file content"""
+        context = self.template_context(device_name, vendor_id, product_id, manufacturer)
+        return self.templates.render(INF_TEMPLATE, context, manufacturer)
+    
+    def package_dir(self, device_name: str) -> Path:
+        """Get the package directory for a device name"""
+        safe_name = device_name.replace(" ", "_").replace("/", "_")
+        return self.output_dir / f"vusb_driver_{safe_name}"
+    
+    def generate_readme(self, device_name: str, vendor_id: str, product_id: str,
+                        manufacturer: str = "V-USB Project") -> str:
+        """Generate README.txt content"""
+        context = self.template_context(device_name, vendor_id, product_id, manufacturer)
+        return self.templates.render(README_TEMPLATE, context, manufacturer)
+    
+    def generate_install_script(self, device_name: str,
+                                manufacturer: str = "V-USB Project") -> str:
+        """Generate install_driver.bat content"""
+        return self.templates.render(INSTALL_TEMPLATE, {"device_name": device_name}, manufacturer)
+    
+    def render_package(self, device_name: str, vendor_id: str, product_id: str,
+                       manufacturer: str = "V-USB Project",
+                       include_readme: bool = True) -> Dict[str, str]:
+        """Generate the contents of every package file (file name -> text)"""
+        files = {"vusb_driver.inf": self.generate_inf(device_name, vendor_id, product_id, manufacturer)}
+        if include_readme:
+            files["README.txt"] = self.generate_readme(device_name, vendor_id, product_id, manufacturer)
+        files["install_driver.bat"] = self.generate_install_script(device_name, manufacturer)
+        return files
+    
+    def generate_family_inf(self, entries: List[FamilyDevice],
+                            manufacturer: str = "V-USB Project") -> str:
+        """Generate one INF listing every hardware ID of a product family"""
+        context = {
+            "manufacturer": _inf_string(manufacturer),
+            "models": "\n".join(f"%{e.string_key}%=USB_Install, USB\\VID_{e.vid}&PID_{e.pid}"
+                                for e in entries),
+            "strings": "\n".join(f'{e.string_key}="{_inf_string(e.name)}"' for e in entries),
+        }
+        return self.templates.render(FAMILY_INF_TEMPLATE, context, manufacturer)
+    
+    def render_family(self, family_name: str, devices: Iterable[PackageSpec],
+                      manufacturer: str = "V-USB Project",
+                      include_readme: bool = True) -> Tuple[Dict[str, str], List[FamilyDevice], List[str]]:
+        """Generate the files of a consolidated package (files, devices, warnings)"""
+        entries, warnings = family_devices(devices)
+        files = {"vusb_driver.inf": self.generate_family_inf(entries, manufacturer)}
+        if include_readme:
+            table = ["| Device | VID | PID |", "|---|---|---|"]
+            table += [f"| {e.name} | 0x{e.vid.lower()} | 0x{e.pid.lower()} |" for e in entries]
+            files["README.txt"] = self.templates.render(FAMILY_README_TEMPLATE, {
+                "device_name": family_name,
+                "manufacturer": manufacturer,
+                "device_count": str(len(entries)),
+                "device_table": "\n".join(table),
+            }, manufacturer)
+        files["install_driver.bat"] = self.generate_install_script(family_name, manufacturer)
+        return files, entries, warnings
+    
+    def _read_manifest(self, driver_dir: Path) -> Dict:
+        """Read a package manifest (empty if missing or unreadable)"""
+        try:
+            manifest = json.loads((driver_dir / PACKAGE_MANIFEST).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if manifest.get("version") != PACKAGE_MANIFEST_VERSION:
+            return {}
+        return manifest
+    
+    def sync_package(self, driver_dir: Path, inputs: Dict[str, object], files: Dict[str, str],
+                     force: bool = False) -> Tuple[str, Tuple[str, ...]]:
+        """Write only the package files whose content changed
+        
+        A file is skipped when the manifest records the same content hash
+        and the file on disk still has the recorded size. Files no longer
+        generated are removed. Returns (status, rewritten files).
+        """
+        manifest = self._read_manifest(driver_dir)
+        recorded = manifest.get("files", {})
+        created = not manifest
+        driver_dir.mkdir(exist_ok=True)
+        
+        entries = {}
+        rewritten = []
+        for file_name, content in files.items():
+            digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+            path = driver_dir / file_name
+            entry = recorded.get(file_name)
+            if entry and not force and entry.get("sha256") == digest:
+                try:
+                    if path.stat().st_size == entry.get("size"):
+                        entries[file_name] = entry
+                        continue
+                except OSError:
+                    pass
+            path.write_text(content)
+            entries[file_name] = {"sha256": digest, "size": path.stat().st_size}
+            rewritten.append(file_name)
+        
+        for file_name in recorded:
+            if file_name not in files:
+                try:
+                    (driver_dir / file_name).unlink()
+                except OSError:
+                    pass
+                rewritten.append(file_name)
+        
+        if rewritten or manifest.get("inputs") != inputs:
+            manifest = {"version": PACKAGE_MANIFEST_VERSION, "inputs": inputs, "files": entries}
+            (driver_dir / PACKAGE_MANIFEST).write_text(json.dumps(manifest, indent=2, sort_keys=True),
+                                                       encoding="utf-8")
+        
+        if created:
+            return "created", tuple(rewritten)
+        return ("updated" if rewritten else "unchanged"), tuple(rewritten)
+    
+    def package_archive(self, device_name: str) -> Path:
+        """Get the ZIP archive path for a device name"""
+        return self.output_dir / f"{self.package_dir(device_name).name}.zip"
+    
+    def write_archive(self, archive_path: Path, files: Dict[str, str],
+                      extras: Optional[Dict[str, Path]] = None, force: bool = False) -> str:
+        """Stream package files into a reproducible ZIP archive
+        
+        Entries go under the package folder in sorted order, with fixed
+        timestamps and Windows line endings. ``extras`` maps archive names
+        to files copied in as-is (e.g. the installer executable). An
+        existing archive with identical bytes is left untouched. Returns
+        "created", "updated" or "unchanged".
+        """
+        folder = archive_path.stem
+        texts = {name: content.replace("\r\n", "\n").replace("\n", "\r\n").encode("utf-8")
+                 for name, content in files.items()}
+        extras = extras or {}
+        
+        temp_path = archive_path.with_name(archive_path.name + ".tmp")
+        try:
+            with zipfile.ZipFile(temp_path, "w") as archive:
+                for name in sorted({*texts, *extras}):
+                    info = _archive_entry(f"{folder}/{name}")
+                    if name in texts:
+                        archive.writestr(info, texts[name])
+                    else:
+                        with open(extras[name], "rb") as source, archive.open(info, "w") as target:
+                            shutil.copyfileobj(source, target, 1 << 20)
+            
+            existed = archive_path.exists()
+            if existed and not force and filecmp.cmp(temp_path, archive_path, shallow=False):
+                return "unchanged"
+            os.replace(temp_path, archive_path)
+            return "updated" if existed else "created"
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
     
     def generate_driver_package(self, device_name: str, vendor_id: str, product_id: str,
                                manufacturer: str = "V-USB Project",
-                               include_readme: bool = True) -> Optional[Path]:
-        """Generate complete driver package"""
+                               include_readme: bool = True,
+                               force: bool = False, archive: bool = False,
+                               extras: Optional[Dict[str, Path]] = None) -> Optional[Path]:
+        """Generate complete driver package (unchanged files are left untouched)"""
+        
+        files = self.render_package(device_name, vendor_id, product_id, manufacturer, include_readme)
+        
+        if archive:
+            archive_path = self.package_archive(device_name)
+            print(f"Generating driver archive: {archive_path}")
+            status = self.write_archive(archive_path, files, extras, force)
+            for file_name in sorted({*files, *(extras or {})}):
+                print(f"  {archive_path.stem}/{file_name}")
+            if status == "unchanged":
+                print(f"\n= Driver archive up to date: {archive_path}")
+            else:
+                print(f"\n✓ Driver archive {status}: {archive_path}")
+            return archive_path
         
         # Create driver directory
-        safe_name = device_name.replace(" ", "_").replace("/", "_")
-        driver_dir = self.output_dir / f"vusb_driver_{safe_name}"
-        driver_dir.mkdir(exist_ok=True)
+        driver_dir = self.package_dir(device_name)
         
         print(f"Generating driver package: {driver_dir}")
         
-        # Generate INF file
-        inf_content = self.generate_inf(device_name, vendor_id, product_id, manufacturer)
-        inf_file = driver_dir / "vusb_driver.inf"
-        inf_file.write_text(inf_content)
-        print(f"✓ Created: {inf_file.name}")
-        
-        # Create README
-        if include_readme:
-            readme_content = f"""# V-USB Driver for {device_name}
-
-## Device Information
-- **Manufacturer**: {manufacturer}
-- **Name**: {device_name}
-- **Vendor ID**: {vendor_id}
-- **Product ID**: {product_id}
-
-## Installation Instructions
-
-### Automatic Installation (Recommended)
-1. Run `V-USB Driver Installer.exe`
-2. Select your device from the dropdown
-3. Click "Detect Device"
-4. Click "Install Driver"
-
-### Manual Installation
-1. Connect your device to USB
-2. Open Device Manager (Win+X → Device Manager)
-3. Look for an unknown device with VID {vendor_id.replace('0x', '')} and PID {product_id.replace('0x', '')}
-4. Right-click → Update driver
-5. Choose "Browse my computer for driver software"
-6. Select this folder
-7. Click "Next" and follow the prompts
-
-### Manual Installation (Windows 10/11)
-1. Open PowerShell as Administrator
-2. Run: `pnputil /add-driver vusb_driver.inf /install`
-
-## Troubleshooting
-
-### Device not detected
-- Ensure the device is properly connected
-- Try a different USB port
-- Check Device Manager for unknown devices
-
-### Installation fails
-- Run as Administrator
-- Disable driver signature enforcement (Windows 10/11)
-- Try manual installation steps above
-
-### Driver signature enforcement
-On Windows 10/11, you may need to disable driver signature enforcement:
-1. Hold Shift and click Restart
-2. Select Troubleshoot → Advanced options → Startup Settings
-3. Press F7 to disable driver signature enforcement
-4. Restart and try installation again
-
-## Support
-For issues or questions, visit: https://www.obdev.at/products/vusb/
-
-## License
-V-USB is licensed under the GNU General Public License (GPL).
-See LICENSE file for details.
-"""
-            readme_file = driver_dir / "README.txt"
-            readme_file.write_text(readme_content)
-            print(f"✓ Created: {readme_file.name}")
-        
-        # Create installation batch script
-        batch_content = f"""@echo off
-REM V-USB Driver Installation Script
-REM Device: {device_name}
-
-echo Installing V-USB Driver for {device_name}...
-echo.
-
-REM Check for admin privileges
-net session >nul 2>&1
-if %errorlevel% neq 0 (
-    echo Error: This script requires administrator privileges.
-    echo Please run as Administrator.
-    pause
-    exit /b 1
-)
-
-REM Install driver
-echo Installing driver...
-pnputil /add-driver vusb_driver.inf /install
-
-if %errorlevel% equ 0 (
-    echo.
-    echo Success! Driver installed.
-    echo Please reconnect your device.
-) else (
-    echo.
-    echo Error: Installation failed.
-    echo Try manual installation or disable driver signature enforcement.
-)
-
-pause
-"""
-        batch_file = driver_dir / "install_driver.bat"
-        batch_file.write_text(batch_content)
-        print(f"✓ Created: {batch_file.name}")
+        inputs = _package_inputs(device_name, vendor_id, product_id, manufacturer, include_readme)
+        status, rewritten = self.sync_package(driver_dir, inputs, files, force)
+        action = "Created" if status == "created" else "Updated"
+        for file_name in rewritten:
+            print(f"✓ {action}: {file_name}" if file_name in files else f"✓ Removed: {file_name}")
+        for file_name in files:
+            if file_name not in rewritten:
+                print(f"= Unchanged: {file_name}")
         
-        print(f"\n✓ Driver package created: {driver_dir}")
+        if status == "unchanged":
+            print(f"\n✓ Driver package up to date: {driver_dir}")
+        else:
+            print(f"\n✓ Driver package {status}: {driver_dir}")
         return driver_dir
     
+    def generate_family_package(self, family_name: str, devices: Iterable[PackageSpec],
+                                manufacturer: str = "V-USB Project",
+                                include_readme: bool = True, force: bool = False,
+                                archive: bool = False,
+                                extras: Optional[Dict[str, Path]] = None) -> Optional[Path]:
+        """Generate one package whose INF covers a whole product family"""
+        files, entries, warnings = self.render_family(family_name, devices, manufacturer,
+                                                      include_readme)
+        for warning in warnings:
+            print(f"⚠ {warning}")
+        print(f"Consolidated INF: {len(entries)} hardware IDs")
+        
+        if archive:
+            path = self.package_archive(family_name)
+            status = self.write_archive(path, files, extras, force)
+        else:
+            path = self.package_dir(family_name)
+            inputs = {
+                "family": family_name,
+                "manufacturer": manufacturer,
+                "devices": [[e.name, e.vid, e.pid] for e in entries],
+                "include_readme": include_readme,
+            }
+            status, _ = self.sync_package(path, inputs, files, force)
+        
+        if status == "unchanged":
+            print(f"\n= Family package up to date: {path}")
+        else:
+            print(f"\n✓ Family package {status}: {path}")
+        return path
+    
+    def _build_package(self, spec: "PackageSpec", include_readme: bool,
+                       force: bool = False, archive: bool = False,
+                       extras: Optional[Dict[str, Path]] = None) -> "PackageResult":
+        """Generate one package quietly, timing it (runs on a pool thread)"""
+        start = time.perf_counter()
+        try:
+            files = self.render_package(spec.name, spec.vendor_id, spec.product_id,
+                                        spec.manufacturer, include_readme)
+            if archive:
+                archive_path = self.package_archive(spec.name)
+                status = self.write_archive(archive_path, files, extras, force)
+                return PackageResult(spec.name, archive_path, time.perf_counter() - start,
+                                     status=status,
+                                     rewritten=() if status == "unchanged" else (archive_path.name,))
+            driver_dir = self.package_dir(spec.name)
+            inputs = _package_inputs(spec.name, spec.vendor_id, spec.product_id,
+                                     spec.manufacturer, include_readme)
+            status, rewritten = self.sync_package(driver_dir, inputs, files, force)
+        except (OSError, ValueError) as e:
+            return PackageResult(spec.name, None, time.perf_counter() - start, str(e))
+        return PackageResult(spec.name, driver_dir, time.perf_counter() - start,
+                             status=status, rewritten=rewritten)
+    
+    def generate_batch(self, devices: Iterable["PackageSpec"], workers: Optional[int] = None,
+                       include_readme: bool = True, force: bool = False, archive: bool = False,
+                       extras: Optional[Dict[str, Path]] = None) -> List["PackageResult"]:
+        """Generate many packages in this process, writing on a thread pool
+        
+        Results keep the order of ``devices``. Devices whose names map to
+        the same package directory are reported as failed instead of
+        overwriting each other. Unchanged packages are skipped unless
+        ``force`` is set. With ``archive`` every package is written as a
+        ZIP archive instead of a directory.
+        """
+        specs = list(devices)
+        seen = {}
+        duplicates = set()
+        for i, spec in enumerate(specs):
+            key = self.package_dir(spec.name).name.lower()
+            if key in seen:
+                duplicates.add(i)
+            seen.setdefault(key, i)
+        
+        results: List[Optional[PackageResult]] = [None] * len(specs)
+        todo = [i for i in range(len(specs)) if i not in duplicates]
+        for i in duplicates:
+            results[i] = PackageResult(specs[i].name, None, 0.0,
+                                       f"duplicate package directory {self.package_dir(specs[i].name).name}")
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            built = pool.map(lambda i: self._build_package(specs[i], include_readme, force,
+                                                           archive, extras), todo)
+            for i, result in zip(todo, built):
+                results[i] = result
+        return results
+    
+    def checkpoint_path(self, manifest: str) -> Path:
+        """Get the default checkpoint file of a streaming run"""
+        return self.output_dir / f".{Path(manifest).name}.checkpoint.json"
+    
+    def _load_checkpoint(self, checkpoint: Path, run: Dict[str, object]) -> Dict:
+        """Read a checkpoint, ignoring it if it belongs to another manifest or run"""
+        try:
+            state = json.loads(checkpoint.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if state.get("version") != CHECKPOINT_VERSION or state.get("run") != run:
+            print(f"Ignoring checkpoint {checkpoint}: manifest or options changed")
+            return {}
+        return state
+    
+    def _save_checkpoint(self, checkpoint: Path, run: Dict[str, object], progress: StreamProgress):
+        """Atomically record the rows finished so far"""
+        state = {"version": CHECKPOINT_VERSION, "run": run,
+                 "rows_done": progress.rows, "counts": progress.counts}
+        temp_path = checkpoint.with_name(checkpoint.name + ".tmp")
+        temp_path.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(temp_path, checkpoint)
+    
+    def generate_stream(self, manifest: str, workers: Optional[int] = None,
+                        manufacturer: str = "V-USB Project", include_readme: bool = True,
+                        force: bool = False, archive: bool = False,
+                        extras: Optional[Dict[str, Path]] = None,
+                        checkpoint: Optional[Path] = None, restart: bool = False,
+                        report_every: float = 2.0) -> StreamProgress:
+        """Generate one package per row of a CSV/JSON-lines manifest
+        
+        Rows are read lazily and only a few per worker are in flight, so
+        memory stays flat however long the manifest is. Finished rows are
+        checkpointed about once a second; an interrupted run resumes after
+        the last checkpointed row. The checkpoint is removed once the whole
+        manifest is done.
+        """
+        workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        window = workers * 4
+        checkpoint = Path(checkpoint) if checkpoint else self.checkpoint_path(manifest)
+        stat = os.stat(manifest)
+        run = {
+            "manifest": str(Path(manifest).resolve()),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "manufacturer": manufacturer,
+            "include_readme": include_readme,
+            "archive": archive,
+        }
+        
+        state = {} if restart else self._load_checkpoint(checkpoint, run)
+        progress = StreamProgress(state.get("rows_done", 0), state.get("counts"))
+        if progress.resumed:
+            print(f"Resuming after row {progress.resumed} ({checkpoint})")
+        
+        pending = deque()       # (package key, future or finished result), in row order
+        in_flight = set()       # package keys being written, so duplicates never overlap
+        
+        def drain_one():
+            key, item = pending.popleft()
+            result = item.result() if isinstance(item, Future) else item
+            in_flight.discard(key)
+            progress.record(result)
+        
+        last_save = last_report = time.perf_counter()
+        row_number = progress.resumed
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                for row in itertools.islice(iter_manifest_rows(manifest), progress.resumed, None):
+                    row_number += 1
+                    try:
+                        spec = spec_from_row(row, manufacturer)
+                    except ValueError as e:
+                        pending.append((None, PackageResult(f"row {row_number}", None, 0.0, str(e))))
+                        continue
+                    
+                    key = self.package_dir(spec.name).name.lower()
+                    while pending and (key in in_flight or len(pending) >= window):
+                        drain_one()
+                    in_flight.add(key)
+                    pending.append((key, pool.submit(self._build_package, spec, include_readme,
+                                                     force, archive, extras)))
+                    
+                    now = time.perf_counter()
+                    if now - last_save >= 1.0:
+                        self._save_checkpoint(checkpoint, run, progress)
+                        last_save = now
+                    if now - last_report >= report_every:
+                        print(f"  {progress.format_stats()}")
+                        last_report = now
+                
+                while pending:
+                    drain_one()
+            except KeyboardInterrupt:
+                for _, item in pending:
+                    if isinstance(item, Future):
+                        item.cancel()
+                self._save_checkpoint(checkpoint, run, progress)
+                raise
+        
+        try:
+            checkpoint.unlink()
+        except OSError:
+            pass
+        return progress
+    
     def list_packages(self):
         """List generated driver packages"""
         packages = list(self.output_dir.glob("vusb_driver_*"))
@@ -222,11 +680,143 @@ pause
         
         print(f"\nGenerated driver packages ({len(packages)}):")
         for pkg in sorted(packages):
+            if pkg.suffix == ".zip":
+                print(f"  • {pkg.name}")
+                continue
             inf_files = list(pkg.glob("*.inf"))
             if inf_files:
                 print(f"  • {pkg.name}")
 
 
+def print_batch_report(results: List[PackageResult], elapsed: float, detail_limit: int = 50):
+    """Print per-package and total timing of a batch"""
+    ok = [r for r in results if r.error is None]
+    failed = [r for r in results if r.error is not None]
+    
+    if len(results) <= detail_limit:
+        print(f"\n{'Package':40} {'Status':10} {'Time':>10}  Files written")
+        print("-" * 90)
+        for result in results:
+            if result.error is None:
+                print(f"{result.name[:40]:40} {result.status:10} {result.seconds * 1e3:8.2f}ms  "
+                      f"{', '.join(result.rewritten) or '-'}")
+            else:
+                print(f"{result.name[:40]:40} {'FAILED':10}")
+    elif ok:
+        slowest = sorted(ok, key=lambda r: r.seconds, reverse=True)[:5]
+        print("\nSlowest packages:")
+        for result in slowest:
+            print(f"  {result.name[:40]:40} {result.seconds * 1e3:8.2f}ms")
+        rebuilt = [r for r in ok if r.status != "unchanged"]
+        if rebuilt:
+            print(f"\nRebuilt packages ({len(rebuilt)}):")
+            for result in rebuilt[:20]:
+                print(f"  {result.name[:40]:40} {result.status:10} {', '.join(result.rewritten)}")
+            if len(rebuilt) > 20:
+                print(f"  ... and {len(rebuilt) - 20} more")
+    
+    for result in failed:
+        print(f"✗ {result.name}: {result.error}")
+    
+    if ok:
+        times = sorted(r.seconds for r in ok)
+        print(f"\nPer package: median {times[len(times) // 2] * 1e3:.2f}ms, "
+              f"p95 {times[min(len(times) - 1, int(len(times) * 0.95))] * 1e3:.2f}ms")
+    counts = {status: sum(1 for r in ok if r.status == status)
+              for status in ("created", "updated", "unchanged")}
+    print(f"Total: {len(ok)}/{len(results)} packages in {elapsed:.3f}s "
+          f"({counts['created']} created, {counts['updated']} updated, "
+          f"{counts['unchanged']} unchanged)")
+
+
+def benchmark(count: int = 1000, workers: Optional[int] = None, subprocess_sample: int = 20):
+    """Compare batch generation with one subprocess per package"""
+    specs = [
+        PackageSpec(f"Bench Device {i}", "0x16c0", f"0x{0x0500 + i % 0xfaff:04x}", "Bench")
+        for i in range(count)
+    ]
+    script = Path(__file__).resolve()
+    
+    with tempfile.TemporaryDirectory(prefix="vusb_drivers_") as temp:
+        timings = []
+        digests = []
+        for label, pool_size, archive in (("batch, thread pool", workers, False),
+                                          ("batch, 1 thread", 1, False),
+                                          ("zip archives, thread pool", workers, True),
+                                          ("zip archives, 1 thread", 1, True)):
+            out = Path(temp) / label.replace(" ", "_").replace(",", "")
+            generator = VUSBDriverGenerator(str(out))
+            start = time.perf_counter()
+            results = generator.generate_batch(specs, workers=pool_size, archive=archive)
+            elapsed = time.perf_counter() - start
+            assert all(r.error is None for r in results)
+            timings.append((label, elapsed))
+            if archive:
+                digests.append([hashlib.sha256(r.path.read_bytes()).hexdigest() for r in results])
+        
+        sample = specs[:min(subprocess_sample, count)]
+        out = Path(temp) / "subprocess"
+        start = time.perf_counter()
+        for spec in sample:
+            subprocess.run(
+                [sys.executable, str(script), "--name", spec.name,
+                 "--manufacturer", spec.manufacturer, "--vendor-id", spec.vendor_id,
+                 "--product-id", spec.product_id, "--output-dir", str(out)],
+                stdout=subprocess.DEVNULL, check=True
+            )
+        per_process = (time.perf_counter() - start) / len(sample)
+        timings.append((f"subprocess per package (est. from {len(sample)})", per_process * count))
+    
+    print(f"\nDriver package benchmark ({count} packages)")
+    print("-" * 60)
+    for label, elapsed in timings:
+        print(f"  {label:42} {elapsed:8.3f}s  {elapsed / count * 1e3:7.2f}ms/package")
+    print(f"  archives identical across runs: {'yes' if digests[0] == digests[1] else 'NO'}")
+
+
+def render_benchmark(count: int = 10000):
+    """Time package rendering with cached templates against re-reading them"""
+    manufacturers = ("V-USB Project", "SODevs", "Bench Override")
+    specs = [
+        PackageSpec(f"Bench Device {i}", "0x16c0", f"0x{0x0500 + i % 0xfaff:04x}",
+                    manufacturers[i % len(manufacturers)])
+        for i in range(count)
+    ]
+    
+    with tempfile.TemporaryDirectory(prefix="vusb_templates_") as temp:
+        # One manufacturer overrides the INF template
+        override = Path(temp) / "templates" / manufacturer_dir_name("Bench Override")
+        override.mkdir(parents=True)
+        base_inf = (Path(__file__).parent / INF_TEMPLATE).read_text(encoding="utf-8")
+        (override / INF_TEMPLATE).write_text("; Bench Override build\n" + base_inf, encoding="utf-8")
+        
+        generator = VUSBDriverGenerator(str(Path(temp) / "out"), str(override.parent))
+        generator.templates.cache = TemplateCache()
+        
+        start = time.perf_counter()
+        for spec in specs:
+            generator.render_package(spec.name, spec.vendor_id, spec.product_id, spec.manufacturer)
+        cached = time.perf_counter() - start
+        stats = generator.templates.cache.format_stats()
+        
+        sample = specs[:min(count, 1000)]
+        start = time.perf_counter()
+        for spec in sample:
+            generator.templates.cache.clear()
+            generator.render_package(spec.name, spec.vendor_id, spec.product_id, spec.manufacturer)
+        uncached = (time.perf_counter() - start) / len(sample) * count
+        
+        overridden = generator.generate_inf("Bench", "0x16c0", "0x05df", "Bench Override")
+        assert overridden.startswith("; Bench Override build")
+    
+    print(f"\nTemplate render benchmark ({count} packages, 3 files each)")
+    print("-" * 60)
+    for label, elapsed in (("cached templates", cached),
+                           (f"re-read every package (est. from {len(sample)})", uncached)):
+        print(f"  {label:42} {elapsed:8.3f}s  {count / elapsed:9.0f} packages/s")
+    print(f"  {stats}")
+
+
 def main():
     """Main entry point"""
     parser = argparse.ArgumentParser(
@@ -249,6 +839,36 @@ def main():
   python3 generate_vusb_driver.py --name "Omega Buttons V2" --manufacturer "SODevs" \\
       --vendor-id 0x16c0 --product-id 0x05e0
   
+  # Generate driver for a device from device_config.json
+  python3 generate_vusb_driver.py --device "Arduino Micro"
+  
+  # Generate every device of device_config.json in one process
+  python3 generate_vusb_driver.py --batch device_config.json --manufacturer "SODevs"
+  
+  # Generate from a manifest: [{"name": ..., "vendor_id": ..., "product_id": ...}]
+  python3 generate_vusb_driver.py --batch fleet.json --workers 8
+  
+  # Benchmark batch generation on 1000 devices
+  python3 generate_vusb_driver.py --benchmark 1000
+  
+  # Write ZIP archives ready for distribution, bundling the installer
+  python3 generate_vusb_driver.py --batch device_config.json --zip \\
+      --include "dist/V-USB Driver Installer.exe"
+  
+  # Stream tens of thousands of per-unit packages from a CSV or JSON-lines
+  # manifest; rerun the same command to resume after an interruption
+  python3 generate_vusb_driver.py --stream units.csv --zip
+  
+  # One package whose INF covers every device of the manifest (single pnputil run)
+  python3 generate_vusb_driver.py --batch fleet.json --family "Omega Buttons" \\
+      --manufacturer "SODevs"
+  
+  # Use SODevs' own templates from my_templates/SODevs/ when present
+  python3 generate_vusb_driver.py --batch fleet.json --template-dir my_templates
+  
+  # Benchmark template rendering on 10000 devices
+  python3 generate_vusb_driver.py --render-benchmark 10000
+  
   # List generated packages
   python3 generate_vusb_driver.py --list
         """
@@ -266,21 +886,111 @@ def main():
                        help="Output directory (default: vusb_drivers)")
     parser.add_argument("--list", action="store_true",
                        help="List generated packages")
+    parser.add_argument("--device",
+                       help="Take name, VID and PID from a device in the device catalog")
+    parser.add_argument("--config", default=None,
+                       help="Device catalog config file (default: device_config.json)")
+    parser.add_argument("--batch", metavar="MANIFEST",
+                       help="Generate every device of a JSON manifest or device_config.json")
+    parser.add_argument("--workers", type=int, default=None,
+                       help="Threads writing packages in batch mode (default: automatic)")
+    parser.add_argument("--force", action="store_true",
+                       help="Rewrite every file even if its content is unchanged")
+    parser.add_argument("--stream", metavar="MANIFEST",
+                       help="Generate from a CSV/JSON-lines manifest row by row, with checkpoints")
+    parser.add_argument("--checkpoint", metavar="FILE",
+                       help="Checkpoint file of --stream (default: in the output directory)")
+    parser.add_argument("--restart", action="store_true",
+                       help="Ignore the --stream checkpoint and start from the first row")
+    parser.add_argument("--family", metavar="NAME",
+                       help="With --batch, generate one package with a consolidated INF")
+    parser.add_argument("--zip", action="store_true",
+                       help="Write reproducible ZIP archives instead of directories")
+    parser.add_argument("--include", action="append", default=[], metavar="FILE",
+                       help="Extra file to add to every archive (with --zip, repeatable)")
+    parser.add_argument("--benchmark", type=int, metavar="N",
+                       help="Benchmark batch generation of N packages")
+    parser.add_argument("--template-dir", default=None,
+                       help="Per-manufacturer template overrides (default: templates)")
+    parser.add_argument("--render-benchmark", type=int, metavar="N",
+                       help="Benchmark template rendering of N packages")
     
     args = parser.parse_args()
     
+    if args.benchmark:
+        benchmark(args.benchmark, args.workers)
+        return 0
+    
+    if args.render_benchmark:
+        render_benchmark(args.render_benchmark)
+        return 0
+    
+    if args.include and not args.zip:
+        parser.error("--include requires --zip")
+    if args.family and not args.batch:
+        parser.error("--family requires --batch")
+    extras = {Path(path).name: Path(path) for path in args.include}
+    
     try:
-        generator = VUSBDriverGenerator(args.output_dir)
+        generator = VUSBDriverGenerator(args.output_dir, args.template_dir)
         
         if args.list:
             generator.list_packages()
             return 0
         
+        if args.stream:
+            print(f"Streaming driver packages from {args.stream} into {generator.output_dir}")
+            try:
+                progress = generator.generate_stream(
+                    args.stream, args.workers, args.manufacturer, force=args.force,
+                    archive=args.zip, extras=extras, checkpoint=args.checkpoint,
+                    restart=args.restart
+                )
+            except KeyboardInterrupt:
+                print("\nInterrupted; run the same command again to resume")
+                return 130
+            for failure in progress.failures:
+                print(f"✗ {failure}")
+            print(f"Total: {progress.format_stats()}")
+            return 0 if progress.counts["failed"] == 0 else 1
+        
+        if args.batch:
+            specs = load_manifest(args.batch, args.manufacturer)
+            if args.family:
+                start = time.perf_counter()
+                path = generator.generate_family_package(
+                    args.family, specs, args.manufacturer, force=args.force,
+                    archive=args.zip, extras=extras
+                )
+                print(f"Generated in {(time.perf_counter() - start) * 1e3:.1f}ms")
+                print(f"\n📦 Driver package ready for distribution!")
+                print(f"Location: {path}")
+                return 0
+            print(f"Generating {len(specs)} driver packages in {generator.output_dir}")
+            start = time.perf_counter()
+            results = generator.generate_batch(specs, workers=args.workers, force=args.force,
+                                               archive=args.zip, extras=extras)
+            print_batch_report(results, time.perf_counter() - start)
+            return 0 if all(r.error is None for r in results) else 1
+        
+        if args.device:
+            from device_catalog import get_catalog
+            record = get_catalog(args.config).devices.by_name(args.device)
+            if record is None:
+                print(f"✗ Device not found in catalog: {args.device}")
+                return 1
+            args.name = record.name
+            args.vendor_id = record.vendor_id_hex
+            args.product_id = record.product_id_hex
+        
         driver_dir = generator.generate_driver_package(
             args.name,
             args.vendor_id,
             args.product_id,
-            args.manufacturer
+            args.manufacturer,
+            force=args.force,
+            archive=args.zip,
+            extras=extras
         )
         
         if driver_dir:
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Linux hidraw reader for the Button Box Joystick-HID firmware
+Decodes raw HID input reports into the reader's button bitmask pipeline,
+bypassing the 9600 baud serial text channel
+"""
+
+import argparse
+import io
+import os
+import stat
+import sys
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from serial_reader import (
+    ButtonBoxReader,
+    PrintOutput,
+    VJoyOutput,
+    HAS_VJOY,
+    add_coalesce_arguments,
+    add_event_log_arguments,
+    add_profile_arguments,
+    create_profiler,
+    run_reader,
+    wrap_output,
+)
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+
+# ioctl requests from <linux/hidraw.h>
+HIDIOCGRDESCSIZE = 0x80044801
+HIDIOCGRDESC = 0x90044802
+HID_MAX_DESCRIPTOR_SIZE = 4096
+HID_MAX_BUFFER_SIZE = 16384     # largest report a hidraw read() can return
+
+USAGE_PAGE_BUTTON = 0x09
+
+# Report descriptor generated by the Joystick library for ButtonBox.ino:
+# gamepad, report ID 3, 32 buttons, no hat switches or axes
+JOYSTICK_REPORT_DESCRIPTOR = bytes([
+    0x05, 0x01,        # Usage Page (Generic Desktop)
+    0x09, 0x05,        # Usage (Game Pad)
+    0xA1, 0x01,        # Collection (Application)
+    0x85, 0x03,        #   Report ID (3)
+    0x05, 0x09,        #   Usage Page (Button)
+    0x19, 0x01,        #   Usage Minimum (1)
+    0x29, 0x20,        #   Usage Maximum (32)
+    0x15, 0x00,        #   Logical Minimum (0)
+    0x25, 0x01,        #   Logical Maximum (1)
+    0x75, 0x01,        #   Report Size (1)
+    0x95, 0x20,        #   Report Count (32)
+    0x55, 0x00,        #   Unit Exponent (0)
+    0x65, 0x00,        #   Unit (None)
+    0x81, 0x02,        #   Input (Data, Variable, Absolute)
+    0xC0,              # End Collection
+])
+
+
+class HIDButtonLayout(NamedTuple):
+    """Location of the button bits inside an input report"""
+    report_id: int        # 0 when the device does not use report IDs
+    bit_offset: int       # offset of the first button bit, including the ID byte
+    button_count: int
+    first_button: int     # button number of the first bit (usage minimum)
+    report_length: int    # total input report length in bytes
+    input_lengths: Optional[Dict[int, int]] = None   # report ID -> length of every input report
+
+    def length_of(self, report_id: int) -> Optional[int]:
+        """Length in bytes of an input report (None for unknown IDs)"""
+        if self.input_lengths is None:
+            return self.report_length if report_id == self.report_id else None
+        return self.input_lengths.get(report_id)
+
+    @property
+    def mask(self) -> int:
+        """Bitmask covering all button bits"""
+        return (1 << self.button_count) - 1
+
+
+def parse_report_descriptor(descriptor: bytes) -> HIDButtonLayout:
+    """Find the button field of a HID report descriptor
+
+    Only short items are interpreted; long items are skipped.
+    """
+    usage_page = 0
+    report_size = 0
+    report_count = 0
+    report_id = 0
+    usage_min: Optional[int] = None
+    global_stack = []
+    input_bits: Dict[int, int] = {}
+    buttons: Optional[Tuple[int, int, int, int]] = None
+
+    i = 0
+    while i < len(descriptor):
+        prefix = descriptor[i]
+
+        if prefix == 0xFE:
+            i += 3 + (descriptor[i + 1] if i + 1 < len(descriptor) else 0)
+            continue
+
+        size = (0, 1, 2, 4)[prefix & 0x03]
+        item_type = (prefix >> 2) & 0x03
+        tag = prefix >> 4
+        value = int.from_bytes(descriptor[i + 1:i + 1 + size], "little")
+        i += 1 + size
+
+        if item_type == 1:  # Global
+            if tag == 0x0:
+                usage_page = value
+            elif tag == 0x7:
+                report_size = value
+            elif tag == 0x8:
+                report_id = value
+            elif tag == 0x9:
+                report_count = value
+            elif tag == 0xA:
+                global_stack.append((usage_page, report_size, report_count, report_id))
+            elif tag == 0xB and global_stack:
+                usage_page, report_size, report_count, report_id = global_stack.pop()
+
+        elif item_type == 2:  # Local
+            if tag == 0x1:
+                usage_min = value
+
+        elif item_type == 0:  # Main
+            if tag == 0x8:  # Input
+                offset = input_bits.get(report_id, 0)
+                bits = report_size * report_count
+                is_constant = value & 0x01
+                if (buttons is None and usage_page == USAGE_PAGE_BUTTON
+                        and report_size == 1 and not is_constant):
+                    buttons = (report_id, offset, report_count, usage_min or 1)
+                input_bits[report_id] = offset + bits
+            usage_min = None
+
+    if buttons is None:
+        raise ValueError("Report descriptor has no button input field")
+
+    lengths = {rid: (1 if rid else 0) + (bits + 7) // 8 for rid, bits in input_bits.items()}
+    report_id, offset, count, first_button = buttons
+    id_bytes = 1 if report_id else 0
+    return HIDButtonLayout(report_id, offset + 8 * id_bytes, count, first_button,
+                           lengths[report_id], lengths)
+
+
+def read_report_descriptor(fd: int) -> bytes:
+    """Read the report descriptor of an open hidraw device"""
+    size = bytearray(4)
+    fcntl.ioctl(fd, HIDIOCGRDESCSIZE, size)
+    length = int.from_bytes(size, sys.byteorder)
+
+    buf = bytearray(4 + HID_MAX_DESCRIPTOR_SIZE)
+    buf[0:4] = length.to_bytes(4, sys.byteorder)
+    fcntl.ioctl(fd, HIDIOCGRDESC, buf)
+    return bytes(buf[4:4 + length])
+
+
+def is_hidraw(fd: int) -> bool:
+    """Check whether a file descriptor is a hidraw device node
+
+    A tty or other character device is not; its sysfs class must be hidraw.
+    """
+    try:
+        st = os.fstat(fd)
+    except OSError:
+        return False
+    if not stat.S_ISCHR(st.st_mode):
+        return False
+    subsystem = f"/sys/dev/char/{os.major(st.st_rdev)}:{os.minor(st.st_rdev)}/subsystem"
+    return os.path.basename(os.path.realpath(subsystem)) == "hidraw"
+
+
+def decode_report(report: bytes, layout: HIDButtonLayout) -> Optional[int]:
+    """Decode an input report into a button bitmask (None for other or short reports)"""
+    if layout.report_id and report[0] != layout.report_id:
+        return None
+    if len(report) < layout.report_length:
+        return None
+    state = (int.from_bytes(report, "little") >> layout.bit_offset) & layout.mask
+    return state << (layout.first_button - 1)
+
+
+class HidrawReader(ButtonBoxReader):
+    """Button state pipeline fed by raw HID input reports
+
+    The source is any binary stream: a /dev/hidrawN device, or a pipe or
+    file of recorded reports (e.g. ``cat /dev/hidraw0 > reports.bin``).
+    The report descriptor is parsed once, at construction.
+
+    A hidraw device returns exactly one report per read(), whatever its
+    length; recorded streams are split using the length of each report ID
+    from the descriptor. ``packetized`` defaults to whether the source is
+    a hidraw device node.
+    """
+
+    def __init__(self, source, output, layout: HIDButtonLayout,
+                 echo: bool = True, profiler=None, packetized: Optional[bool] = None):
+        super().__init__(source, output, echo=echo, profiler=profiler)
+        self.layout = layout
+        if packetized is None:
+            try:
+                packetized = is_hidraw(source.fileno())
+            except (OSError, ValueError):
+                packetized = False
+        self.packetized = packetized
+
+    def _read_exact(self, length: int) -> bytes:
+        """Read length bytes from a stream (b"" if it ends first)"""
+        data = self.source.read(length)
+        while data and len(data) < length:
+            chunk = self.source.read(length - len(data))
+            if not chunk:
+                return b""
+            data += chunk
+        return data
+
+    def read(self) -> bytes:
+        """Read one input report"""
+        if self.packetized:
+            return self.source.read(HID_MAX_BUFFER_SIZE)
+
+        if not self.layout.report_id:
+            return self._read_exact(self.layout.report_length)
+
+        # Numbered reports: the ID byte gives the length of the rest
+        report_id = self.source.read(1)
+        if not report_id:
+            return b""
+        length = self.layout.length_of(report_id[0])
+        if length is None:
+            return report_id    # not an input report; decoded as nothing
+        rest = self._read_exact(length - 1)
+        return report_id + rest if rest or length == 1 else b""
+
+    def parse(self, data: bytes) -> int:
+        """Decode an input report into a bitmask state"""
+        state = decode_report(data, self.layout)
+        if state is None:
+            return self.state
+        if self.echo:
+            print(f"Buttons: 0x{state:08x}")
+        return state
+
+
+def open_hidraw(path: str, descriptor_file: Optional[str] = None):
+    """Open a hidraw device or recorded report stream
+
+    Returns (stream, layout). The layout comes from ``descriptor_file`` if
+    given, else from the device itself, else the Joystick library default.
+    """
+    if path == "-":
+        stream = sys.stdin.buffer
+    else:
+        stream = open(path, "rb", buffering=0)
+
+    descriptor = None
+    if descriptor_file:
+        with open(descriptor_file, "rb") as f:
+            descriptor = f.read()
+    elif HAS_FCNTL and path != "-":
+        try:
+            descriptor = read_report_descriptor(stream.fileno())
+        except OSError:
+            descriptor = None
+
+    return stream, parse_report_descriptor(descriptor or JOYSTICK_REPORT_DESCRIPTOR)
+
+
+def benchmark(count: int = 100000):
+    """Compare decode cost of serial text lines and raw HID reports"""
+    class NullOutput:
+        def set_button(self, button: int, pressed: bool):
+            pass
+
+    layout = parse_report_descriptor(JOYSTICK_REPORT_DESCRIPTOR)
+
+    lines = b"".join(b"A\r\n" if i % 2 == 0 else b"\r\n" for i in range(count))
+    reports = b"".join(
+        bytes([layout.report_id]) + ((1 if i % 2 == 0 else 0).to_bytes(4, "little"))
+        for i in range(count)
+    )
+
+    results = []
+    for name, reader in (
+        ("serial", ButtonBoxReader(io.BytesIO(lines), NullOutput(), echo=False)),
+        ("hidraw", HidrawReader(io.BytesIO(reports), NullOutput(), layout, echo=False)),
+    ):
+        start = time.perf_counter()
+        reader.run()
+        elapsed = time.perf_counter() - start
+        results.append((name, elapsed))
+
+    # 10 bits per byte on the wire at 9600 baud vs one report per 1 ms USB poll
+    serial_wire = len("Button 1 pressed\r\n") * 10 / 9600
+
+    print(f"\nDecode benchmark ({count} events)")
+    print("-" * 60)
+    for name, elapsed in results:
+        print(f"  {name:8} {elapsed * 1e3:10.1f} ms total  {elapsed / count * 1e6:8.2f} us/event")
+    print("-" * 60)
+    print(f"  serial wire time per firmware line: {serial_wire * 1e3:.1f} ms")
+    print(f"  hidraw report interval (full speed): 1.0 ms")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description="Read Button Box HID reports from Linux hidraw",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Examples:
+  # Read from the Joystick-HID firmware and forward to vJoy
+  python3 hidraw_reader.py --device /dev/hidraw0
+
+  # Replay recorded reports through a pipe, printing button edges
+  cat reports.bin | python3 hidraw_reader.py --device - --dry-run
+
+  # Compare decode cost against the serial text path
+  python3 hidraw_reader.py --benchmark 100000
+        """
+    )
+
+    parser.add_argument("--device", default="/dev/hidraw0",
+                       help="hidraw device, recorded report file, or - for stdin "
+                            "(default: /dev/hidraw0)")
+    parser.add_argument("--descriptor",
+                       help="Binary report descriptor file (default: read from device)")
+    parser.add_argument("--vjoy-device", type=int, default=1,
+                       help="vJoy device number (default: 1)")
+    parser.add_argument("--dry-run", action="store_true",
+                       help="Print button edges instead of driving vJoy")
+    parser.add_argument("--quiet", action="store_true",
+                       help="Do not echo decoded reports")
+    parser.add_argument("--benchmark", type=int, metavar="N",
+                       help="Benchmark decoding N events against the serial path")
+    add_coalesce_arguments(parser)
+    add_event_log_arguments(parser)
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+        return 0
+
+    if not args.dry_run and not HAS_VJOY:
+        print("Error: pyvjoy is required but not installed")
+        print("Install with: pip install pyvjoy (or use --dry-run)")
+        return 1
+
+    try:
+        stream, layout = open_hidraw(args.device, args.descriptor)
+    except (OSError, ValueError) as e:
+        print(f"Error opening {args.device}: {e}")
+        return 1
+
+    print(f"Buttons: {layout.button_count} (report ID {layout.report_id}, "
+          f"{layout.report_length} bytes per report)")
+
+    driver = PrintOutput() if args.dry_run else VJoyOutput(args.vjoy_device)
+    output = wrap_output(driver, args)
+    reader = HidrawReader(stream, output, layout,
+                          echo=not args.quiet, profiler=create_profiler(args))
+    try:
+        run_reader(reader, args, close_output=output is not driver)
+    finally:
+        stream.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Backpressure-aware output for the Button Box reader
+Collapses queued button states while the output driver (vJoy, uinput) lags
+"""
+
+import threading
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+from serial_reader import diff_states
+
+
+class CoalescingOutput:
+    """Deliver button states to a slow output driver on a worker thread
+
+    States are queued as they arrive. While the driver is busy, a new state
+    replaces the queued ones in front of it, so the virtual device jumps to
+    the latest state instead of replaying every transition. An intermediate
+    state is only kept when dropping it would lose a press or release of a
+    must-deliver button (e.g. a momentary press shorter than the stall).
+    """
+
+    def __init__(self, output, must_deliver: Iterable[int] = ()):
+        self.output = output
+        self.must_mask = 0
+        for button in must_deliver:
+            self.must_mask |= 1 << (button - 1)
+
+        self.pushed = 0
+        self.delivered = 0
+        self.coalesced = 0
+        self.preserved = 0
+        self.edges = 0
+        self.max_backlog = 0
+
+        self._state = 0       # latest state seen from the reader
+        self._base = 0        # state taken by the worker most recently
+        self._pending = deque()
+        self._protected = 0   # leading pending states kept for a must-deliver edge
+        self._busy = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._worker = threading.Thread(target=self._run, name="output-coalescer",
+                                        daemon=True)
+        self._worker.start()
+
+    def set_button(self, button: int, pressed: bool):
+        """Queue a button edge"""
+        bit = 1 << (button - 1)
+        if pressed:
+            self.submit(self._state | bit)
+        else:
+            self.submit(self._state & ~bit)
+
+    def submit(self, state: int):
+        """Queue a full button state, coalescing with any backlog"""
+        must = self.must_mask
+        with self._cond:
+            self._state = state
+            self.pushed += 1
+            pending = self._pending
+
+            while pending:
+                last = pending[-1]
+                before = pending[-2] if len(pending) > 1 else self._base
+                if (before ^ last) & (last ^ state) & must:
+                    # Every state before the tail was kept when its successor came
+                    self._protected = len(pending)
+                    break
+                pending.pop()
+                self.coalesced += 1
+            if self._protected > len(pending):
+                self._protected = len(pending)
+
+            previous = pending[-1] if pending else self._base
+            if state == previous:
+                self.coalesced += 1
+                return
+
+            pending.append(state)
+            if len(pending) > self.max_backlog:
+                self.max_backlog = len(pending)
+            self._cond.notify()
+
+    def _run(self):
+        """Worker loop: deliver queued states to the driver"""
+        delivered = 0
+        while True:
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                state = self._pending.popleft()
+                if self._protected:
+                    self._protected -= 1
+                    self.preserved += 1
+                self._base = state
+                self._busy = True
+
+            edges = diff_states(delivered, state)
+            for button, pressed in edges:
+                self.output.set_button(button, pressed)
+            delivered = state
+
+            with self._cond:
+                self.delivered += 1
+                self.edges += len(edges)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued state was delivered"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy,
+                                       timeout)
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """Deliver the backlog and stop the worker"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        """Get coalescing counters"""
+        with self._cond:
+            return {
+                "states_received": self.pushed,
+                "states_delivered": self.delivered,
+                "states_coalesced": self.coalesced,
+                "must_deliver_kept": self.preserved,
+                "edges_delivered": self.edges,
+                "max_backlog": self.max_backlog,
+                "backlog": len(self._pending),
+            }
+
+    def format_stats(self) -> str:
+        """Format coalescing counters for display"""
+        lines = ["Output coalescing:"]
+        for key, value in self.stats().items():
+            lines.append(f"  {key.replace('_', ' '):20} {value}")
+        return "\n".join(lines)
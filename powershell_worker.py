@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Persistent PowerShell worker for the V-USB tools
+Keeps one PowerShell process alive and runs device queries through it,
+so only the first query pays PowerShell's startup cost
+"""
+
+import argparse
+import atexit
+import base64
+import json
+import os
+import queue
+import re
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from usb_detection import ENV_POWERSHELL, ENV_WORKER
+
+
+# Request loop run by the worker. One JSON object per line in each direction:
+#   request:  {"id": 1, "script": "..."}
+#   response: {"id": 1, "ok": true, "output": "..."} or {"id": 1, "ok": false, "error": "..."}
+WORKER_SCRIPT = """
+$ErrorActionPreference = 'Stop'
+[Console]::OutputEncoding = [Text.Encoding]::UTF8
+while ($true) {
+    $line = [Console]::In.ReadLine()
+    if ($line -eq $null) { break }
+    $request = $line | ConvertFrom-Json
+    try {
+        $output = Invoke-Expression $request.script | Out-String
+        $response = @{ id = $request.id; ok = $true; output = $output }
+    } catch {
+        $response = @{ id = $request.id; ok = $false; error = $_.Exception.Message }
+    }
+    [Console]::Out.WriteLine(($response | ConvertTo-Json -Compress))
+    [Console]::Out.Flush()
+}
+"""
+
+
+class PowerShellError(RuntimeError):
+    """A worker request failed, timed out or the worker died"""
+
+
+def encoded_command(script: str) -> List[str]:
+    """Get a PowerShell command line running a script (no quoting issues)"""
+    encoded = base64.b64encode(script.encode("utf-16-le")).decode("ascii")
+    return ["powershell", "-NoProfile", "-NonInteractive", "-EncodedCommand", encoded]
+
+
+def worker_command() -> List[str]:
+    """Get the worker command line (overridable with VUSB_POWERSHELL_WORKER)"""
+    override = os.environ.get(ENV_WORKER)
+    if override:
+        return shlex.split(override, posix=os.name != "nt")
+    return encoded_command(WORKER_SCRIPT)
+
+
+class PowerShellWorker:
+    """Long-lived PowerShell process answering framed JSON requests
+
+    Requests are serialized. A request that exceeds its timeout kills the
+    worker; the next request (or a dead worker found on send) starts a
+    fresh one automatically.
+    """
+
+    def __init__(self, command: Optional[List[str]] = None, timeout: float = 10.0):
+        self.command = command or worker_command()
+        self.timeout = timeout
+        self.requests = 0
+        self.starts = 0
+        self.timeouts = 0
+        self.failures = 0
+
+        self._process: Optional[subprocess.Popen] = None
+        self._responses: Optional[queue.Queue] = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        """Check whether the worker process is alive"""
+        return self._process is not None and self._process.poll() is None
+
+    def start(self):
+        """Start the worker process (no-op if already running)"""
+        if self.running:
+            return
+        self._kill()
+
+        process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
+        )
+        responses = queue.Queue()
+        threading.Thread(target=self._read_loop, args=(process, responses),
+                         name="powershell-worker", daemon=True).start()
+
+        self._process = process
+        self._responses = responses
+        self.starts += 1
+
+    @staticmethod
+    def _read_loop(process: subprocess.Popen, responses: queue.Queue):
+        """Forward response lines of one process; None marks its exit"""
+        for line in process.stdout:
+            try:
+                responses.put(json.loads(line))
+            except json.JSONDecodeError:
+                continue    # banner or stray output, not a response
+        responses.put(None)
+
+    def run(self, script: str, timeout: Optional[float] = None) -> str:
+        """Run a script in the worker and return its text output"""
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            self.requests += 1
+            self._next_id += 1
+            request_id = self._next_id
+            frame = json.dumps({"id": request_id, "script": script}) + "\n"
+
+            for attempt in range(2):
+                self.start()
+                try:
+                    self._process.stdin.write(frame)
+                    self._process.stdin.flush()
+                    break
+                except OSError:
+                    # Died while idle: restart and resend once
+                    self._kill()
+                    if attempt:
+                        self.failures += 1
+                        raise PowerShellError("PowerShell worker could not be started")
+
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    response = self._responses.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    self.timeouts += 1
+                    self._kill()
+                    raise PowerShellError(f"PowerShell request timed out after {timeout:g}s")
+
+                if response is None:
+                    self.failures += 1
+                    self._kill()
+                    raise PowerShellError("PowerShell worker exited during the request")
+                if response.get("id") != request_id:
+                    continue    # late answer to an abandoned request
+
+                if not response.get("ok"):
+                    raise PowerShellError(response.get("error") or "PowerShell request failed")
+                return response.get("output") or ""
+
+    def _kill(self):
+        """Stop the current process without waiting for pending requests"""
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.kill()
+            process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        for stream in (process.stdin, process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+    def close(self):
+        """Stop the worker"""
+        with self._lock:
+            self._kill()
+
+    def stats(self) -> Dict[str, int]:
+        """Get request counters"""
+        return {
+            "requests": self.requests,
+            "starts": self.starts,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+        }
+
+
+_worker: Optional[PowerShellWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_worker() -> Optional[PowerShellWorker]:
+    """Get the process-wide worker (None when VUSB_POWERSHELL asks for one-shot runs)"""
+    global _worker
+    if os.environ.get(ENV_POWERSHELL) and not os.environ.get(ENV_WORKER):
+        return None
+    with _worker_lock:
+        if _worker is None:
+            _worker = PowerShellWorker()
+            atexit.register(_worker.close)
+        return _worker
+
+
+def stand_in(replay_file: Optional[str] = None):
+    """Local stand-in for the worker protocol (no PowerShell needed)
+
+    Answers every request with the replay file (or the script itself).
+    "Start-Sleep -Seconds N" sleeps, "throw ..." fails the request and
+    "exit" kills the process, to exercise timeouts and restarts.
+    """
+    replay = None
+    if replay_file:
+        with open(replay_file, encoding="utf-8") as f:
+            replay = f.read()
+
+    for line in sys.stdin:
+        request = json.loads(line)
+        script = request.get("script", "")
+
+        sleep = re.search(r"Start-Sleep -Seconds ([\d.]+)", script)
+        if sleep:
+            time.sleep(float(sleep.group(1)))
+        if script.strip() == "exit":
+            sys.exit(1)
+
+        if script.strip().startswith("throw"):
+            response = {"id": request["id"], "ok": False, "error": script.strip()[5:].strip()}
+        else:
+            response = {"id": request["id"], "ok": True,
+                        "output": replay if replay is not None else script}
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+
+def self_test(replay_file: Optional[str] = None, count: int = 50):
+    """Exercise a worker against the local stand-in and time warm requests"""
+    command = [sys.executable, os.path.abspath(__file__), "--stand-in"]
+    if replay_file:
+        command += ["--replay", replay_file]
+
+    results = []
+
+    def check(name: str, passed: bool):
+        results.append(passed)
+        print(f"  {'PASS' if passed else 'FAIL'}  {name}")
+
+    print("\nPowerShell worker self-test (local stand-in)")
+    print("-" * 60)
+
+    worker = PowerShellWorker(command, timeout=5.0)
+    try:
+        start = time.perf_counter()
+        first = worker.run("Get-Date")
+        cold = time.perf_counter() - start
+        check("first request answered", bool(first))
+
+        start = time.perf_counter()
+        for _ in range(count):
+            worker.run("Get-Date")
+        warm = (time.perf_counter() - start) / count
+        check("warm requests reuse one process", worker.starts == 1)
+
+        try:
+            worker.run("throw Device not found")
+            check("script errors are reported", False)
+        except PowerShellError as e:
+            check("script errors are reported", str(e) == "Device not found")
+        check("worker survives script errors", worker.starts == 1 and worker.running)
+
+        try:
+            worker.run("Start-Sleep -Seconds 2", timeout=0.2)
+            check("slow request times out", False)
+        except PowerShellError:
+            check("slow request times out", True)
+        check("worker restarts after a timeout", bool(worker.run("Get-Date")) and worker.starts == 2)
+
+        try:
+            worker.run("exit")
+            check("worker crash is reported", False)
+        except PowerShellError:
+            check("worker crash is reported", True)
+        check("worker restarts after a crash", bool(worker.run("Get-Date")) and worker.starts == 3)
+
+        worker._process.kill()
+        worker._process.wait()
+        check("dead idle worker is restarted on send", bool(worker.run("Get-Date")))
+    finally:
+        worker.close()
+
+    start = time.perf_counter()
+    for _ in range(5):
+        subprocess.run(command, input=json.dumps({"id": 1, "script": "Get-Date"}) + "\n",
+                       capture_output=True, text=True, timeout=10)
+    one_shot = (time.perf_counter() - start) / 5
+
+    print("-" * 60)
+    print(f"  one process per request:  {one_shot * 1e3:8.2f} ms")
+    print(f"  first worker request:     {cold * 1e3:8.2f} ms")
+    print(f"  warm worker request:      {warm * 1e3:8.2f} ms")
+    print(f"  counters: {worker.stats()}")
+    return all(results)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description="Persistent PowerShell worker for device queries",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Examples:
+  # Run a script through the worker
+  python powershell_worker.py --run "Get-Date"
+
+  # Test timeouts/restarts and time requests against the local stand-in
+  python powershell_worker.py --self-test
+
+  # Make the tools use the stand-in, replaying captured enumeration output
+  set VUSB_POWERSHELL_WORKER=python powershell_worker.py --stand-in --replay usb_devices.json
+        """
+    )
+
+    parser.add_argument("--run", metavar="SCRIPT",
+                       help="Run a PowerShell script through the worker")
+    parser.add_argument("--timeout", type=float, default=10.0,
+                       help="Request timeout in seconds (default: 10)")
+    parser.add_argument("--self-test", action="store_true",
+                       help="Test the worker against the local stand-in")
+    parser.add_argument("--stand-in", action="store_true",
+                       help="Act as a stand-in worker on stdin/stdout")
+    parser.add_argument("--replay", metavar="FILE",
+                       help="Output returned by the stand-in for every request")
+
+    args = parser.parse_args()
+
+    if args.stand_in:
+        stand_in(args.replay)
+        return 0
+
+    if args.self_test:
+        return 0 if self_test(args.replay) else 1
+
+    if args.run:
+        worker = PowerShellWorker(timeout=args.timeout)
+        try:
+            print(worker.run(args.run), end="")
+        except (OSError, PowerShellError) as e:
+            print(f"Error: {e}")
+            return 1
+        finally:
+            worker.close()
+        return 0
+
+    parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Profiler for the Button Box reader pipeline
+Attributes time to pipeline stages and writes flamegraph-compatible collapsed stacks
+"""
+
+import cProfile
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+
+MAX_STACK_DEPTH = 128
+
+
+class StageStats:
+    """Accumulated timing for one pipeline stage"""
+
+    __slots__ = ("calls", "total", "max")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class _StageTimer:
+    """Reusable context manager timing one stage"""
+
+    __slots__ = ("profiler", "name", "stats", "started", "previous")
+
+    def __init__(self, profiler: "ReaderProfiler", name: str):
+        self.profiler = profiler
+        self.name = name
+        self.stats = profiler.stats.setdefault(name, StageStats())
+        self.started = 0.0
+        self.previous = None
+
+    def __enter__(self):
+        self.previous = self.profiler.current_stage
+        self.profiler.current_stage = self.name
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        now = time.perf_counter()
+        elapsed = now - self.started
+        stats = self.stats
+        stats.calls += 1
+        stats.total += elapsed
+        if elapsed > stats.max:
+            stats.max = elapsed
+        self.profiler.current_stage = self.previous
+        if self.profiler._deadline is not None and now >= self.profiler._deadline:
+            self.profiler._end_cprofile()
+        return False
+
+
+def _frame_label(filename: str, name: str) -> str:
+    """Format a frame for a collapsed-stack line"""
+    return f"{Path(filename).name}:{name}".replace(";", ":").replace(" ", "_")
+
+
+class ReaderProfiler:
+    """Profile the reader pipeline by stage
+
+    Two modes are supported:
+      - ``sample``: a background thread samples the reader thread's stack
+        every ``interval`` seconds for the whole run, rooted at the
+        stage that was active when the sample was taken.
+      - ``cprofile``: the reader thread runs under cProfile for the first
+        ``window`` seconds, stacks are rebuilt from the caller graph.
+    """
+
+    def __init__(self, mode: str = "sample", interval: float = 0.005,
+                 window: float = 30.0, stages: Iterable[str] = ()):
+        if mode not in ("sample", "cprofile"):
+            raise ValueError(f"Unknown profile mode: {mode}")
+
+        self.mode = mode
+        self.interval = interval
+        self.window = window
+        self.stats: Dict[str, StageStats] = {name: StageStats() for name in stages}
+        self.samples: Counter = Counter()
+        self.current_stage: Optional[str] = None
+        self.elapsed = 0.0
+
+        self._timers: Dict[str, _StageTimer] = {}
+        self._started = 0.0
+        self._thread_id: Optional[int] = None
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._deadline: Optional[float] = None
+
+    def stage(self, name: str) -> _StageTimer:
+        """Get the timing context for a stage"""
+        timer = self._timers.get(name)
+        if timer is None:
+            timer = self._timers[name] = _StageTimer(self, name)
+        return timer
+
+    def start(self):
+        """Start profiling the calling (reader) thread"""
+        self._thread_id = threading.get_ident()
+        self._started = time.perf_counter()
+
+        if self.mode == "sample":
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample_loop,
+                                             name="reader-profiler", daemon=True)
+            self._sampler.start()
+        else:
+            self._cprofile = cProfile.Profile()
+            self._deadline = self._started + self.window
+            self._cprofile.enable()
+
+    def stop(self):
+        """Stop profiling"""
+        self.elapsed = time.perf_counter() - self._started
+
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+
+        self._end_cprofile()
+
+    def _end_cprofile(self):
+        """Disable cProfile and fold its call graph into samples"""
+        self._deadline = None
+        if self._cprofile is None:
+            return
+
+        self._cprofile.disable()
+        self.samples.update(self._collapse_cprofile(pstats.Stats(self._cprofile)))
+        self._cprofile = None
+
+    def _sample_loop(self):
+        """Sample the reader thread stack until stopped"""
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                stack.append(_frame_label(code.co_filename, code.co_name))
+                frame = frame.f_back
+
+            stack.append(self.current_stage or "idle")
+            stack.reverse()
+            self.samples[tuple(stack)] += 1
+
+    @staticmethod
+    def _collapse_cprofile(stats: pstats.Stats) -> Counter:
+        """Rebuild stacks from cProfile data, weighted by own time in microseconds
+
+        cProfile only records caller edges, so every function is attributed
+        to the chain of its heaviest callers.
+        """
+        collapsed: Counter = Counter()
+        raw = stats.stats
+
+        for func, (_, _, tottime, _, callers) in raw.items():
+            weight = int(tottime * 1_000_000)
+            if weight <= 0:
+                continue
+
+            chain = [func]
+            seen = {func}
+            while callers and len(chain) < MAX_STACK_DEPTH:
+                caller = max(callers, key=lambda c: callers[c][3])
+                if caller in seen:
+                    break
+                chain.append(caller)
+                seen.add(caller)
+                callers = raw.get(caller, (0, 0, 0, 0, {}))[4]
+
+            stack: Tuple[str, ...] = tuple(
+                _frame_label(filename, name) for filename, _, name in reversed(chain)
+            )
+            collapsed[stack] += weight
+
+        return collapsed
+
+    def write_collapsed(self, output_file: str) -> Path:
+        """Write samples in collapsed-stack format (flamegraph.pl, speedscope)"""
+        path = Path(output_file)
+        lines = [f"{';'.join(stack)} {count}"
+                 for stack, count in sorted(self.samples.items())]
+        path.write_text("\n".join(lines) + ("\n" if lines else ""), encoding="utf-8")
+        return path
+
+    def format_summary(self) -> str:
+        """Format per-stage timings as a table"""
+        staged = sum(stats.total for stats in self.stats.values())
+
+        lines = [
+            "=" * 70,
+            f"Reader Profile ({self.mode}, {self.elapsed:.1f}s)",
+            "=" * 70,
+            f"{'Stage':<12}{'Calls':>10}{'Total ms':>12}{'Mean us':>12}{'Max us':>12}{'Share':>10}",
+            "-" * 70,
+        ]
+
+        for name, stats in self.stats.items():
+            mean = stats.total / stats.calls if stats.calls else 0.0
+            share = stats.total / staged * 100 if staged else 0.0
+            lines.append(
+                f"{name:<12}{stats.calls:>10}{stats.total * 1e3:>12.2f}"
+                f"{mean * 1e6:>12.1f}{stats.max * 1e6:>12.1f}{share:>9.1f}%"
+            )
+
+        lines.append("-" * 70)
+        unit = "samples" if self.mode == "sample" else "us"
+        lines.append(f"Collapsed stacks: {len(self.samples)} ({sum(self.samples.values())} {unit})")
+        lines.append("Note: 'read' includes time spent waiting for serial data")
+        lines.append("=" * 70)
+        return "\n".join(lines)
@@ -1,47 +1,317 @@
-import serial
-import pyvjoy
-# Enter Your Arduino Port Number
-ser = serial.Serial('COM10', 9600)
-j = pyvjoy.VJoyDevice(1)
-last_pressed_key = 0
+#!/usr/bin/env python3
+"""
+Serial reader for the Arduino Button Box
+Reads key presses from the serial port and forwards them to a vJoy device
+"""
+
+import argparse
+import contextlib
+import sys
+from typing import List, Tuple
+
+try:
+    import serial
+    HAS_SERIAL = True
+except ImportError:
+    HAS_SERIAL = False
+
+try:
+    import pyvjoy
+    HAS_VJOY = True
+except ImportError:
+    HAS_VJOY = False
+
+
+# Serial key -> vJoy button number
 # L B N A O F G P H K J
-while True:
-    data = ser.readline()
-    print(data.decode().strip())
-    if data.decode().strip() == "A":
-        j.set_button(1, 1)
-        last_pressed_key = 1
-    elif data.decode().strip() == "B":
-        j.set_button(2, 1)
-        last_pressed_key = 2
-    elif data.decode().strip() == "L":
-        j.set_button(3, 1)
-        last_pressed_key = 3
-    elif data.decode().strip() == "N":
-        j.set_button(4, 1)
-        last_pressed_key = 4
-    elif data.decode().strip() == "F":
-        j.set_button(5, 1)
-        last_pressed_key = 5
-    elif data.decode().strip() == "O":
-        j.set_button(6, 1)
-        last_pressed_key = 6
-    elif data.decode().strip() == "G":
-        j.set_button(7, 1)
-        last_pressed_key = 7
-    elif data.decode().strip() == "P":
-        j.set_button(8, 1)
-        last_pressed_key = 8
-    elif data.decode().strip() == "H":
-        j.set_button(9, 1)
-        last_pressed_key = 9
-    elif data.decode().strip() == "J":
-        j.set_button(10, 1)
-        last_pressed_key = 10
-    elif data.decode().strip() == "K":
-        j.set_button(11, 1)
-        last_pressed_key = 11
-    else:
-        if(last_pressed_key != 0):
-            j.set_button(last_pressed_key, 0)
-            last_pressed_key = 0
+KEY_BUTTONS = {
+    "A": 1,
+    "B": 2,
+    "L": 3,
+    "N": 4,
+    "F": 5,
+    "O": 6,
+    "G": 7,
+    "P": 8,
+    "H": 9,
+    "J": 10,
+    "K": 11,
+}
+
+# Buttons per vJoy device / bits in a button state
+MAX_BUTTONS = 32
+
+_NO_STAGE = contextlib.nullcontext()
+
+
+def parse_line(data: bytes) -> int:
+    """Convert a serial line into a button bitmask (bit 0 = button 1)"""
+    button = KEY_BUTTONS.get(data.decode(errors="replace").strip())
+    if button:
+        return 1 << (button - 1)
+    return 0
+
+
+def diff_states(old: int, new: int) -> List[Tuple[int, bool]]:
+    """Get (button, pressed) edges between two bitmask states"""
+    edges = []
+    changed = old ^ new
+    while changed:
+        bit = changed & -changed
+        edges.append((bit.bit_length(), bool(new & bit)))
+        changed ^= bit
+    return edges
+
+
+class VJoyOutput:
+    """Forward button edges to a vJoy device"""
+
+    def __init__(self, device_id: int = 1):
+        self.device = pyvjoy.VJoyDevice(device_id)
+
+    def set_button(self, button: int, pressed: bool):
+        """Press or release a vJoy button"""
+        self.device.set_button(button, 1 if pressed else 0)
+
+
+class PrintOutput:
+    """Print button edges instead of driving a virtual device"""
+
+    def set_button(self, button: int, pressed: bool):
+        """Print a button edge"""
+        print(f"Button {button} {'pressed' if pressed else 'released'}")
+
+
+class ButtonBoxReader:
+    """Button state pipeline: read -> parse -> filter -> dispatch -> output"""
+
+    STAGES = ("read", "parse", "filter", "dispatch", "output")
+
+    def __init__(self, source, output, echo: bool = True, profiler=None):
+        self.source = source
+        self.output = output
+        self.echo = echo
+        self.profiler = profiler
+        self.state = 0
+
+    def _stage(self, name: str):
+        """Context for timing a pipeline stage (no-op without profiler)"""
+        if self.profiler is None:
+            return _NO_STAGE
+        return self.profiler.stage(name)
+
+    def read(self) -> bytes:
+        """Read one raw line from the source"""
+        return self.source.readline()
+
+    def parse(self, data: bytes) -> int:
+        """Decode a raw line into a bitmask state"""
+        if self.echo:
+            print(data.decode(errors="replace").strip())
+        return parse_line(data)
+
+    def filter(self, state: int) -> bool:
+        """Check whether a state differs from the current one"""
+        return state != self.state
+
+    def dispatch(self, state: int) -> List[Tuple[int, bool]]:
+        """Compute button edges and make state current"""
+        edges = diff_states(self.state, state)
+        self.state = state
+        return edges
+
+    def emit(self, edges: List[Tuple[int, bool]]):
+        """Send button edges to the output device"""
+        for button, pressed in edges:
+            self.output.set_button(button, pressed)
+
+    def step(self) -> bool:
+        """Process one line, returns False when the source is exhausted"""
+        with self._stage("read"):
+            data = self.read()
+        if not data:
+            return False
+
+        with self._stage("parse"):
+            state = self.parse(data)
+
+        with self._stage("filter"):
+            changed = self.filter(state)
+        if not changed:
+            return True
+
+        with self._stage("dispatch"):
+            edges = self.dispatch(state)
+
+        with self._stage("output"):
+            self.emit(edges)
+        return True
+
+    def run(self):
+        """Process lines until the source is exhausted"""
+        while self.step():
+            pass
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    """Add --profile options to a reader command line"""
+    parser.add_argument("--profile", action="store_true",
+                       help="Profile pipeline stages and report at exit")
+    parser.add_argument("--profile-mode", choices=("sample", "cprofile"), default="sample",
+                       help="Stack sampling or bounded cProfile window (default: sample)")
+    parser.add_argument("--profile-interval", type=float, default=0.005,
+                       help="Sampling interval in seconds (default: 0.005)")
+    parser.add_argument("--profile-window", type=float, default=30.0,
+                       help="cProfile window in seconds (default: 30)")
+    parser.add_argument("--profile-output", default="reader_profile.collapsed",
+                       help="Collapsed-stack output file (default: reader_profile.collapsed)")
+
+
+def parse_button_list(value: str) -> List[int]:
+    """Parse a comma-separated list of button numbers (argparse type)"""
+    buttons = []
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        try:
+            button = int(item)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid button number: {item.strip()!r}")
+        if not 1 <= button <= MAX_BUTTONS:
+            raise argparse.ArgumentTypeError(f"button {button} out of range 1-{MAX_BUTTONS}")
+        buttons.append(button)
+    return buttons
+
+
+def add_coalesce_arguments(parser: argparse.ArgumentParser):
+    """Add output coalescing options to a reader command line"""
+    parser.add_argument("--coalesce", action="store_true",
+                       help="Collapse queued states while the output driver lags")
+    parser.add_argument("--must-deliver", type=parse_button_list, default=[],
+                       help="Comma-separated buttons whose edges are never coalesced (e.g. 1,5)")
+
+
+def add_event_log_arguments(parser: argparse.ArgumentParser):
+    """Add event recording options to a reader command line"""
+    parser.add_argument("--event-log", metavar="DIR",
+                       help="Append button edges to a columnar event log")
+    parser.add_argument("--device-name", default="Button Box",
+                       help="Device name recorded in the event log (default: Button Box)")
+
+
+def wrap_output(output, args):
+    """Wrap an output driver according to parsed coalescing/event log options"""
+    if args.coalesce:
+        from output_coalescer import CoalescingOutput
+        output = CoalescingOutput(output, must_deliver=args.must_deliver)
+
+    if args.event_log:
+        from event_log import EventLogOutput, EventLogWriter
+        output = EventLogOutput(output, EventLogWriter(args.event_log, args.device_name))
+
+    return output
+
+
+def create_profiler(args, stages=ButtonBoxReader.STAGES):
+    """Create a profiler from parsed --profile options (None if disabled)"""
+    if not args.profile:
+        return None
+
+    from reader_profiler import ReaderProfiler
+    return ReaderProfiler(
+        mode=args.profile_mode,
+        interval=args.profile_interval,
+        window=args.profile_window,
+        stages=stages
+    )
+
+
+def run_reader(reader: ButtonBoxReader, args, close_output: bool = False):
+    """Run a reader until interrupted, reporting the profile at exit
+
+    Set ``close_output`` when the output came wrapped from wrap_output();
+    the wrappers own worker threads and files, so they are always closed.
+    """
+    profiler = reader.profiler
+    if profiler:
+        profiler.start()
+    try:
+        reader.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        try:
+            if profiler:
+                profiler.stop()
+                profiler.write_collapsed(args.profile_output)
+                print(profiler.format_summary())
+                print(f"Collapsed stacks written to: {args.profile_output}")
+        finally:
+            if close_output:
+                reader.output.close()
+                if hasattr(reader.output, "format_stats"):
+                    print(reader.output.format_stats())
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description="Forward Arduino Button Box presses to vJoy",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Examples:
+  # Read from COM10 (default)
+  python serial_reader.py
+
+  # Read from another port
+  python serial_reader.py --port COM3
+
+  # Keep up with a stalling vJoy, never dropping edges of buttons 1 and 2
+  python serial_reader.py --coalesce --must-deliver 1,2
+
+  # Record button edges for later analysis with event_log.py
+  python serial_reader.py --event-log logs/session
+
+  # Profile the reader pipeline and write a flamegraph input file
+  python serial_reader.py --profile --profile-output reader.collapsed
+        """
+    )
+
+    parser.add_argument("--port", default="COM10",
+                       help="Arduino serial port (default: COM10)")
+    parser.add_argument("--baud", type=int, default=9600,
+                       help="Baud rate (default: 9600)")
+    parser.add_argument("--vjoy-device", type=int, default=1,
+                       help="vJoy device number (default: 1)")
+    parser.add_argument("--quiet", action="store_true",
+                       help="Do not echo received lines")
+    add_coalesce_arguments(parser)
+    add_event_log_arguments(parser)
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+
+    if not HAS_SERIAL:
+        print("Error: pyserial is required but not installed")
+        print("Install with: pip install pyserial")
+        return 1
+
+    if not HAS_VJOY:
+        print("Error: pyvjoy is required but not installed")
+        print("Install with: pip install pyvjoy")
+        return 1
+
+    ser = serial.Serial(args.port, args.baud)
+    driver = VJoyOutput(args.vjoy_device)
+    output = wrap_output(driver, args)
+    reader = ButtonBoxReader(ser, output,
+                             echo=not args.quiet, profiler=create_profiler(args))
+    try:
+        run_reader(reader, args, close_output=output is not driver)
+    finally:
+        ser.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,80 +4,39 @@ Test script for USB device detection
 Useful for debugging device detection issues
 """
 
-import subprocess
-import json
+import os
 import sys
 from typing import List, Dict, Optional
 
+from config_loader import parse_usb_id
+from device_catalog import get_catalog
+from usb_detection import (
+    ENV_POWERSHELL,
+    ENV_WORKER,
+    UsbDeviceIndex,
+    default_backend,
+    get_enumeration_cache,
+    parse_device_id,
+)
+
 
 class DeviceDetectionTester:
     """Test USB device detection"""
     
     @staticmethod
-    def get_all_usb_devices() -> List[Dict]:
+    def get_all_usb_devices(index: Optional[UsbDeviceIndex] = None) -> List[Dict]:
         """Get all USB devices"""
-        try:
-            ps_cmd = """
-            Get-WmiObject Win32_PnPEntity | Where-Object {
-                $_.DeviceID -match "USB"
-            } | Select-Object Name, Description, DeviceID, Status | ConvertTo-Json
-            """
-            
-            result = subprocess.run(
-                ["powershell", "-Command", ps_cmd],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            if result.returncode == 0 and result.stdout.strip():
-                try:
-                    data = json.loads(result.stdout)
-                    if isinstance(data, list):
-                        return data
-                    return [data] if data else []
-                except json.JSONDecodeError:
-                    return []
-            
-            return []
-        except Exception as e:
-            print(f"Error getting USB devices: {e}")
-            return []
+        index = index if index is not None else get_enumeration_cache().get()
+        return [device.to_wmi() for device in index]
     
     @staticmethod
-    def find_device_by_vid_pid(vendor_id: str, product_id: str) -> Optional[Dict]:
-        """Find specific device by VID/PID"""
+    def find_device_by_vid_pid(vendor_id: str, product_id: str,
+                               index: Optional[UsbDeviceIndex] = None) -> Optional[Dict]:
+        """Find specific device by VID/PID (from index, or a fresh enumeration)"""
         try:
-            vid = int(vendor_id.replace("0x", ""), 16)
-            pid = int(product_id.replace("0x", ""), 16)
-            
-            ps_cmd = f"""
-            $devices = Get-WmiObject Win32_PnPEntity | Where-Object {{
-                $_.DeviceID -match "VID_{vid:04X}" -and $_.DeviceID -match "PID_{pid:04X}"
-            }}
-            
-            if ($devices) {{
-                $devices | Select-Object Name, Description, DeviceID, Status | ConvertTo-Json
-            }}
-            """
-            
-            result = subprocess.run(
-                ["powershell", "-Command", ps_cmd],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            if result.returncode == 0 and result.stdout.strip():
-                try:
-                    data = json.loads(result.stdout)
-                    if isinstance(data, list):
-                        return data[0] if data else None
-                    return data
-                except json.JSONDecodeError:
-                    return None
-            
-            return None
+            index = index if index is not None else get_enumeration_cache().get()
+            device = index.find(vendor_id, product_id)
+            return device.to_wmi() if device else None
         except Exception as e:
             print(f"Error finding device: {e}")
             return None
@@ -85,20 +44,14 @@ class DeviceDetectionTester:
     @staticmethod
     def parse_device_id(device_id: str) -> Dict:
         """Parse Windows device ID to extract VID/PID"""
-        parts = device_id.split("\\")
+        vendor_id, product_id, serial = parse_device_id(device_id)
         info = {
             "full_id": device_id,
-            "vendor_id": None,
-            "product_id": None,
-            "serial": None
+            "vendor_id": f"0x{vendor_id:04x}" if vendor_id is not None else None,
+            "product_id": f"0x{product_id:04x}" if product_id is not None else None,
+            "serial": serial
         }
         
-        for part in parts:
-            if part.startswith("VID_"):
-                info["vendor_id"] = f"0x{part[4:8]}"
-            elif part.startswith("PID_"):
-                info["product_id"] = f"0x{part[4:8]}"
-        
         return info
     
     @staticmethod
@@ -112,24 +65,24 @@ class DeviceDetectionTester:
         print("\n1. Scanning all USB devices...")
         print("-" * 70)
         
-        devices = DeviceDetectionTester.get_all_usb_devices()
+        # Enumerate once; every lookup below is answered from this snapshot
+        index = get_enumeration_cache().get()
+        print(f"Backend: {default_backend()}")
         
-        if devices:
-            print(f"Found {len(devices)} USB device(s):\n")
+        if len(index):
+            print(f"Found {len(index)} USB device(s):\n")
             
-            for i, device in enumerate(devices, 1):
-                print(f"{i}. {device.get('Name', 'Unknown')}")
-                print(f"   Description: {device.get('Description', 'N/A')}")
-                print(f"   Status: {device.get('Status', 'Unknown')}")
-                
-                device_id = device.get('DeviceID', '')
-                if device_id:
-                    parsed = DeviceDetectionTester.parse_device_id(device_id)
-                    if parsed['vendor_id']:
-                        print(f"   Vendor ID: {parsed['vendor_id']}")
-                    if parsed['product_id']:
-                        print(f"   Product ID: {parsed['product_id']}")
-                    print(f"   Device ID: {device_id}")
+            for i, device in enumerate(index, 1):
+                print(f"{i}. {device.name}")
+                print(f"   Description: {device.description or 'N/A'}")
+                print(f"   Status: {device.status}")
+                if device.vendor_id is not None:
+                    print(f"   Vendor ID: 0x{device.vendor_id:04x}")
+                    print(f"   Product ID: 0x{device.product_id:04x}")
+                if device.serial:
+                    print(f"   Serial: {device.serial}")
+                if device.device_id:
+                    print(f"   Device ID: {device.device_id}")
                 
                 print()
         else:
@@ -145,11 +98,19 @@ class DeviceDetectionTester:
             ("0x2341", "0x0243", "Arduino Micro"),
         ]
         
+        # Configured devices are checked too
+        known = {(parse_usb_id(v), parse_usb_id(p)) for v, p, _ in test_cases}
+        for record in get_catalog().devices:
+            if record.vid_pid not in known:
+                known.add(record.vid_pid)
+                test_cases.append((record.vendor_id_hex, record.product_id_hex, record.name))
+        
+        # Answered from the snapshot above, no extra enumeration per device
         for vendor_id, product_id, description in test_cases:
             print(f"\nSearching for {description}")
             print(f"  VID: {vendor_id}, PID: {product_id}")
             
-            device = DeviceDetectionTester.find_device_by_vid_pid(vendor_id, product_id)
+            device = DeviceDetectionTester.find_device_by_vid_pid(vendor_id, product_id, index)
             
             if device:
                 print(f"  ✓ Found: {device.get('Name', 'Unknown')}")
@@ -168,7 +129,7 @@ class DeviceDetectionTester:
             if vendor_id and product_id:
                 print(f"\nSearching for VID={vendor_id}, PID={product_id}...")
                 
-                device = DeviceDetectionTester.find_device_by_vid_pid(vendor_id, product_id)
+                device = DeviceDetectionTester.find_device_by_vid_pid(vendor_id, product_id, index)
                 
                 if device:
                     print("\n✓ Device found!")
@@ -182,6 +143,8 @@ class DeviceDetectionTester:
         except KeyboardInterrupt:
             print("\nSkipped interactive search")
         
+        print("\n" + get_enumeration_cache().format_stats())
+        
         print("\n" + "=" * 70)
         print("Test complete!")
         print("=" * 70)
@@ -189,10 +152,11 @@ class DeviceDetectionTester:
 
 def main():
     """Main entry point"""
-    if sys.platform != "win32":
-        print("Error: This test script requires Windows")
-        print("It uses PowerShell and WMI which are Windows-specific")
-        sys.exit(1)
+    if sys.platform != "win32" and default_backend() != "sysfs":
+        if not (os.environ.get(ENV_POWERSHELL) or os.environ.get(ENV_WORKER)):
+            print("Error: This test script requires Windows or Linux sysfs")
+            print("Set VUSB_SYSFS_USB to a sysfs tree or VUSB_POWERSHELL to a stub")
+            sys.exit(1)
     
     try:
         tester = DeviceDetectionTester()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Tests for the hidraw reader
+Reports are fed through os.pipe(), either one write per report (like a
+hidraw node) or as a recorded byte stream
+"""
+
+import os
+import unittest
+
+from hidraw_reader import (
+    JOYSTICK_REPORT_DESCRIPTOR,
+    HidrawReader,
+    decode_report,
+    parse_report_descriptor,
+)
+
+
+# Report 1: three 8-bit axes. Report 3: 4 constant padding bits, then
+# buttons 5-16, then 8 bits of another input.
+MIXED_REPORT_DESCRIPTOR = bytes([
+    0x05, 0x01, 0x09, 0x05, 0xA1, 0x01,
+    0x85, 0x01,                                # Report ID (1)
+    0x09, 0x30, 0x75, 0x08, 0x95, 0x03,        #   3 x 8 bits
+    0x81, 0x02,                                #   Input (Data, Variable)
+    0x85, 0x03,                                # Report ID (3)
+    0x75, 0x01, 0x95, 0x04, 0x81, 0x01,        #   4 x 1 bit, Input (Constant)
+    0x05, 0x09, 0x19, 0x05, 0x29, 0x10,        #   Buttons 5-16
+    0x75, 0x01, 0x95, 0x0C, 0x81, 0x02,        #   12 x 1 bit, Input (Data)
+    0x05, 0x01, 0x09, 0x31, 0x75, 0x08, 0x95, 0x01,
+    0x81, 0x02,                                #   1 x 8 bits
+    0xC0,
+])
+
+
+class RecordingOutput:
+    """Output driver that records button edges"""
+
+    def __init__(self):
+        self.edges = []
+
+    def set_button(self, button: int, pressed: bool):
+        self.edges.append((button, pressed))
+
+
+class CountingReader(HidrawReader):
+    """Reader that records every report it reads"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reports = []
+
+    def read(self) -> bytes:
+        report = super().read()
+        if report:
+            self.reports.append(report)
+        return report
+
+
+def button_report(report_id: int, buttons: int, length: int) -> bytes:
+    """Build a Joystick library report: ID byte, then the button bits"""
+    return bytes([report_id]) + buttons.to_bytes(length - 1, "little")
+
+
+class ReportDescriptorTest(unittest.TestCase):
+    """Button field location from the report descriptor"""
+
+    def test_joystick_layout(self):
+        layout = parse_report_descriptor(JOYSTICK_REPORT_DESCRIPTOR)
+        self.assertEqual(layout.report_id, 3)
+        self.assertEqual(layout.bit_offset, 8)
+        self.assertEqual(layout.button_count, 32)
+        self.assertEqual(layout.first_button, 1)
+        self.assertEqual(layout.report_length, 5)
+        self.assertEqual(layout.input_lengths, {3: 5})
+
+    def test_mixed_layout(self):
+        layout = parse_report_descriptor(MIXED_REPORT_DESCRIPTOR)
+        self.assertEqual(layout.report_id, 3)
+        self.assertEqual(layout.bit_offset, 8 + 4)
+        self.assertEqual(layout.button_count, 12)
+        self.assertEqual(layout.first_button, 5)
+        self.assertEqual(layout.input_lengths, {1: 4, 3: 4})
+
+        # Button 5 is bit 4 after the ID byte; bit 0 is padding
+        self.assertEqual(decode_report(b"\x03\x10\x00\x00", layout), 1 << 4)
+        self.assertEqual(decode_report(b"\x03\x01\x00\x00", layout), 0)
+        # Button 16 is the last bit of the field; the axis byte is ignored
+        self.assertEqual(decode_report(b"\x03\x00\x80\xff", layout), 1 << 15)
+        self.assertIsNone(decode_report(b"\x01\xff\xff\xff", layout))
+        self.assertIsNone(decode_report(b"\x03\x10", layout))
+
+    def test_no_buttons(self):
+        with self.assertRaises(ValueError):
+            parse_report_descriptor(MIXED_REPORT_DESCRIPTOR[:16] + b"\xC0")
+
+
+class PipeTest(unittest.TestCase):
+    """Reports read through a pipe"""
+
+    def setUp(self):
+        read_fd, self.write_fd = os.pipe()
+        self.source = os.fdopen(read_fd, "rb", buffering=0)
+        self.output = RecordingOutput()
+
+    def tearDown(self):
+        self.source.close()
+        if self.write_fd is not None:
+            os.close(self.write_fd)
+
+    def close_writer(self):
+        os.close(self.write_fd)
+        self.write_fd = None
+
+    def test_packetized_one_report_per_read(self):
+        layout = parse_report_descriptor(MIXED_REPORT_DESCRIPTOR)
+        reader = CountingReader(self.source, self.output, layout, echo=False, packetized=True)
+        reports = [
+            b"\x03\x10\x00\x00",        # button 5
+            b"\x01\x7f\x80\x81",        # axes report, ignored
+            b"\x03\x30\x00\x00",        # buttons 5 and 6
+            b"\x03\x00\x00",            # short report, ignored
+            b"\x03\x00\x80\x00",        # button 16 only
+        ]
+        for report in reports:
+            os.write(self.write_fd, report)
+            self.assertTrue(reader.step())
+        self.close_writer()
+        self.assertFalse(reader.step())
+
+        self.assertEqual(reader.reports, reports)
+        self.assertEqual(reader.state, 1 << 15)
+        self.assertEqual(self.output.edges, [
+            (5, True), (6, True), (5, False), (6, False), (16, True),
+        ])
+
+    def test_recorded_stream_split_by_report_id(self):
+        layout = parse_report_descriptor(MIXED_REPORT_DESCRIPTOR)
+        reader = CountingReader(self.source, self.output, layout, echo=False)
+        self.assertFalse(reader.packetized)
+
+        stream = b"\x01\xaa\xbb\xcc" + b"\x03\x10\x00\x00" + b"\x01\x00\x00\x00" + b"\x03\x00\x00\x00"
+        os.write(self.write_fd, stream)
+        self.close_writer()
+        reader.run()
+
+        self.assertEqual([len(report) for report in reader.reports], [4, 4, 4, 4])
+        self.assertEqual(b"".join(reader.reports), stream)
+        self.assertEqual(self.output.edges, [(5, True), (5, False)])
+
+    def test_recorded_joystick_stream(self):
+        layout = parse_report_descriptor(JOYSTICK_REPORT_DESCRIPTOR)
+        reader = CountingReader(self.source, self.output, layout, echo=False)
+        stream = b"".join(button_report(3, buttons, 5) for buttons in (0x1, 0x80000001, 0x0))
+        os.write(self.write_fd, stream)
+        self.close_writer()
+        reader.run()
+
+        self.assertEqual(len(reader.reports), 3)
+        self.assertEqual(self.output.edges, [(1, True), (32, True), (1, False), (32, False)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent PowerShell worker
+Run against the local stand-in (powershell_worker.py --stand-in), so no
+PowerShell is needed
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+from powershell_worker import PowerShellError, PowerShellWorker
+
+
+STAND_IN = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                         "powershell_worker.py"), "--stand-in"]
+
+
+class PowerShellWorkerTest(unittest.TestCase):
+    """Request/response cycle, restarts and timeouts"""
+
+    def setUp(self):
+        self.worker = PowerShellWorker(STAND_IN, timeout=5.0)
+
+    def tearDown(self):
+        self.worker.close()
+
+    def test_request_response(self):
+        self.assertEqual(self.worker.run("Get-Date"), "Get-Date")
+        self.assertEqual(self.worker.run("Get-PnpDevice"), "Get-PnpDevice")
+        self.assertEqual(self.worker.starts, 1)
+        self.assertEqual(self.worker.requests, 2)
+        self.assertTrue(self.worker.running)
+
+    def test_script_error(self):
+        with self.assertRaisesRegex(PowerShellError, "^Device not found$"):
+            self.worker.run("throw Device not found")
+        # A failed script leaves the worker running
+        self.assertTrue(self.worker.running)
+        self.assertEqual(self.worker.run("Get-Date"), "Get-Date")
+        self.assertEqual(self.worker.starts, 1)
+
+    def test_restart_after_crash(self):
+        self.worker.run("Get-Date")
+        with self.assertRaisesRegex(PowerShellError, "exited"):
+            self.worker.run("exit")
+        self.assertEqual(self.worker.failures, 1)
+        self.assertEqual(self.worker.run("Get-Date"), "Get-Date")
+        self.assertEqual(self.worker.starts, 2)
+
+    def test_restart_after_idle_death(self):
+        self.worker.run("Get-Date")
+        self.worker._process.kill()
+        self.worker._process.wait()
+        self.assertEqual(self.worker.run("Get-Date"), "Get-Date")
+        self.assertEqual(self.worker.starts, 2)
+
+    def test_timeout(self):
+        with self.assertRaisesRegex(PowerShellError, "timed out"):
+            self.worker.run("Start-Sleep -Seconds 5", timeout=0.2)
+        self.assertEqual(self.worker.timeouts, 1)
+        self.assertFalse(self.worker.running)
+        # The next request gets a fresh worker, not the late answer
+        self.assertEqual(self.worker.run("Get-Date"), "Get-Date")
+        self.assertEqual(self.worker.starts, 2)
+
+    def test_replay(self):
+        devices = [{"Name": "Button Box", "DeviceID": "USB\\VID_16C0&PID_05DF\\1", "Status": "OK"}]
+        with tempfile.TemporaryDirectory() as temp:
+            replay = os.path.join(temp, "usb_devices.json")
+            with open(replay, "w", encoding="utf-8") as f:
+                json.dump(devices, f)
+            worker = PowerShellWorker(STAND_IN + ["--replay", replay], timeout=5.0)
+            try:
+                output = worker.run("Get-PnpDevice")
+            finally:
+                worker.close()
+        self.assertEqual(json.loads(output), devices)
+
+
+if __name__ == "__main__":
+    unittest.main()
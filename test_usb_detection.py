@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Tests for USB detection
+The sysfs backend runs against a fake /sys/bus/usb/devices tree in a
+temporary directory; the enumeration cache against a scripted scan
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from usb_detection import (
+    EnumerationCache,
+    UsbDevice,
+    UsbDeviceIndex,
+    enumerate_sysfs,
+    iter_sysfs,
+    parse_device_id,
+    write_fake_sysfs,
+)
+
+
+def write_attrs(path: str, **attrs: str):
+    """Write raw sysfs attribute files"""
+    os.makedirs(path, exist_ok=True)
+    for name, value in attrs.items():
+        with open(os.path.join(path, name), "w", encoding="utf-8") as f:
+            f.write(f"{value}\n")
+
+
+class SysfsBackendTest(unittest.TestCase):
+    """ID parsing, interface entries and device status from sysfs"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="vusb_sysfs_")
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_round_trip(self):
+        devices = [
+            UsbDevice("Button Box", "SODevs", "", "OK", 0x16c0, 0x05df, "BB01"),
+            UsbDevice("Arduino Uno", "Arduino", "", "OK", 0x2341, 0x0043, None),
+        ]
+        write_fake_sysfs(self.root, devices)
+        found = list(iter_sysfs(self.root))
+
+        self.assertEqual([d.device_id for d in found], ["1-1", "1-2"])
+        first, second = found
+        self.assertEqual((first.vendor_id, first.product_id), (0x16c0, 0x05df))
+        self.assertEqual((first.name, first.description, first.serial), ("Button Box", "SODevs", "BB01"))
+        self.assertEqual(first.status, "OK")
+        self.assertIsNone(second.serial)
+        self.assertEqual(enumerate_sysfs(self.root).find("0x2341", "0x0043").device_id, "1-2")
+
+    def test_hex_ids(self):
+        write_attrs(os.path.join(self.root, "1-1"), idVendor="16C0", idProduct="05dF")
+        write_attrs(os.path.join(self.root, "1-2"), idVendor="zzzz", idProduct="0001")
+        write_attrs(os.path.join(self.root, "1-3"), idVendor="2341")
+
+        found = list(iter_sysfs(self.root))
+        self.assertEqual([d.device_id for d in found], ["1-1"])
+        self.assertEqual((found[0].vendor_id, found[0].product_id), (0x16c0, 0x05df))
+        self.assertEqual(found[0].name, "Unknown")
+
+    def test_interfaces_skipped(self):
+        write_fake_sysfs(self.root, [UsbDevice("Button Box", "", "", "OK", 0x16c0, 0x05df, None)])
+        # Even an interface entry carrying IDs is not a device
+        write_attrs(os.path.join(self.root, "1-1:1.0"), idVendor="16c0", idProduct="05df")
+        write_attrs(os.path.join(self.root, "usb1"), idVendor="1d6b", idProduct="0002")
+
+        self.assertTrue(os.path.isdir(os.path.join(self.root, "1-1:1.0")))
+        self.assertEqual([d.device_id for d in iter_sysfs(self.root)], ["1-1", "usb1"])
+
+    def test_unauthorized_is_disabled(self):
+        write_attrs(os.path.join(self.root, "1-1"), idVendor="16c0", idProduct="05df", authorized="0")
+        write_attrs(os.path.join(self.root, "1-2"), idVendor="16c0", idProduct="05e0", authorized="1")
+        write_attrs(os.path.join(self.root, "1-3"), idVendor="16c0", idProduct="05e1")
+
+        statuses = {d.device_id: d.status for d in iter_sysfs(self.root)}
+        self.assertEqual(statuses, {"1-1": "Disabled", "1-2": "OK", "1-3": "OK"})
+
+    def test_windows_device_id(self):
+        self.assertEqual(parse_device_id(r"USB\VID_16C0&PID_05DF\5&2A3B4C&0&1"),
+                         (0x16c0, 0x05df, "5&2A3B4C&0&1"))
+        self.assertEqual(parse_device_id(r"USB\VID_2341&PID_0043"), (0x2341, 0x0043, None))
+        self.assertEqual(parse_device_id(r"HID\Keyboard\1"), (None, None, None))
+
+
+class EnumerationCacheTest(unittest.TestCase):
+    """Caching and invalidation while a scan is running"""
+
+    def setUp(self):
+        self.scans = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def scan(self, timeout: float) -> UsbDeviceIndex:
+        self.scans += 1
+        self.started.set()
+        self.release.wait(timeout)
+        return UsbDeviceIndex([UsbDevice("Button Box", "", f"1-{self.scans}", "OK", 0x16c0, 0x05df, None)])
+
+    def test_hits_until_invalidated(self):
+        cache = EnumerationCache(ttl=60, scan=self.scan)
+        first = cache.get()
+        self.assertIs(cache.get(), first)
+        cache.invalidate()
+        self.assertIsNot(cache.get(), first)
+        self.assertEqual((cache.hits, cache.misses, self.scans), (1, 2, 2))
+
+    def test_invalidate_during_scan(self):
+        cache = EnumerationCache(ttl=60, scan=self.scan)
+        self.release.clear()
+        results = []
+        scanner = threading.Thread(target=lambda: results.append(cache.get(timeout=5)))
+        scanner.start()
+        self.assertTrue(self.started.wait(5))
+
+        # Does not wait for the scan, and its older result is not cached
+        cache.invalidate()
+        self.assertTrue(scanner.is_alive())
+        self.release.set()
+        scanner.join(5)
+
+        self.assertEqual(results[0].find("0x16c0", "0x05df").device_id, "1-1")
+        self.assertEqual(cache.get().find("0x16c0", "0x05df").device_id, "1-2")
+        self.assertEqual(self.scans, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,825 @@
+#!/usr/bin/env python3
+"""
+Bulk USB device enumeration for the V-USB tools
+Enumerates all USB devices at once (PowerShell/WMI on Windows, sysfs on
+Linux) and answers VID/PID lookups from an in-memory index
+"""
+
+import argparse
+import json
+import os
+import queue
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from config_loader import parse_usb_id
+
+
+# Command used to run PowerShell, e.g. a stub replaying captured output
+ENV_POWERSHELL = "VUSB_POWERSHELL"
+# Full persistent worker command (see powershell_worker.py)
+ENV_WORKER = "VUSB_POWERSHELL_WORKER"
+
+# Lifetime of the shared enumeration cache in seconds
+ENV_CACHE_TTL = "VUSB_ENUM_CACHE_TTL"
+DEFAULT_CACHE_TTL = 5.0
+
+# sysfs device directory, overridable with e.g. a fake tree for testing
+SYSFS_USB_DEVICES = "/sys/bus/usb/devices"
+ENV_SYSFS = "VUSB_SYSFS_USB"
+
+ENUMERATE_SCRIPT = """
+Get-WmiObject Win32_PnPEntity | Where-Object {
+    $_.DeviceID -match "USB|VID_"
+} | Select-Object Name, Description, DeviceID, Status | ConvertTo-Json -Compress
+"""
+
+# One compressed JSON object per line, flushed as each device is found
+STREAM_SCRIPT = """
+Get-WmiObject Win32_USBControllerDevice | ForEach-Object {
+    $device = [wmi]$_.Dependent
+    $line = $device | Select-Object Name, Description, DeviceID, Status | ConvertTo-Json -Compress
+    [Console]::Out.WriteLine($line)
+    [Console]::Out.Flush()
+}
+"""
+
+# Targeted query for one VID/PID (WQL filter runs inside WMI)
+PROBE_SCRIPT = """
+Get-WmiObject Win32_PnPEntity -Filter "DeviceID LIKE '%VID_{vid:04X}&PID_{pid:04X}%'" |
+    Select-Object Name, Description, DeviceID, Status | ConvertTo-Json -Compress
+"""
+
+_ID_PATTERN = re.compile(r"VID_([0-9A-F]{4})&PID_([0-9A-F]{4})", re.IGNORECASE)
+
+
+class UsbDevice(NamedTuple):
+    """USB device as reported by Win32_PnPEntity or sysfs"""
+    name: str
+    description: str
+    device_id: str
+    status: str
+    vendor_id: Optional[int]
+    product_id: Optional[int]
+    serial: Optional[str]
+
+    @classmethod
+    def from_wmi(cls, entry: Dict) -> "UsbDevice":
+        """Create from a Win32_PnPEntity JSON object"""
+        device_id = entry.get("DeviceID") or ""
+        vendor_id, product_id, serial = parse_device_id(device_id)
+        return cls(
+            name=entry.get("Name") or "Unknown",
+            description=entry.get("Description") or "",
+            device_id=device_id,
+            status=entry.get("Status") or "Unknown",
+            vendor_id=vendor_id,
+            product_id=product_id,
+            serial=serial,
+        )
+
+    @classmethod
+    def from_sysfs(cls, path: str) -> Optional["UsbDevice"]:
+        """Create from a /sys/bus/usb/devices entry (None for interfaces)"""
+        vendor_id = _read_attr(path, "idVendor")
+        product_id = _read_attr(path, "idProduct")
+        if vendor_id is None or product_id is None:
+            return None
+        try:
+            vendor_id, product_id = int(vendor_id, 16), int(product_id, 16)
+        except ValueError:
+            return None
+        return cls(
+            name=_read_attr(path, "product") or "Unknown",
+            description=_read_attr(path, "manufacturer") or "",
+            device_id=os.path.basename(path),
+            status="Disabled" if _read_attr(path, "authorized") == "0" else "OK",
+            vendor_id=vendor_id,
+            product_id=product_id,
+            serial=_read_attr(path, "serial"),
+        )
+
+    def to_wmi(self) -> Dict[str, str]:
+        """Convert back to the Win32_PnPEntity field names"""
+        return {
+            "Name": self.name,
+            "Description": self.description,
+            "DeviceID": self.device_id,
+            "Status": self.status,
+        }
+
+
+def parse_device_id(device_id: str) -> Tuple[Optional[int], Optional[int], Optional[str]]:
+    """Extract (vendor_id, product_id, serial) from a Windows device ID
+
+    e.g. USB\\VID_16C0&PID_05DF\\5&2A3B4C&0&1 -> (0x16c0, 0x05df, "5&2A3B4C&0&1")
+    """
+    match = _ID_PATTERN.search(device_id)
+    if not match:
+        return None, None, None
+    parts = device_id.split("\\")
+    serial = parts[2] if len(parts) > 2 else None
+    return int(match.group(1), 16), int(match.group(2), 16), serial
+
+
+def _read_attr(path: str, name: str) -> Optional[str]:
+    """Read a sysfs attribute (None if missing or unreadable)"""
+    try:
+        with open(os.path.join(path, name), encoding="utf-8", errors="replace") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+class UsbDeviceIndex:
+    """Snapshot of enumerated USB devices indexed by (vendor_id, product_id)"""
+
+    __slots__ = ("devices", "_by_id")
+
+    def __init__(self, devices: Iterable[UsbDevice] = ()):
+        self.devices = tuple(devices)
+        by_id: Dict[Tuple[int, int], List[UsbDevice]] = {}
+        for device in self.devices:
+            if device.vendor_id is not None:
+                by_id.setdefault((device.vendor_id, device.product_id), []).append(device)
+        self._by_id = {key: tuple(group) for key, group in by_id.items()}
+
+    @classmethod
+    def from_json(cls, text: str) -> "UsbDeviceIndex":
+        """Build from ConvertTo-Json output (a single object or a list)"""
+        if not text.strip():
+            return cls()
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = [data]
+        return cls(UsbDevice.from_wmi(entry) for entry in data or [] if isinstance(entry, dict))
+
+    def __len__(self) -> int:
+        return len(self.devices)
+
+    def __iter__(self):
+        return iter(self.devices)
+
+    def find_all(self, vendor_id, product_id) -> Tuple[UsbDevice, ...]:
+        """Get every device with a VID/PID (int or "0x16c0" style strings)"""
+        return self._by_id.get((parse_usb_id(vendor_id), parse_usb_id(product_id)), ())
+
+    def find(self, vendor_id, product_id) -> Optional[UsbDevice]:
+        """Get the first device with a VID/PID, or None"""
+        devices = self.find_all(vendor_id, product_id)
+        return devices[0] if devices else None
+
+    def lookup(self, ids: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[UsbDevice]]:
+        """Answer several (vendor_id, product_id) queries from this snapshot"""
+        return {key: self.find(*key) for key in ids}
+
+
+def sysfs_root() -> str:
+    """Get the sysfs USB device directory (overridable with VUSB_SYSFS_USB)"""
+    return os.environ.get(ENV_SYSFS) or SYSFS_USB_DEVICES
+
+
+def default_backend() -> str:
+    """Pick the enumeration backend: sysfs where available, else PowerShell
+
+    A PowerShell override (VUSB_POWERSHELL or VUSB_POWERSHELL_WORKER)
+    always selects PowerShell, so stubs work on any host.
+    """
+    if os.environ.get(ENV_POWERSHELL) or os.environ.get(ENV_WORKER):
+        return "powershell"
+    if sys.platform.startswith("linux") and os.path.isdir(sysfs_root()):
+        return "sysfs"
+    return "powershell"
+
+
+def iter_sysfs(root: Optional[str] = None) -> Iterator[UsbDevice]:
+    """Yield USB devices from sysfs one at a time
+
+    Interface entries (e.g. 1-1:1.0) have no idVendor and are skipped.
+    """
+    root = root or sysfs_root()
+    with os.scandir(root) as entries:
+        names = sorted(entry.name for entry in entries if ":" not in entry.name)
+    for name in names:
+        device = UsbDevice.from_sysfs(os.path.join(root, name))
+        if device is not None:
+            yield device
+
+
+def enumerate_sysfs(root: Optional[str] = None) -> UsbDeviceIndex:
+    """Enumerate USB devices from sysfs without starting any process"""
+    return UsbDeviceIndex(iter_sysfs(root))
+
+
+def write_fake_sysfs(root: str, devices: Iterable[UsbDevice]):
+    """Write a minimal /sys/bus/usb/devices tree, one bus port per device
+
+    Each device also gets an interface entry, like the real tree.
+    """
+    os.makedirs(root, exist_ok=True)
+    for port, device in enumerate(devices, 1):
+        path = os.path.join(root, f"1-{port}")
+        attrs = {
+            "idVendor": f"{device.vendor_id:04x}",
+            "idProduct": f"{device.product_id:04x}",
+            "product": device.name,
+            "manufacturer": device.description,
+            "serial": device.serial,
+            "authorized": "0" if device.status == "Disabled" else "1",
+        }
+        os.makedirs(os.path.join(root, f"1-{port}:1.0"), exist_ok=True)
+        os.makedirs(path, exist_ok=True)
+        for name, value in attrs.items():
+            if value is not None:
+                with open(os.path.join(path, name), "w", encoding="utf-8") as f:
+                    f.write(f"{value}\n")
+
+
+def powershell_command() -> List[str]:
+    """Get the PowerShell command line (overridable with VUSB_POWERSHELL)"""
+    override = os.environ.get(ENV_POWERSHELL)
+    if override:
+        return shlex.split(override, posix=os.name != "nt")
+    return ["powershell", "-NoProfile"]
+
+
+def run_enumeration(timeout: float = 10.0, command: Optional[List[str]] = None,
+                    worker=None) -> str:
+    """Run the enumeration script once and return its raw JSON output
+
+    With a PowerShellWorker the script runs in its long-lived process,
+    otherwise in a new PowerShell process.
+    """
+    if worker is not None:
+        return worker.run(ENUMERATE_SCRIPT, timeout)
+    result = subprocess.run(
+        (command or powershell_command()) + ["-Command", ENUMERATE_SCRIPT],
+        capture_output=True,
+        text=True,
+        timeout=timeout
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"exit code {result.returncode}")
+    return result.stdout
+
+
+ENUMERATION_ERRORS = (OSError, RuntimeError, subprocess.TimeoutExpired, json.JSONDecodeError)
+
+
+def _enumerate(timeout: float = 10.0, command: Optional[List[str]] = None,
+               worker=None, backend: Optional[str] = None) -> UsbDeviceIndex:
+    """Enumerate all USB devices once, raising ENUMERATION_ERRORS on failure"""
+    backend = backend or ("powershell" if command else default_backend())
+    if backend == "sysfs":
+        return enumerate_sysfs()
+    return UsbDeviceIndex.from_json(run_enumeration(timeout, command, worker))
+
+
+def enumerate_usb_devices(timeout: float = 10.0, command: Optional[List[str]] = None,
+                          worker=None, backend: Optional[str] = None) -> UsbDeviceIndex:
+    """Enumerate all USB devices once (empty index on error)
+
+    The backend ("sysfs" or "powershell") defaults to default_backend(),
+    or to PowerShell when an explicit command is given.
+    """
+    try:
+        return _enumerate(timeout, command, worker, backend)
+    except ENUMERATION_ERRORS as e:
+        print(f"Error enumerating USB devices: {e}")
+        return UsbDeviceIndex()
+
+
+class DeviceStream:
+    """Yield devices as the enumerator reports them, until a deadline
+
+    Iterating starts the enumeration. PowerShell prints one JSON record per
+    line, so each device is yielded as soon as its line arrives. When the
+    deadline passes the child is killed and iteration ends with the
+    devices found so far. ``complete`` is only set when the enumerator
+    ran to the end and exited with status 0. Duplicates are skipped.
+    """
+
+    def __init__(self, deadline: float = 5.0, command: Optional[List[str]] = None,
+                 backend: Optional[str] = None):
+        self.deadline = deadline
+        self.command = command
+        self.backend = backend or ("powershell" if command else default_backend())
+        self.devices: List[UsbDevice] = []
+        self.complete = False
+        self.timed_out = False
+        self.returncode: Optional[int] = None
+        self.elapsed = 0.0
+
+    def __iter__(self) -> Iterator[UsbDevice]:
+        start = time.monotonic()
+        seen = set()
+        source = self._sysfs() if self.backend == "sysfs" else self._powershell(start)
+        try:
+            for device in source:
+                if device.device_id in seen:
+                    continue
+                seen.add(device.device_id)
+                self.devices.append(device)
+                yield device
+                if time.monotonic() - start > self.deadline:
+                    self.timed_out = True
+                    return
+            self.complete = self.returncode == 0 and not self.timed_out
+        finally:
+            source.close()
+            self.elapsed = time.monotonic() - start
+
+    def _sysfs(self) -> Iterator[UsbDevice]:
+        yield from iter_sysfs()
+        self.returncode = 0
+
+    def _powershell(self, start: float) -> Iterator[UsbDevice]:
+        process = subprocess.Popen(
+            (self.command or powershell_command()) + ["-Command", STREAM_SCRIPT],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
+        )
+        lines = queue.Queue()
+
+        def pump():
+            for line in process.stdout:
+                lines.put(line)
+            lines.put(None)
+
+        threading.Thread(target=pump, name="usb-stream", daemon=True).start()
+        try:
+            while True:
+                remaining = self.deadline - (time.monotonic() - start)
+                try:
+                    line = lines.get(timeout=max(0.0, remaining))
+                except queue.Empty:
+                    self.timed_out = True
+                    return
+                if line is None:
+                    try:
+                        self.returncode = process.wait(timeout=max(0.0, remaining))
+                    except subprocess.TimeoutExpired:
+                        self.timed_out = True
+                    return
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(entry, dict):
+                    yield UsbDevice.from_wmi(entry)
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+
+    def index(self) -> UsbDeviceIndex:
+        """Get an index of the devices yielded so far"""
+        return UsbDeviceIndex(self.devices)
+
+
+class EnumerationCache:
+    """Share one enumeration between callers for a limited time
+
+    get() returns the cached index while it is younger than ``ttl``
+    seconds, otherwise it scans (one caller scans, concurrent callers
+    wait for its result). Hotplug events and driver installs call
+    invalidate(). Failed scans are not cached.
+    """
+
+    def __init__(self, ttl: float = 5.0, scan: Optional[Callable[[float], UsbDeviceIndex]] = None):
+        self.ttl = ttl
+        self._scan = scan or _shared_worker_scan
+        self._index: Optional[UsbDeviceIndex] = None
+        self._time = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()           # one scan at a time
+        self._state_lock = threading.Lock()     # index, time and generation; never held while scanning
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+        self.scan_seconds = 0.0
+
+    def get(self, timeout: float = 10.0, max_age: Optional[float] = None) -> UsbDeviceIndex:
+        """Get the cached index, scanning if it is missing or too old"""
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            with self._state_lock:
+                index, age = self._index, time.monotonic() - self._time
+            if index is not None and age < max_age:
+                self.hits += 1
+                return index
+            self.misses += 1
+            return self._refresh(timeout)
+
+    def refresh(self, timeout: float = 10.0) -> UsbDeviceIndex:
+        """Scan now and cache the result"""
+        with self._lock:
+            return self._refresh(timeout)
+
+    def _refresh(self, timeout: float) -> UsbDeviceIndex:
+        """Scan and cache (lock held); a scan overtaken by invalidate() is not cached"""
+        with self._state_lock:
+            generation = self._generation
+        start = time.monotonic()
+        try:
+            index = self._scan(timeout)
+        except ENUMERATION_ERRORS as e:
+            self.errors += 1
+            print(f"Error enumerating USB devices: {e}")
+            return UsbDeviceIndex()
+        finally:
+            self.scan_seconds += time.monotonic() - start
+        with self._state_lock:
+            if generation == self._generation:
+                self._index = index
+                self._time = time.monotonic()
+        return index
+
+    def invalidate(self):
+        """Drop the cached index (e.g. a device was connected or removed)
+
+        Does not wait for a scan in progress; that scan's result is
+        returned to its callers but not cached.
+        """
+        with self._state_lock:
+            self._generation += 1
+            self._index = None
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Get cache counters"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "scan_seconds": round(self.scan_seconds, 3),
+        }
+
+    def format_stats(self) -> str:
+        """Format cache counters for display"""
+        stats = self.stats()
+        lines = ["USB enumeration cache:"]
+        lines.append(f"  scans avoided (hits)   {stats['hits']}")
+        lines.append(f"  scans run (misses)     {stats['misses']}")
+        lines.append(f"  invalidations          {stats['invalidations']}")
+        lines.append(f"  failed scans           {stats['errors']}")
+        lines.append(f"  hit rate               {stats['hit_rate']:.0%}")
+        lines.append(f"  time spent scanning    {stats['scan_seconds']:.3f} s")
+        return "\n".join(lines)
+
+
+def _shared_worker_scan(timeout: float) -> UsbDeviceIndex:
+    """Scan with the process-wide PowerShell worker (or sysfs)"""
+    from powershell_worker import get_worker
+    return _enumerate(timeout, worker=get_worker())
+
+
+_cache: Optional[EnumerationCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_enumeration_cache() -> EnumerationCache:
+    """Get the process-wide enumeration cache (TTL from VUSB_ENUM_CACHE_TTL)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                ttl = float(os.environ.get(ENV_CACHE_TTL, DEFAULT_CACHE_TTL))
+            except ValueError:
+                ttl = DEFAULT_CACHE_TTL
+            _cache = EnumerationCache(ttl)
+        return _cache
+
+
+class ProbeResult(NamedTuple):
+    """Outcome of probing one VID/PID"""
+    vendor_id: int
+    product_id: int
+    label: str
+    device: Optional[UsbDevice]
+    status: str             # "found", "not found", "timeout" or "error"
+    elapsed: float          # seconds from probe start to its result
+    error: Optional[str] = None
+
+    @property
+    def found(self) -> bool:
+        return self.device is not None
+
+
+def probe_device(vendor_id: int, product_id: int, timeout: float = 10.0,
+                 command: Optional[List[str]] = None,
+                 backend: Optional[str] = None) -> Optional[UsbDevice]:
+    """Query a single VID/PID in its own process (or sysfs)
+
+    Raises ENUMERATION_ERRORS on failure.
+    """
+    backend = backend or ("powershell" if command else default_backend())
+    if backend == "sysfs":
+        return enumerate_sysfs().find(vendor_id, product_id)
+
+    script = PROBE_SCRIPT.format(vid=vendor_id, pid=product_id)
+    result = subprocess.run(
+        (command or powershell_command()) + ["-Command", script],
+        capture_output=True,
+        text=True,
+        timeout=timeout
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"exit code {result.returncode}")
+    return UsbDeviceIndex.from_json(result.stdout).find(vendor_id, product_id)
+
+
+def probe_devices(targets: Iterable[Tuple], deadline: float = 10.0,
+                  max_workers: Optional[int] = None,
+                  probe: Optional[Callable[[int, int, float], Optional[UsbDevice]]] = None
+                  ) -> List[ProbeResult]:
+    """Probe several devices concurrently under one shared deadline
+
+    ``targets`` holds (vendor_id, product_id) or (vendor_id, product_id,
+    label) tuples; IDs may be ints or "0x16c0" strings. All probes start
+    at once on a thread pool and each gets the time left until the
+    deadline, so the whole check takes as long as the slowest probe.
+    Probes still running at the deadline are reported as "timeout".
+    Results keep the order of ``targets``.
+    """
+    probe = probe or probe_device
+    jobs = []
+    for target in targets:
+        vendor_id, product_id = parse_usb_id(target[0]), parse_usb_id(target[1])
+        label = target[2] if len(target) > 2 else f"0x{vendor_id:04x}:0x{product_id:04x}"
+        jobs.append((vendor_id, product_id, label))
+    if not jobs:
+        return []
+
+    start = time.monotonic()
+    end = start + deadline
+
+    def run(vendor_id: int, product_id: int, label: str) -> ProbeResult:
+        try:
+            device = probe(vendor_id, product_id, max(0.0, end - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            return ProbeResult(vendor_id, product_id, label, None, "timeout",
+                               time.monotonic() - start)
+        except ENUMERATION_ERRORS as e:
+            return ProbeResult(vendor_id, product_id, label, None, "error",
+                               time.monotonic() - start, str(e))
+        return ProbeResult(vendor_id, product_id, label, device,
+                           "found" if device else "not found", time.monotonic() - start)
+
+    pool = ThreadPoolExecutor(max_workers=max_workers or len(jobs),
+                              thread_name_prefix="usb-probe")
+    try:
+        futures = [pool.submit(run, *job) for job in jobs]
+        wait(futures, timeout=deadline)
+        results = []
+        for future, (vendor_id, product_id, label) in zip(futures, jobs):
+            if future.done():
+                results.append(future.result())
+            else:
+                future.cancel()
+                results.append(ProbeResult(vendor_id, product_id, label, None, "timeout",
+                                           time.monotonic() - start))
+        return results
+    finally:
+        pool.shutdown(wait=False)
+
+
+def _synthetic_capture(count: int) -> str:
+    """Generate ConvertTo-Json output for a machine with many USB devices"""
+    entries = []
+    for i in range(count):
+        vid, pid = (0x16C0, 0x05DF) if i % 97 == 0 else (0x0400 + i % 300, i % 4096)
+        entries.append({
+            "Name": f"USB Input Device {i}",
+            "Description": "USB Input Device",
+            "DeviceID": f"USB\\VID_{vid:04X}&PID_{pid:04X}\\5&{i:08X}&0&{i % 8}",
+            "Status": "OK",
+        })
+    return json.dumps(entries)
+
+
+def benchmark(capture_file: Optional[str] = None, count: int = 200,
+              queries: Optional[List[Tuple[str, str]]] = None):
+    """Compare one enumeration per VID/PID, one bulk enumeration and sysfs
+
+    PowerShell is replaced by a stub process that prints captured output,
+    so the numbers show process/parse overhead rather than WMI query time.
+    The sysfs backend reads a fake tree holding the same devices.
+    """
+    queries = queries or [
+        ("0x16c0", "0x05df"),
+        ("0x2341", "0x0043"),
+        ("0x2341", "0x0243"),
+    ]
+
+    temp = None
+    if capture_file is None:
+        temp = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+        temp.write(_synthetic_capture(count))
+        temp.close()
+        capture_file = temp.name
+    stub = [sys.executable, "-c",
+            "import sys; sys.stdout.write(open(sys.argv[1]).read())", capture_file]
+
+    try:
+        start = time.perf_counter()
+        per_query = {}
+        for key in queries:
+            per_query[key] = enumerate_usb_devices(command=stub).find(*key)
+        separate = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = enumerate_usb_devices(command=stub)
+        bulk_results = index.lookup(queries)
+        bulk = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(1000):
+            index.lookup(queries)
+        lookup = (time.perf_counter() - start) / (1000 * len(queries))
+
+        fake_root = tempfile.mkdtemp(prefix="vusb_sysfs_")
+        write_fake_sysfs(fake_root, index)
+        start = time.perf_counter()
+        sysfs_index = enumerate_sysfs(fake_root)
+        sysfs_results = sysfs_index.lookup(queries)
+        sysfs = time.perf_counter() - start
+        shutil.rmtree(fake_root, ignore_errors=True)
+    finally:
+        if temp:
+            os.unlink(temp.name)
+
+    # Checked explicitly: the numbers mean nothing if the backends disagree
+    if per_query != bulk_results:
+        raise RuntimeError("Bulk lookups differ from one enumeration per VID/PID")
+    if len(sysfs_index) != len(index):
+        raise RuntimeError(f"sysfs found {len(sysfs_index)} devices, expected {len(index)}")
+    if any((sysfs_results[key] is None) != (bulk_results[key] is None) for key in queries):
+        raise RuntimeError("sysfs lookups differ from the PowerShell enumeration")
+
+    print(f"\nUSB enumeration benchmark ({len(index)} devices, {len(queries)} lookups)")
+    print("-" * 60)
+    print(f"  One enumeration per VID/PID: {separate * 1e3:10.1f} ms")
+    print(f"  Single bulk enumeration:     {bulk * 1e3:10.1f} ms")
+    print(f"  sysfs enumeration:           {sysfs * 1e3:10.1f} ms")
+    print(f"  Indexed lookup:              {lookup * 1e6:10.2f} us")
+    print("-" * 60)
+    for (vendor_id, product_id), device in bulk_results.items():
+        print(f"  {vendor_id}:{product_id}  {device.name if device else 'not found'}")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description="Enumerate USB devices once and look up VID/PID pairs",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Examples:
+  # List all USB devices (sysfs on Linux, PowerShell on Windows)
+  python usb_detection.py
+
+  # Probe several devices at once, all within 3 seconds
+  python usb_detection.py --probe --find 0x16c0:0x05df --find 0x2341:0x0043 --deadline 3
+
+  # Print devices as they are found, giving up after 3 seconds
+  python usb_detection.py --stream --deadline 3
+
+  # Read a fake sysfs tree instead of /sys/bus/usb/devices
+  python usb_detection.py --sysfs /tmp/fake_sysfs
+
+  # Look up specific devices from a single enumeration
+  python usb_detection.py --find 0x16c0:0x05df --find 0x2341:0x0043
+
+  # Record the raw enumeration output for later replay
+  python usb_detection.py --capture usb_devices.json
+
+  # Benchmark per-device vs bulk enumeration with a replaying stub
+  python usb_detection.py --benchmark --replay usb_devices.json
+
+  # Use a stub instead of PowerShell
+  set VUSB_POWERSHELL=python replay.py usb_devices.json
+        """
+    )
+
+    parser.add_argument("--find", action="append", default=[], metavar="VID:PID",
+                       help="Device to look up (repeatable)")
+    parser.add_argument("--backend", choices=("auto", "sysfs", "powershell"), default="auto",
+                       help="Enumeration backend (default: auto)")
+    parser.add_argument("--sysfs", metavar="DIR",
+                       help=f"sysfs USB device directory (default: {SYSFS_USB_DEVICES})")
+    parser.add_argument("--probe", action="store_true",
+                       help="Probe the --find devices concurrently (shares --deadline)")
+    parser.add_argument("--stream", action="store_true",
+                       help="Print devices as they are found (stops at --deadline)")
+    parser.add_argument("--deadline", type=float, default=5.0,
+                       help="Streaming/probing deadline in seconds (default: 5)")
+    parser.add_argument("--capture", metavar="FILE",
+                       help="Write the raw enumeration output to FILE")
+    parser.add_argument("--timeout", type=float, default=10.0,
+                       help="PowerShell timeout in seconds (default: 10)")
+    parser.add_argument("--benchmark", action="store_true",
+                       help="Benchmark per-device vs bulk enumeration")
+    parser.add_argument("--replay", metavar="FILE",
+                       help="Captured output replayed by the benchmark stub "
+                            "(default: synthetic)")
+    parser.add_argument("--devices", type=int, default=200,
+                       help="Synthetic device count for the benchmark (default: 200)")
+
+    args = parser.parse_args()
+
+    queries = []
+    for item in args.find:
+        try:
+            vendor_id, product_id = item.split(":")
+            parse_usb_id(vendor_id), parse_usb_id(product_id)
+        except ValueError:
+            print(f"Error: Invalid VID:PID '{item}'")
+            return 1
+        queries.append((vendor_id, product_id))
+
+    if args.benchmark:
+        benchmark(args.replay, args.devices, queries or None)
+        return 0
+
+    if args.capture:
+        try:
+            output = run_enumeration(args.timeout)
+        except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+            print(f"Error enumerating USB devices: {e}")
+            return 1
+        with open(args.capture, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"Enumeration output written to: {args.capture}")
+        return 0
+
+    if args.sysfs:
+        os.environ[ENV_SYSFS] = args.sysfs
+    backend = None if args.backend == "auto" else args.backend
+    if args.sysfs and backend is None:
+        backend = "sysfs"
+
+    if args.probe:
+        start = time.monotonic()
+        results = probe_devices(queries or [("0x16c0", "0x05df")], args.deadline,
+                                probe=lambda vid, pid, timeout: probe_device(
+                                    vid, pid, timeout, backend=backend))
+        total = time.monotonic() - start
+        for result in results:
+            name = result.device.name if result.device else result.error or ""
+            print(f"  {result.label:15} {result.status:10} {result.elapsed:7.3f}s  {name}")
+        print(f"{len(results)} probe(s) in {total:.3f}s "
+              f"(sum of probe times {sum(r.elapsed for r in results):.3f}s)")
+        return 0
+
+    if args.stream:
+        stream = DeviceStream(args.deadline, backend=backend)
+        start = time.monotonic()
+        for device in stream:
+            print(f"  {time.monotonic() - start:7.3f}s  {device.name} ({device.device_id})",
+                  flush=True)
+        if stream.complete:
+            state = "complete"
+        elif stream.timed_out:
+            state = "partial (deadline reached)"
+        else:
+            state = f"partial (enumerator exited with status {stream.returncode})"
+        print(f"{len(stream.devices)} device(s) in {stream.elapsed:.3f}s, {state}")
+        return 0
+    index = enumerate_usb_devices(args.timeout, backend=backend)
+
+    if queries:
+        for (vendor_id, product_id), device in index.lookup(queries).items():
+            if device:
+                print(f"✓ {vendor_id}:{product_id}  {device.name} - Status: {device.status}")
+            else:
+                print(f"✗ {vendor_id}:{product_id}  not found")
+        return 0
+
+    print(f"Found {len(index)} USB device(s)")
+    for device in index:
+        ids = ""
+        if device.vendor_id is not None:
+            ids = f"0x{device.vendor_id:04x}:0x{device.product_id:04x}  "
+        print(f"  {ids}{device.name} ({device.status})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
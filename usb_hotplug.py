@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+USB hotplug monitor for the V-USB tools
+Pushes add/remove/change events for configured VID/PIDs to subscribers and keeps a
+live device index, using kernel uevents on Linux, WMI events on Windows and
+periodic scans elsewhere
+"""
+
+import argparse
+import json
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from config_loader import parse_usb_id
+from powershell_worker import encoded_command
+from usb_detection import (
+    UsbDevice,
+    UsbDeviceIndex,
+    default_backend,
+    get_enumeration_cache,
+    sysfs_root,
+)
+
+
+# Full command printing WMI event lines, e.g. a stand-in for testing
+ENV_HOTPLUG = "VUSB_HOTPLUG_COMMAND"
+
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_KERNEL_GROUP = 1
+
+# Prints one JSON object per Win32_PnPEntity creation/modification/deletion
+WMI_EVENT_SCRIPT = """
+$query = "SELECT * FROM __InstanceOperationEvent WITHIN 1 " +
+         "WHERE TargetInstance ISA 'Win32_PnPEntity'"
+Register-WmiEvent -Query $query -SourceIdentifier VUsbHotplug | Out-Null
+[Console]::Out.WriteLine('{"event": "ready"}')
+[Console]::Out.Flush()
+while ($true) {
+    $evt = Wait-Event -SourceIdentifier VUsbHotplug
+    $wmi = $evt.SourceEventArgs.NewEvent
+    $device = $wmi.TargetInstance
+    $line = @{
+        event = $wmi.__CLASS; Name = $device.Name; Description = $device.Description;
+        DeviceID = $device.DeviceID; Status = $device.Status
+    } | ConvertTo-Json -Compress
+    [Console]::Out.WriteLine($line)
+    [Console]::Out.Flush()
+    Remove-Event -EventIdentifier $evt.EventIdentifier
+}
+"""
+
+WMI_ACTIONS = {
+    "__InstanceCreationEvent": "add",
+    "__InstanceModificationEvent": "change",
+    "__InstanceDeletionEvent": "remove",
+}
+
+
+class HotplugEvent(NamedTuple):
+    """A USB device was connected ("add"), disconnected ("remove") or
+    changed its name or status ("change")"""
+    action: str
+    device: UsbDevice
+    timestamp: float
+
+
+class LiveDeviceIndex:
+    """Device index updated incrementally from hotplug events"""
+
+    __slots__ = ("_devices", "_by_id", "_lock")
+
+    def __init__(self, devices: Iterable[UsbDevice] = ()):
+        self._devices: Dict[str, UsbDevice] = {}
+        self._by_id: Dict[Tuple[int, int], Dict[str, UsbDevice]] = {}
+        self._lock = threading.Lock()
+        for device in devices:
+            self.add(device)
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    def add(self, device: UsbDevice) -> bool:
+        """Add or update a device, returns True if it was not present"""
+        with self._lock:
+            is_new = device.device_id not in self._devices
+            self._devices[device.device_id] = device
+            if device.vendor_id is not None:
+                key = (device.vendor_id, device.product_id)
+                self._by_id.setdefault(key, {})[device.device_id] = device
+            return is_new
+
+    def remove(self, device_id: str) -> Optional[UsbDevice]:
+        """Remove a device by device ID, returns it (None if unknown)"""
+        with self._lock:
+            device = self._devices.pop(device_id, None)
+            if device is not None and device.vendor_id is not None:
+                key = (device.vendor_id, device.product_id)
+                group = self._by_id.get(key)
+                if group is not None:
+                    group.pop(device_id, None)
+                    if not group:
+                        del self._by_id[key]
+            return device
+
+    def get(self, device_id: str) -> Optional[UsbDevice]:
+        """Get a device by device ID"""
+        return self._devices.get(device_id)
+
+    def replace(self, devices: Iterable[UsbDevice]) -> List[Tuple[str, UsbDevice]]:
+        """Bring the index in line with a full scan, returns (action, device) changes"""
+        scanned = {device.device_id: device for device in devices}
+        changes = []
+        for device_id in [d for d in self._devices if d not in scanned]:
+            changes.append(("remove", self.remove(device_id)))
+        for device_id, device in scanned.items():
+            previous = self._devices.get(device_id)
+            if previous != device:
+                self.add(device)
+                changes.append(("add" if previous is None else "change", device))
+        return changes
+
+    def find_all(self, vendor_id, product_id) -> Tuple[UsbDevice, ...]:
+        """Get every connected device with a VID/PID"""
+        key = (parse_usb_id(vendor_id), parse_usb_id(product_id))
+        with self._lock:
+            return tuple(self._by_id.get(key, {}).values())
+
+    def find(self, vendor_id, product_id) -> Optional[UsbDevice]:
+        """Get the first connected device with a VID/PID, or None"""
+        devices = self.find_all(vendor_id, product_id)
+        return devices[0] if devices else None
+
+    def snapshot(self) -> UsbDeviceIndex:
+        """Get an immutable UsbDeviceIndex of the connected devices"""
+        with self._lock:
+            return UsbDeviceIndex(self._devices.values())
+
+
+def parse_uevent(data: bytes) -> Optional[Dict[str, str]]:
+    """Parse a kernel uevent ("add@/devpath\\0KEY=value\\0...") into a dict"""
+    parts = data.split(b"\0")
+    if b"@" not in parts[0]:
+        return None
+    env = {}
+    for part in parts[1:]:
+        key, sep, value = part.partition(b"=")
+        if sep:
+            env[key.decode("ascii", "replace")] = value.decode("utf-8", "replace")
+    return env
+
+
+def device_from_uevent(env: Dict[str, str]) -> Optional[UsbDevice]:
+    """Build a device record from a uevent (sysfs attributes when present)"""
+    if env.get("SUBSYSTEM") != "usb" or env.get("DEVTYPE") != "usb_device":
+        return None
+    device_id = os.path.basename(env.get("DEVPATH", ""))
+    if not device_id:
+        return None
+
+    if env.get("ACTION") == "add":
+        device = UsbDevice.from_sysfs(os.path.join(sysfs_root(), device_id))
+        if device is not None:
+            return device
+
+    # Removed (or already gone): PRODUCT is "vid/pid/bcdDevice" in hex
+    try:
+        vendor_id, product_id = (int(v, 16) for v in env.get("PRODUCT", "").split("/")[:2])
+    except ValueError:
+        return None
+    return UsbDevice("Unknown", "", device_id, "OK", vendor_id, product_id, None)
+
+
+def hotplug_command() -> List[str]:
+    """Get the WMI event command line (overridable with VUSB_HOTPLUG_COMMAND)"""
+    override = os.environ.get(ENV_HOTPLUG)
+    if override:
+        return shlex.split(override, posix=os.name != "nt")
+    return encoded_command(WMI_EVENT_SCRIPT)
+
+
+def default_hotplug_backend() -> str:
+    """Pick the event source: netlink, wmi or poll"""
+    if os.environ.get(ENV_HOTPLUG) or sys.platform == "win32":
+        return "wmi"
+    if hasattr(socket, "AF_NETLINK") and default_backend() == "sysfs":
+        return "netlink"
+    return "poll"
+
+
+class HotplugMonitor:
+    """Watch for USB devices being connected and disconnected
+
+    The live index covers every USB device; subscribers are only told about
+    devices whose (vid, pid) is in ``ids`` (all devices if ids is None).
+    Callbacks run on the monitor thread; GUI code should hand events over
+    to its own event loop. The first scan also runs there and reports the
+    devices already connected as "add" events; ``ready`` is set once the
+    live index holds that scan.
+    """
+
+    def __init__(self, ids: Optional[Iterable[Tuple[int, int]]] = None,
+                 backend: str = "auto", interval: float = 2.0):
+        self.ids: Optional[Set[Tuple[int, int]]] = None
+        self.set_ids(ids)
+        self.requested_backend = backend
+        self.backend: Optional[str] = None
+        self.interval = interval
+        self.devices = LiveDeviceIndex()
+        self.events = 0
+        self.ready = threading.Event()
+
+        self._subscribers: List[Callable[[HotplugEvent, "HotplugMonitor"], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._socket: Optional[socket.socket] = None
+        self._process: Optional[subprocess.Popen] = None
+
+    def set_ids(self, ids: Optional[Iterable[Tuple[int, int]]]):
+        """Change the (vid, pid) pairs reported to subscribers"""
+        self.ids = None if ids is None else {
+            (parse_usb_id(vid), parse_usb_id(pid)) for vid, pid in ids
+        }
+
+    def matches(self, device: UsbDevice) -> bool:
+        """Check whether subscribers want events for a device"""
+        return self.ids is None or (device.vendor_id, device.product_id) in self.ids
+
+    def subscribe(self, callback: Callable[[HotplugEvent, "HotplugMonitor"], None]) -> Callable[[], None]:
+        """Register a callback for add/remove/change events
+
+        Returns a function that unsubscribes the callback.
+        """
+        self._subscribers.append(callback)
+
+        def unsubscribe():
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def _notify(self, action: str, device: UsbDevice):
+        """Send an event to subscribers"""
+        if not self.matches(device):
+            return
+        self.events += 1
+        event = HotplugEvent(action, device, time.time())
+        for callback in list(self._subscribers):
+            try:
+                callback(event, self)
+            except Exception as e:
+                print(f"Error in hotplug subscriber: {e}")
+
+    def _apply(self, action: str, device: UsbDevice):
+        """Update the live index from one event and notify on changes"""
+        if action == "add":
+            if self.devices.add(device):
+                get_enumeration_cache().invalidate()
+                self._notify("add", device)
+        elif action == "change":
+            previous = self.devices.get(device.device_id)
+            if previous != device:
+                self.devices.add(device)
+                get_enumeration_cache().invalidate()
+                self._notify("add" if previous is None else "change", device)
+        elif action == "remove":
+            removed = self.devices.remove(device.device_id)
+            if removed is not None:
+                get_enumeration_cache().invalidate()
+                self._notify("remove", removed)
+
+    def _scan(self, fresh: bool = False) -> UsbDeviceIndex:
+        """Full enumeration through the shared cache (fresh for polling)"""
+        cache = get_enumeration_cache()
+        return cache.refresh() if fresh else cache.get()
+
+    def start(self):
+        """Start listening for events and seed the live index in the background"""
+        if self._thread is not None:
+            return
+        backend = self.requested_backend
+        if backend == "auto":
+            backend = default_hotplug_backend()
+
+        # Open the event source first so nothing is missed during the scan
+        try:
+            if backend == "netlink":
+                self._socket = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM,
+                                             NETLINK_KOBJECT_UEVENT)
+                self._socket.bind((0, UEVENT_KERNEL_GROUP))
+                self._socket.settimeout(0.5)
+            elif backend == "wmi":
+                self._process = subprocess.Popen(
+                    hotplug_command(),
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    text=True,
+                    encoding="utf-8",
+                    creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
+                )
+        except (OSError, AttributeError) as e:
+            print(f"Warning: {backend} hotplug events unavailable ({e}), polling instead")
+            self._close_source()
+            backend = "poll"
+
+        self.backend = backend
+        self.ready.clear()
+        self._stop.clear()
+        loop = {"netlink": self._netlink_loop, "wmi": self._wmi_loop}.get(backend, self._poll_loop)
+        self._thread = threading.Thread(target=self._run, args=(loop,), name="usb-hotplug", daemon=True)
+        self._thread.start()
+
+    def _run(self, loop: Callable[[], None]):
+        """Seed the live index with one scan, then run the event loop"""
+        for action, device in self.devices.replace(self._scan()):
+            self._notify(action, device)
+        self.ready.set()
+        loop()
+
+    def _netlink_loop(self):
+        """Apply kernel uevents for USB devices"""
+        while not self._stop.is_set():
+            try:
+                data = self._socket.recv(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            env = parse_uevent(data)
+            if env is None or env.get("ACTION") not in ("add", "remove"):
+                continue
+            device = device_from_uevent(env)
+            if device is not None:
+                self._apply(env["ACTION"], device)
+
+    def _wmi_loop(self):
+        """Apply WMI creation/modification/deletion events, falling back to polling if they stop"""
+        for line in self._process.stdout:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            action = WMI_ACTIONS.get(entry.get("event"))
+            if action:
+                device = UsbDevice.from_wmi(entry)
+                if device.vendor_id is not None:
+                    self._apply(action, device)
+
+        if not self._stop.is_set():
+            print("Warning: WMI event watcher exited, polling instead")
+            self.backend = "poll"
+            self._poll_loop()
+
+    def _poll_loop(self):
+        """Rescan periodically and apply the differences"""
+        while not self._stop.wait(self.interval):
+            changes = self.devices.replace(self._scan(fresh=True))
+            for action, device in changes:
+                self._notify(action, device)
+
+    def _close_source(self):
+        """Close the netlink socket or stop the WMI process"""
+        sock, self._socket = self._socket, None
+        if sock is not None:
+            sock.close()
+        process, self._process = self._process, None
+        if process is not None:
+            try:
+                process.kill()
+                process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+
+    def stop(self):
+        """Stop listening for events"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._close_source()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description="Print USB hotplug events for configured V-USB devices",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Examples:
+  # Watch all devices from device_config.json
+  python usb_hotplug.py
+
+  # Watch a specific VID/PID
+  python usb_hotplug.py --id 0x16c0:0x05df
+
+  # Watch every USB device, rescanning every second
+  python usb_hotplug.py --all --backend poll --interval 1
+        """
+    )
+
+    parser.add_argument("--id", action="append", default=[], metavar="VID:PID",
+                       help="Device to watch (repeatable, default: configured devices)")
+    parser.add_argument("--all", action="store_true",
+                       help="Report every USB device")
+    parser.add_argument("--config",
+                       help="Device config file (default: device_config.json)")
+    parser.add_argument("--backend", choices=("auto", "netlink", "wmi", "poll"), default="auto",
+                       help="Event source (default: auto)")
+    parser.add_argument("--interval", type=float, default=2.0,
+                       help="Polling interval in seconds (default: 2)")
+
+    args = parser.parse_args()
+
+    if args.all:
+        ids = None
+    elif args.id:
+        try:
+            ids = [tuple(parse_usb_id(v) for v in item.split(":")) for item in args.id]
+        except ValueError:
+            print(f"Error: Invalid VID:PID in {args.id}")
+            return 1
+    else:
+        from device_catalog import get_catalog
+        ids = get_catalog(args.config).devices.ids()
+
+    monitor = HotplugMonitor(ids, backend=args.backend, interval=args.interval)
+
+    def report(event: HotplugEvent, monitor: HotplugMonitor):
+        device = event.device
+        stamp = time.strftime("%H:%M:%S", time.localtime(event.timestamp))
+        print(f"[{stamp}] {event.action:6} 0x{device.vendor_id:04x}:0x{device.product_id:04x}  "
+              f"{device.name} ({device.device_id})", flush=True)
+
+    monitor.subscribe(report)
+    monitor.start()
+    monitor.ready.wait()
+
+    watched = "all devices" if ids is None else f"{len(monitor.ids)} VID/PID pair(s)"
+    print(f"Watching {watched} via {monitor.backend} "
+          f"({len(monitor.devices)} device(s) connected). Press Ctrl+C to stop.", flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
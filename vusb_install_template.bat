@@ -0,0 +1,31 @@
+@echo off
+REM V-USB Driver Installation Script
+REM Device: {{ device_name }}
+
+echo Installing V-USB Driver for {{ device_name }}...
+echo.
+
+REM Check for admin privileges
+net session >nul 2>&1
+if %errorlevel% neq 0 (
+    echo Error: This script requires administrator privileges.
+    echo Please run as Administrator.
+    pause
+    exit /b 1
+)
+
+REM Install driver
+echo Installing driver...
+pnputil /add-driver vusb_driver.inf /install
+
+if %errorlevel% equ 0 (
+    echo.
+    echo Success! Driver installed.
+    echo Please reconnect your device.
+) else (
+    echo.
+    echo Error: Installation failed.
+    echo Try manual installation or disable driver signature enforcement.
+)
+
+pause
@@ -11,12 +11,18 @@ import ctypes
 import subprocess
 import tempfile
 import shutil
+import threading
 from pathlib import Path
 from typing import Optional, Dict, List, Tuple
 import urllib.request
 import urllib.error
 import zipfile
 
+from config_loader import parse_usb_id
+from device_catalog import DEFAULT_DEVICES, get_catalog, refresh_catalog
+from usb_detection import DeviceStream, UsbDeviceIndex, get_enumeration_cache
+from usb_hotplug import HotplugEvent, HotplugMonitor
+
 try:
     import tkinter as tk
     from tkinter import ttk, messagebox, filedialog
@@ -32,19 +38,8 @@ except ImportError:
 
 
 class DeviceConfig:
-    """USB Device Configuration"""
-    DEFAULT_CONFIGS = {
-        "Button Box": {
-            "vendor_id": "0x16c0",
-            "product_id": "0x05df",
-            "description": "Arduino Button Box (V-USB)"
-        },
-        "Arduino Device": {
-            "vendor_id": "0x16c0",
-            "product_id": "0x05df",
-            "description": "Generic Arduino Device (V-USB)"
-        }
-    }
+    """USB Device Configuration (defaults; the GUI uses the device catalog)"""
+    DEFAULT_CONFIGS = DEFAULT_DEVICES
 
 
 class WindowsDeviceManager:
@@ -59,85 +54,47 @@ class WindowsDeviceManager:
             return False
     
     @staticmethod
-    def get_device_list() -> List[Dict]:
-        """Get list of USB devices using wmic"""
+    def get_device_list(callback=None, deadline: float = 5.0) -> List[Dict]:
+        """Get list of USB devices, streaming them as they are found
+        
+        ``callback(device_dict)`` is called for each device as soon as it
+        is reported. When the deadline passes the devices found so far
+        are returned.
+        """
+        devices = []
         try:
-            output = subprocess.check_output(
-                "wmic logicaldisk get name",
-                shell=True,
-                stderr=subprocess.DEVNULL,
-                text=True
-            )
-            
-            # Try using PowerShell for better USB device detection
-            ps_cmd = """
-            Get-WmiObject Win32_USBControllerDevice | ForEach-Object {
-                [wmi]$hub = $_
-                $hub.Dependent
-            } | Select-Object Name, Description, DeviceID | ConvertTo-Json
-            """
-            
-            try:
-                result = subprocess.run(
-                    ["powershell", "-Command", ps_cmd],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                if result.returncode == 0 and result.stdout:
-                    return json.loads(result.stdout)
-            except:
-                pass
-            
-            return []
+            for device in DeviceStream(deadline):
+                entry = device.to_wmi()
+                devices.append(entry)
+                if callback:
+                    callback(entry)
         except Exception as e:
             print(f"Error getting device list: {e}")
-            return []
+        return devices
     
     @staticmethod
-    def find_device_by_id(vendor_id: str, product_id: str) -> Optional[Dict]:
-        """Find device by Vendor ID and Product ID"""
+    def find_device_by_id(vendor_id: str, product_id: str,
+                          index: Optional[UsbDeviceIndex] = None) -> Optional[Dict]:
+        """Find device by Vendor ID and Product ID
+        
+        Pass an index from enumerate_usb_devices() to answer several
+        lookups from one enumeration. Otherwise the shared enumeration
+        cache answers, scanning through the PowerShell worker when stale.
+        """
         try:
-            # Convert hex strings to decimal
-            vid = int(vendor_id, 16)
-            pid = int(product_id, 16)
-            
-            # Use PowerShell to find the device
-            ps_cmd = f"""
-            $devices = Get-WmiObject Win32_PnPEntity | Where-Object {{
-                $_.DeviceID -match "VID_{vid:04X}" -and $_.DeviceID -match "PID_{pid:04X}"
-            }}
-            
-            if ($devices) {{
-                $devices | Select-Object Name, Description, DeviceID, Status | ConvertTo-Json
-            }}
-            """
-            
-            result = subprocess.run(
-                ["powershell", "-Command", ps_cmd],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            
-            if result.returncode == 0 and result.stdout.strip():
-                try:
-                    data = json.loads(result.stdout)
-                    if isinstance(data, list):
-                        return data[0] if data else None
-                    return data
-                except json.JSONDecodeError:
-                    return None
-            
-            return None
+            if index is None:
+                index = get_enumeration_cache().get(timeout=5)
+            device = index.find(vendor_id, product_id)
+            return device.to_wmi() if device else None
         except Exception as e:
             print(f"Error finding device: {e}")
             return None
     
     @staticmethod
-    def get_device_status(vendor_id: str, product_id: str) -> Tuple[bool, str]:
+    def get_device_status(vendor_id: str, product_id: str,
+                          index: Optional[UsbDeviceIndex] = None) -> Tuple[bool, str]:
         """Check if device is detected and its status"""
-        device = WindowsDeviceManager.find_device_by_id(vendor_id, product_id)
+        device = WindowsDeviceManager.find_device_by_id(vendor_id, product_id, index)
         
         if device:
             status = device.get("Status", "Unknown")
@@ -225,6 +182,8 @@ class DriverInstaller:
                 )
                 
                 if result.returncode == 0:
+                    # Devices re-enumerate with the new driver
+                    get_enumeration_cache().invalidate()
                     if progress_callback:
                         progress_callback("Driver installed successfully!")
                     return True
@@ -239,6 +198,8 @@ class DriverInstaller:
                     capture_output=True,
                     timeout=60
                 )
+                if result.returncode == 0:
+                    get_enumeration_cache().invalidate()
                 return result.returncode == 0
             
             if progress_callback:
@@ -277,7 +238,23 @@ class DriverInstallerGUI:
             )
         
         self.installer = None
+        self.catalog = get_catalog()
         self.setup_ui()
+        
+        # Follow edits to device_config.json made by other tools
+        if self.catalog.loader is not None:
+            self.catalog.loader.subscribe(
+                lambda diff, loader: self.root.after(0, self.reload_catalog)
+            )
+            self.catalog.loader.watch()
+        
+        # Detect configured devices as they are plugged in or removed; the
+        # first scan runs on the monitor thread and arrives as "add" events
+        self.hotplug = HotplugMonitor(self.catalog.devices.ids())
+        self.hotplug.subscribe(
+            lambda event, monitor: self.root.after(0, self.on_hotplug, event)
+        )
+        self.hotplug.start()
     
     def setup_ui(self):
         """Setup GUI elements"""
@@ -304,14 +281,14 @@ class DriverInstallerGUI:
         
         ttk.Label(device_frame, text="Device:").grid(row=0, column=0, sticky=tk.W)
         self.device_var = tk.StringVar(value="Button Box")
-        device_combo = ttk.Combobox(
+        self.device_combo = ttk.Combobox(
             device_frame,
             textvariable=self.device_var,
-            values=list(DeviceConfig.DEFAULT_CONFIGS.keys()),
+            values=list(self.catalog.devices.names),
             state="readonly"
         )
-        device_combo.grid(row=0, column=1, sticky=tk.EW, padx=5)
-        device_combo.bind("<<ComboboxSelected>>", self.on_device_changed)
+        self.device_combo.grid(row=0, column=1, sticky=tk.EW, padx=5)
+        self.device_combo.bind("<<ComboboxSelected>>", self.on_device_changed)
         
         # Vendor/Product ID display
         ttk.Label(device_frame, text="Vendor ID:").grid(row=1, column=0, sticky=tk.W)
@@ -357,6 +334,13 @@ class DriverInstallerGUI:
         )
         self.browse_btn.pack(side=tk.LEFT, padx=5)
         
+        self.list_btn = ttk.Button(
+            button_frame,
+            text="List USB Devices",
+            command=self.list_devices
+        )
+        self.list_btn.pack(side=tk.LEFT, padx=5)
+        
         # Progress
         progress_frame = ttk.LabelFrame(self.root, text="Progress", padding=10)
         progress_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
@@ -373,11 +357,35 @@ class DriverInstallerGUI:
     
     def on_device_changed(self, event=None):
         """Handle device selection change"""
-        device_name = self.device_var.get()
-        config = DeviceConfig.DEFAULT_CONFIGS.get(device_name, {})
+        record = self.catalog.devices.by_name(self.device_var.get())
         
-        self.vendor_id_var.set(config.get("vendor_id", "0x16c0"))
-        self.product_id_var.set(config.get("product_id", "0x05df"))
+        self.vendor_id_var.set(record.vendor_id_hex if record else "0x16c0")
+        self.product_id_var.set(record.product_id_hex if record else "0x05df")
+    
+    def reload_catalog(self):
+        """Rebuild the device list after the config file changed"""
+        # Same watched loader, already holding the new config
+        self.catalog = refresh_catalog(self.catalog)
+        
+        names = list(self.catalog.devices.names)
+        self.device_combo.config(values=names)
+        if self.device_var.get() not in names and names:
+            self.device_var.set(names[0])
+        self.on_device_changed()
+        self.hotplug.set_ids(self.catalog.devices.ids())
+    
+    def on_hotplug(self, event: HotplugEvent):
+        """Refresh the device status when a configured device comes, goes or changes"""
+        device = event.device
+        try:
+            selected = (parse_usb_id(self.vendor_id_var.get()), parse_usb_id(self.product_id_var.get()))
+        except ValueError:
+            selected = None     # VID/PID fields are being edited
+        if (device.vendor_id, device.product_id) == selected:
+            self.detect_device()
+        action = {"add": "connected", "remove": "removed"}.get(event.action, "changed")
+        self.log_progress(f"Device {action}: {device.name} "
+                          f"(0x{device.vendor_id:04x}:0x{device.product_id:04x})")
     
     def log_progress(self, message: str):
         """Log progress message"""
@@ -398,7 +406,10 @@ class DriverInstallerGUI:
         vendor_id = self.vendor_id_var.get()
         product_id = self.product_id_var.get()
         
-        found, status = WindowsDeviceManager.get_device_status(vendor_id, product_id)
+        # The hotplug monitor's live index answers without a new scan once
+        # its first scan is in; until then use the shared enumeration cache
+        index = self.hotplug.devices.snapshot() if self.hotplug.ready.is_set() else None
+        found, status = WindowsDeviceManager.get_device_status(vendor_id, product_id, index)
         
         # Update status display
         self.status_text.config(state=tk.NORMAL)
@@ -416,6 +427,37 @@ class DriverInstallerGUI:
         self.status_text.config(state=tk.DISABLED)
         self.log_progress(status)
     
+    def list_devices(self):
+        """List connected USB devices, showing each as soon as it is found"""
+        self.progress_text.config(state=tk.NORMAL)
+        self.progress_text.delete(1.0, tk.END)
+        self.progress_text.config(state=tk.DISABLED)
+        
+        self.log_progress("Listing USB devices...")
+        self.list_btn.config(state=tk.DISABLED)
+        
+        def show(device):
+            self.root.after(0, self.log_progress,
+                            f"  {device.get('Name', 'Unknown')} ({device.get('Status', 'Unknown')})")
+        
+        def done(devices):
+            self.log_progress(f"{len(devices)} device(s) found")
+            self.list_btn.config(state=tk.NORMAL)
+        
+        def worker():
+            devices = WindowsDeviceManager.get_device_list(callback=show)
+            self.root.after(0, done, devices)
+        
+        threading.Thread(target=worker, name="device-list", daemon=True).start()
+    
+    def verify_installation(self):
+        """Check that the device is still detected after installing the driver"""
+        self.log_progress("Verifying device...")
+        found, status = WindowsDeviceManager.get_device_status(
+            self.vendor_id_var.get(), self.product_id_var.get()
+        )
+        self.log_progress(f"{'✓' if found else '✗'} {status}")
+    
     def install_driver(self):
         """Install driver"""
         self.progress_text.config(state=tk.NORMAL)
@@ -447,6 +489,7 @@ class DriverInstallerGUI:
         
         if success:
             self.log_progress("\n✓ Driver installed successfully!")
+            self.verify_installation()
             messagebox.showinfo("Success", "Driver installed successfully!")
         else:
             self.log_progress("\n✗ Driver installation failed")
@@ -474,6 +517,7 @@ class DriverInstallerGUI:
                 
                 if success:
                     self.log_progress("\n✓ Driver installed successfully!")
+                    self.verify_installation()
                     messagebox.showinfo("Success", "Driver installed successfully!")
                 else:
                     self.log_progress("\n✗ Driver installation failed")